@@ -0,0 +1,443 @@
+import atexit
+import os
+import threading
+import time
+import numpy as np
+import embedding_codec
+import embedding_snapshot
+
+# -----------------------------------------------------------------------------
+# Approximate nearest-neighbour index (IVF, pure NumPy) over video embeddings.
+# Vectors are L2-normalised so that inner product == cosine similarity.
+# -----------------------------------------------------------------------------
+
+INDEX_PATH = os.environ.get(
+    "ANN_INDEX_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "ann_index.npz")
+)
+# Number of inverted lists probed per query; raised by tune_nprobe() until the
+# measured recall@k against exact search reaches ANN_TARGET_RECALL.
+DEFAULT_NPROBE = int(os.environ.get("ANN_NPROBE", "8"))
+TARGET_RECALL = float(os.environ.get("ANN_TARGET_RECALL", "0.95"))
+# Seconds between background saves after incremental adds
+SAVE_INTERVAL = float(os.environ.get("ANN_SAVE_INTERVAL", "60"))
+# Seconds between checks for vectors written by other processes (ingest workers)
+SYNC_INTERVAL = float(os.environ.get("ANN_SYNC_INTERVAL", "5"))
+# Catalogs smaller than this are searched exhaustively (the index is overhead)
+MIN_INDEX_SIZE = int(os.environ.get("ANN_MIN_INDEX_SIZE", "1000"))
+
+# Set ANN_INDEX_ENABLED=0 to always use exact search
+ENABLED = os.environ.get("ANN_INDEX_ENABLED", "1") == "1"
+
+EMBEDDING_FILTER = embedding_codec.EMBEDDING_FILTER
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _kmeans(vectors, nlist, iterations=10, seed=0):
+    """Spherical k-means; returns unit-norm centroids of shape (nlist, dim)."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), size=nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assign = np.argmax(vectors @ centroids.T, axis=1)
+        for c in range(nlist):
+            members = vectors[assign == c]
+            if len(members):
+                centroids[c] = members.sum(axis=0)
+            else:
+                centroids[c] = vectors[rng.integers(len(vectors))]
+        centroids = _normalize(centroids)
+    return centroids
+
+
+class IVFIndex:
+    """Inverted-file index: vectors are bucketed by nearest centroid and a query
+    only scores the vectors in its `nprobe` closest buckets."""
+
+    def __init__(self, dim=384, nprobe=DEFAULT_NPROBE):
+        self.dim = dim
+        self.nprobe = nprobe
+        self.centroids = np.zeros((0, dim), dtype=np.float32)
+        # Row buffers grow by doubling; only the first len(self.ids) rows are in use
+        self._vectors = np.zeros((0, dim), dtype=np.float32)
+        self._assign = np.zeros(0, dtype=np.int32)
+        self.ids = []          # row -> video id (str), None once removed
+        self.lists = []        # centroid -> list of rows
+        self.row_of = {}       # video id -> row
+        self.free_rows = []    # removed rows, reused by the next add
+        self.built_size = 0
+        self.lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.row_of)
+
+    @property
+    def vectors(self):
+        return self._vectors[:len(self.ids)]
+
+    @vectors.setter
+    def vectors(self, vectors):
+        self._vectors = vectors
+
+    @property
+    def assign(self):
+        return self._assign[:len(self.ids)]
+
+    @assign.setter
+    def assign(self, assign):
+        self._assign = assign
+
+    def _grow(self):
+        """Doubles the row buffers, so n adds copy O(n) rows in total."""
+        used = len(self.ids)
+        capacity = max(2 * len(self._vectors), 64)
+        vectors = np.zeros((capacity, self.dim), dtype=np.float32)
+        vectors[:used] = self._vectors[:used]
+        assign = np.zeros(capacity, dtype=np.int32)
+        assign[:used] = self._assign[:used]
+        self._vectors, self._assign = vectors, assign
+
+    def build(self, ids, vectors, nlist=None):
+        """Clusters the given vectors and rebuilds all inverted lists."""
+        vectors = _normalize(vectors).reshape(-1, self.dim)
+        with self.lock:
+            n = len(vectors)
+            nlist = nlist or max(1, int(np.sqrt(n)))
+            nlist = min(nlist, n) if n else 0
+            self.centroids = _kmeans(vectors, nlist) if n else np.zeros((0, self.dim), dtype=np.float32)
+            self.vectors = vectors
+            self.ids = [str(i) for i in ids]
+            self.row_of = {video_id: row for row, video_id in enumerate(self.ids)}
+            self.assign = (np.argmax(vectors @ self.centroids.T, axis=1).astype(np.int32)
+                           if n else np.zeros(0, dtype=np.int32))
+            self.lists = [[] for _ in range(nlist)]
+            for row, c in enumerate(self.assign):
+                self.lists[c].append(row)
+            self.free_rows = []
+            self.built_size = n
+
+    def add(self, video_id, vector):
+        """Inserts or replaces a single vector without re-clustering. A replaced
+        id keeps its row; a new id takes a removed row before growing the buffers.
+        Returns False if the id already holds this vector."""
+        video_id = str(video_id)
+        vector = _normalize(vector).reshape(self.dim)
+        with self.lock:
+            if not len(self.centroids):
+                self.build([video_id], vector)
+                return True
+            row = self.row_of.get(video_id)
+            if row is not None and np.array_equal(self._vectors[row], vector):
+                return False
+            c = int(np.argmax(self.centroids @ vector))
+            if row is not None:
+                self.lists[self._assign[row]].remove(row)
+            elif self.free_rows:
+                row = self.free_rows.pop()
+            else:
+                row = len(self.ids)
+                if row == len(self._vectors):
+                    self._grow()
+                self.ids.append(None)
+            self._vectors[row] = vector
+            self._assign[row] = c
+            self.ids[row] = video_id
+            self.lists[c].append(row)
+            self.row_of[video_id] = row
+            return True
+
+    def remove(self, video_id):
+        video_id = str(video_id)
+        with self.lock:
+            row = self.row_of.pop(video_id, None)
+            if row is None:
+                return
+            self.lists[self._assign[row]].remove(row)
+            self.ids[row] = None
+            self.free_rows.append(row)
+
+    def needs_rebuild(self):
+        """Lists drift out of balance once the index has grown well past the
+        size it was clustered at."""
+        return len(self) > max(4 * self.built_size, MIN_INDEX_SIZE) or len(self.ids) > 2 * max(len(self), 1)
+
+    def rebuild(self):
+        """Re-clusters the live vectors in place, dropping removed rows."""
+        with self.lock:
+            live = np.fromiter(self.row_of.values(), dtype=np.int64)
+            live.sort()
+            self.build([self.ids[r] for r in live], self._vectors[live])
+            if len(self):
+                self.tune_nprobe()
+
+    def search(self, vector, k=5, nprobe=None, exclude=None):
+        """Returns up to k (video_id, similarity) pairs, most similar first."""
+        query = _normalize(vector).reshape(self.dim)
+        with self.lock:
+            if not len(self.centroids):
+                return []
+            if len(self) < MIN_INDEX_SIZE:
+                return self.search_exact(query, k, exclude)
+            nprobe = min(nprobe or self.nprobe, len(self.centroids))
+            probe = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+            rows = np.fromiter((r for c in probe for r in self.lists[c]), dtype=np.int64)
+            return self._rank(rows, query, k, exclude)
+
+    def search_exact(self, vector, k=5, exclude=None):
+        query = _normalize(vector).reshape(self.dim)
+        with self.lock:
+            rows = np.fromiter(self.row_of.values(), dtype=np.int64)
+            return self._rank(rows, query, k, exclude)
+
+    def _rank(self, rows, query, k, exclude):
+        if not len(rows):
+            return []
+        scores = self.vectors[rows] @ query
+        take = min(len(rows), k + (1 if exclude is not None else 0))
+        top = np.argpartition(-scores, take - 1)[:take]
+        top = top[np.argsort(-scores[top])]
+        results = [(self.ids[rows[i]], float(scores[i])) for i in top if self.ids[rows[i]] != exclude]
+        return results[:k]
+
+    def recall_at_k(self, k=5, n_queries=100, nprobe=None, seed=0):
+        """Fraction of the exact top-k recovered by the IVF search."""
+        with self.lock:
+            live = list(self.row_of.values())
+            if not live:
+                return 1.0
+            rng = np.random.default_rng(seed)
+            sample = rng.choice(live, size=min(n_queries, len(live)), replace=False)
+            hits = total = 0
+            for row in sample:
+                video_id = self.ids[row]
+                exact = {i for i, _ in self.search_exact(self.vectors[row], k, exclude=video_id)}
+                approx = {i for i, _ in self.search(self.vectors[row], k, nprobe=nprobe, exclude=video_id)}
+                hits += len(exact & approx)
+                total += len(exact)
+            return hits / total if total else 1.0
+
+    def tune_nprobe(self, k=5, target_recall=TARGET_RECALL, n_queries=100):
+        """Doubles nprobe until recall@k reaches the target; returns (nprobe, recall)."""
+        nprobe = max(1, min(self.nprobe, len(self.centroids)))
+        while True:
+            recall = self.recall_at_k(k, n_queries, nprobe)
+            if recall >= target_recall or nprobe >= len(self.centroids):
+                break
+            nprobe = min(nprobe * 2, len(self.centroids))
+        self.nprobe = nprobe
+        return nprobe, recall
+
+    def save(self, path=INDEX_PATH):
+        with self.lock:
+            live = np.fromiter(self.row_of.values(), dtype=np.int64)
+            live.sort()
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            tmp_path = path + ".tmp.npz"
+            np.savez(
+                tmp_path,
+                centroids=self.centroids,
+                vectors=self.vectors[live],
+                ids=np.array([self.ids[r] for r in live], dtype="U24"),
+                assign=self.assign[live],
+                meta=np.array([self.dim, self.nprobe, self.built_size], dtype=np.int64),
+            )
+            os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=INDEX_PATH):
+        data = np.load(path)
+        dim, nprobe, built_size = (int(x) for x in data["meta"])
+        index = cls(dim=dim, nprobe=nprobe)
+        index.centroids = data["centroids"]
+        index.vectors = data["vectors"]
+        index.ids = [str(i) for i in data["ids"]]
+        index.assign = data["assign"].astype(np.int32)
+        index.row_of = {video_id: row for row, video_id in enumerate(index.ids)}
+        index.lists = [[] for _ in range(len(index.centroids))]
+        for row, c in enumerate(index.assign):
+            index.lists[c].append(row)
+        index.built_size = built_size
+        return index
+
+
+# -----------------------------------------------------------------------------
+# Process-wide index shared by the recommender and the embedding write paths
+# -----------------------------------------------------------------------------
+_index = None
+_build_lock = threading.Lock()
+_dirty = False
+_last_save = 0.0
+# Newest embedding_updated_at seen, the ids already synced at exactly that
+# time (a backfill batch shares one timestamp), and when catch_up() last ran
+_synced_until = None
+_synced_ids = set()
+_last_sync = 0.0
+
+
+def get_index():
+    """Returns the loaded index, or None if load_or_build() hasn't run."""
+    return _index
+
+
+def build_from_collection(videos_collection, dim=384):
+    """Builds from the shared embedding snapshot when one is published (then
+    catches up from Mongo), otherwise straight from the collection."""
+    snapshot = embedding_snapshot.get_snapshot()
+    if snapshot is not None and snapshot.dim == dim:
+        ids, vectors = [str(i) for i in snapshot.ids], np.asarray(snapshot.matrix)
+    else:
+        ids, stored = [], []
+        for video in videos_collection.find(EMBEDDING_FILTER, {"_id": 1, "embedding": 1}):
+            ids.append(str(video["_id"]))
+            stored.append(video["embedding"])
+        vectors = embedding_codec.decode_matrix(stored, dim)
+    index = IVFIndex(dim=dim)
+    if ids:
+        index.build(ids, vectors)
+    if snapshot is not None:
+        fresh = videos_collection.find(
+            {"embedding_updated_at": {"$gt": snapshot.created_at}}, {"_id": 1, "embedding": 1}
+        )
+        for video in fresh:
+            vector = embedding_codec.decode(video.get("embedding"))
+            if vector is not None:
+                index.add(video["_id"], vector)
+        sync_missing(index, videos_collection)
+    if len(index):
+        index.tune_nprobe()
+    return index
+
+
+def sync_missing(index, videos_collection):
+    """Adds vectors written while this index was on disk; returns how many."""
+    known = set(index.row_of)
+    missing = [v["_id"] for v in videos_collection.find(EMBEDDING_FILTER, {"_id": 1})
+               if str(v["_id"]) not in known]
+    for video in videos_collection.find({"_id": {"$in": missing}}, {"embedding": 1}):
+        index.add(video["_id"], embedding_codec.decode(video["embedding"]))
+    return len(missing)
+
+
+def load_or_build(videos_collection, path=INDEX_PATH):
+    """Loads the saved index (catching up on new vectors) or builds it from Mongo."""
+    global _index, _last_save
+    index = None
+    if os.path.exists(path):
+        try:
+            index = IVFIndex.load(path)
+            if sync_missing(index, videos_collection):
+                index.save(path)
+        except Exception as e:
+            print(f"❌ Could not load ANN index from {path}: {e}")
+            index = None
+    if index is None or index.needs_rebuild():
+        index = build_from_collection(videos_collection)
+        index.save(path)
+    _index = index
+    _last_save = time.time()
+    _mark_synced(videos_collection)
+    atexit.register(save_index, path)
+    print(f"✅ ANN index ready: {len(index)} vectors, nprobe={index.nprobe}")
+    return index
+
+
+def ensure_index(videos_collection, path=INDEX_PATH):
+    """Loads or builds the index on first use; concurrent callers wait for one build."""
+    with _build_lock:
+        if _index is None:
+            load_or_build(videos_collection, path)
+    return _index
+
+
+def _mark_synced(videos_collection):
+    global _synced_until, _synced_ids, _last_sync
+    latest = videos_collection.find_one(
+        {"embedding_updated_at": {"$exists": True}}, {"embedding_updated_at": 1}, sort=[("embedding_updated_at", -1)]
+    )
+    _synced_until = latest["embedding_updated_at"] if latest else None
+    _synced_ids = ({v["_id"] for v in videos_collection.find({"embedding_updated_at": _synced_until}, {"_id": 1})}
+                   if latest else set())
+    _last_sync = time.time()
+
+
+def _rebuild_if_needed():
+    """Re-clusters the live index once it has grown well past its build size
+    or is mostly removed rows; returns True if it did."""
+    global _dirty
+    if _index is None or not _index.needs_rebuild():
+        return False
+    _index.rebuild()
+    _dirty = True
+    print(f"✅ ANN index rebuilt in-process: {len(_index)} vectors, nprobe={_index.nprobe}")
+    return True
+
+
+def catch_up(videos_collection):
+    """
+    Adds vectors other processes wrote since the last check (at most once per
+    SYNC_INTERVAL), so uploads embedded by the ingest workers become searchable
+    within seconds. Returns how many were added.
+    """
+    global _synced_until, _synced_ids, _last_sync, _dirty
+    if _index is None or time.time() - _last_sync < SYNC_INTERVAL:
+        return 0
+    with _build_lock:
+        if time.time() - _last_sync < SYNC_INTERVAL:
+            return 0
+        _last_sync = time.time()
+        if _synced_until:
+            # Later writes, plus ones stamped with the boundary time that the last
+            # check hadn't seen yet (e.g. the rest of a batch still being written)
+            query = {"$or": [
+                {"embedding_updated_at": {"$gt": _synced_until}},
+                {"embedding_updated_at": _synced_until, "_id": {"$nin": list(_synced_ids)}},
+            ]}
+        else:
+            query = EMBEDDING_FILTER
+        added = 0
+        for video in videos_collection.find(query, {"embedding": 1, "embedding_updated_at": 1}):
+            vector = embedding_codec.decode(video.get("embedding"))
+            if vector is not None and _index.add(video["_id"], vector):
+                added += 1
+            updated_at = video.get("embedding_updated_at")
+            if updated_at and (_synced_until is None or updated_at > _synced_until):
+                _synced_until, _synced_ids = updated_at, set()
+            if updated_at and updated_at == _synced_until:
+                _synced_ids.add(video["_id"])
+        _dirty = _dirty or bool(added)
+        _rebuild_if_needed()
+        return added
+
+
+def add_vector(video_id, embedding, path=INDEX_PATH):
+    """Called by the write paths whenever a video gets a new embedding."""
+    global _dirty, _last_save
+    if _index is None or embedding is None or not len(embedding):
+        return
+    if _index.add(video_id, embedding):
+        _dirty = True
+        _rebuild_if_needed()
+    if time.time() - _last_save >= SAVE_INTERVAL:
+        save_index(path)
+
+
+def remove_vector(video_id, path=INDEX_PATH):
+    global _dirty
+    if _index is None:
+        return
+    _index.remove(video_id)
+    _dirty = True
+    _rebuild_if_needed()
+
+
+def save_index(path=INDEX_PATH):
+    global _dirty, _last_save
+    if _index is None or not _dirty:
+        return
+    _index.save(path)
+    _dirty = False
+    _last_save = time.time()
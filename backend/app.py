@@ -2,19 +2,62 @@ from flask import Flask, Response, request
 from flask_cors import CORS
 from bson.objectid import ObjectId
 import gridfs
-from database.dbOperations import videos_collection, users_collection
-import random
+import metrics  # before anything creates the MongoClient, so its command listener is attached
+from database.dbOperations import (
+    videos_collection, users_collection, feed_cards_collection, ingest, opposition_pairs, video_bias_index,
+    summary_cache,
+)
+from database.dbConfig import db, lazy_collection, ping
+from recommender import get_top_k_similar
+import ann_index
+from feed_sampler import FeedSampler
+from feed_buffer import FeedBuffer
+from watch_events import WatchAggregator
+from visited_store import VisitedStore
+from video_cache import VideoCache
+from summary_cache import SummaryError
+from streaming import evaluate_request, iter_file_range, multipart_byteranges, stream_headers
 import os
-import requests
 
 app = Flask(__name__)
 CORS(app)
+metrics.init_app(app)
 
-# Connect GridFS
-fs = gridfs.GridFS(videos_collection.database)
+# Everything below is lazy: no Mongo round trip or model load happens until a
+# request needs it (or warm_up() runs), so serving workers start in well under a second.
 
-# In-memory store: user_id -> set of visited video _id
-user_visited_videos = {}
+# Byte-bounded LRU of GridFS chunks in front of /stream
+video_cache = VideoCache(db)
+
+# Per-user visited bitmaps over each video's dense feed_index, shared by all
+# workers through Mongo; every swipe is a few bitmap probes plus one atomic
+# claim instead of a $nin count + skip.
+visited_store = VisitedStore(lazy_collection("visited_videos"))
+feed_sampler = FeedSampler(feed_cards_collection, videos_collection, visited_store)
+# Small per-user buffer of feed items, refilled in the background
+feed_buffer = FeedBuffer(feed_sampler, feed_cards_collection)
+
+# Watches are folded into users' bias in memory and written in periodic batches
+watch_aggregator = WatchAggregator(users_collection)
+
+
+def warm_up(load_models=False):
+    """
+    Optional start-up hook (POLAR_WARMUP=1): connects to Mongo, loads the feed
+    catalog and the ANN index, and with POLAR_WARMUP_MODELS=1 also loads the
+    transformer models. Serving-only workers can skip it and start instantly.
+    """
+    ping()
+    feed_sampler.catalog.refresh(force=True)
+    if ann_index.ENABLED:
+        ann_index.ensure_index(videos_collection)
+    if load_models:
+        from database.dbOperations import warm_up_models
+        warm_up_models()
+
+
+if os.environ.get("POLAR_WARMUP", "0") == "1":
+    warm_up(load_models=os.environ.get("POLAR_WARMUP_MODELS", "0") == "1")
 
 @app.route("/randomize_feed", methods=["GET"])
 def randomize_feed():
@@ -23,110 +66,171 @@ def randomize_feed():
     if not user_id:
         return {"error": "Missing user_id parameter"}, 400
 
-    # If this user hasn't been seen, init their visited set
-    if user_id not in user_visited_videos:
-        user_visited_videos[user_id] = set()
+    items = feed_buffer.take(user_id, 1)
+    if not items:
+        return {"error": "No more new videos available."}, 403
+
+    # Warm the first chunks so the swipe to this video starts from memory
+    _prefetch(items[0])
+    return items[0]
 
-    visited_ids = user_visited_videos[user_id]
 
-    # Count how many videos have not been visited by this user
-    unvisited_count = videos_collection.count_documents({"_id": {"$nin": list(visited_ids)}})
-    if unvisited_count == 0:
+@app.route("/feed/batch", methods=["GET"])
+def feed_batch():
+    """Returns up to n unvisited videos, each with what's needed to start streaming."""
+    user_id = request.args.get("user_id")
+    if not user_id:
+        return {"error": "Missing user_id parameter"}, 400
+    n = request.args.get("n", default=5, type=int)
+
+    items = feed_buffer.take(user_id, n)
+    if not items:
         return {"error": "No more new videos available."}, 403
 
-    # Pick a random index in [0, unvisited_count - 1]
-    random_index = random.randint(0, unvisited_count - 1)
+    # The client plays these in order, so warm the first two
+    for item in items[:2]:
+        _prefetch(item)
+    return {"items": items}
+
+
+@app.route("/feed/stats")
+def feed_stats():
+    """Served items, refills and lost claims for the per-user feed buffers."""
+    return feed_buffer.get_stats()
 
-    # Skip to that random index to fetch a single document
-    random_video_cursor = videos_collection.find({"_id": {"$nin": list(visited_ids)}}).skip(random_index).limit(1)
-    random_video = random_video_cursor.next()
 
-    # Validate that the "url" field is present and starts with "gridfs://"
-    if not random_video or "url" not in random_video or not random_video["url"].startswith("gridfs://"):
-        return {"error": "No valid videos available in the database."}, 403
+@app.route("/watch", methods=["POST"])
+def record_watch():
+    """Records that user_id watched video_id; the user's bias is updated write-behind."""
+    payload = request.get_json(silent=True) or request.args
+    user_id, video_id = payload.get("user_id"), payload.get("video_id")
+    if not user_id or not video_id or not ObjectId.is_valid(user_id) or not ObjectId.is_valid(video_id):
+        return {"error": "Missing or invalid user_id / video_id"}, 400
 
-    # Mark this video as visited for the user
-    visited_ids.add(random_video["_id"])
+    video_bias_index.refresh()
+    pole_bias = video_bias_index.score_of.get(video_id)
+    if pole_bias is None:
+        video = feed_cards_collection.find_one({"_id": ObjectId(video_id)}, {"bias_score": 1})
+        if not video:
+            return {"error": "Video not found"}, 404
+        pole_bias = video.get("bias_score", 0.0)
 
-    # Extract GridFS ID from the "gridfs://" URL format
-    gridfs_id = random_video["url"].replace("gridfs://", "")
+    if not watch_aggregator.record(ObjectId(user_id), pole_bias):
+        return {"error": "Watch backlog is full, try again later."}, 503
+    return {"status": "queued"}, 202
 
-    return {
-        "_id": str(random_video["_id"]),
-        "uploader_id": random_video["uploader_id"],
-        "gridfs_id": gridfs_id,
-        "bias_score": random_video.get("bias_score")
-    }
+
+@app.route("/watch/stats")
+def watch_stats():
+    """Buffered events and flush counters for the watch aggregator."""
+    return watch_aggregator.get_stats()
+
+
+def _prefetch(item):
+    if ObjectId.is_valid(item["gridfs_id"]):
+        video_cache.prefetch(ObjectId(item["gridfs_id"]))
 
 @app.route("/stream/<video_id>")
 def stream_video(video_id):
-    """Streams an MP4 video stored in MongoDB GridFS."""
+    """Streams an MP4 video stored in MongoDB GridFS, honouring Range and
+    conditional (If-None-Match / If-Modified-Since) requests."""
     try:
-        video_file = fs.get(ObjectId(video_id))
+        video_file = video_cache.open(ObjectId(video_id))
     except gridfs.errors.NoFile:
         return {"error": "Video not found"}, 404
 
-    def generate():
-        while chunk := video_file.read(8192):
-            yield chunk
-
-    return Response(generate(), content_type="video/mp4")
+    length = video_file.length
+    chunk_size = video_file.chunk_size
+    content_type = video_file.content_type or "video/mp4"
+    etag, last_modified, headers = stream_headers(video_file._id, length, video_file.upload_date)
+
+    status, ranges = evaluate_request(request, etag, last_modified, length)
+    if status == 304:
+        return Response(status=304, headers=headers)
+    if status == 200:
+        headers["Content-Length"] = str(length)
+        body = iter_file_range(video_file, 0, length - 1, chunk_size) if length else iter(())
+        return Response(body, status=200, headers=headers, content_type=content_type)
+    if status == 416:
+        headers["Content-Range"] = f"bytes */{length}"
+        return Response(status=416, headers=headers)
+
+    if len(ranges) == 1:
+        start, end = ranges[0]
+        headers["Content-Range"] = f"bytes {start}-{end}/{length}"
+        headers["Content-Length"] = str(end - start + 1)
+        body = iter_file_range(video_file, start, end, chunk_size)
+        return Response(body, status=206, headers=headers, content_type=content_type)
+
+    boundary, content_length, body = multipart_byteranges(video_file, ranges, length, content_type, chunk_size)
+    headers["Content-Length"] = str(content_length)
+    return Response(body, status=206, headers=headers,
+                    content_type=f"multipart/byteranges; boundary={boundary}")
+
+@app.route("/cache/stats")
+def cache_stats():
+    """Hit/miss/eviction counters for the video chunk cache."""
+    return video_cache.get_stats()
+
+
+@app.route("/metrics")
+def prometheus_metrics():
+    """Route, Mongo, model and outbound HTTP timings in Prometheus text format."""
+    rendered = metrics.render()
+    if rendered is None:
+        return {"error": "Metrics are disabled (POLAR_METRICS=0)."}, 404
+    body, content_type = rendered
+    return Response(body, content_type=content_type)
+
+
+@app.route("/ingest/stats")
+def ingest_stats():
+    """Queued and runnable ingest jobs per stage."""
+    return ingest.get_stats()
+
+
+@app.route("/similar/<video_id>")
+def similar_videos(video_id):
+    """Returns the ids of the k videos most similar to video_id."""
+    k = request.args.get("k", default=5, type=int)
+    exact = request.args.get("exact", default="false").lower() == "true"
+    similar = get_top_k_similar(video_id, k, exact=exact)
+    if similar is None:
+        return {"error": "Video not found or has no embedding."}, 404
+    return {"_id": video_id, "similar": similar}
+
+
+@app.route("/opposition/<video_id>")
+def opposition_videos(video_id):
+    """Returns up to k topically similar videos from the opposite side, best first."""
+    k = request.args.get("k", default=5, type=int)
+    pairs = opposition_pairs.get(video_id, k)
+    if pairs is None:
+        return {"error": "No opposition pairs computed for this video yet."}, 404
+    return {"_id": video_id, "opposition": pairs}
 
 
-
-#TODO: make this function work and make it connect to
 @app.route("/summary/<video_id>")
 def generate_summary_from_video(video_id: str) -> str:
     """
     Generates a concise title and summary from a given video_id by fetching its transcript from MongoDB.
     Returns the generated response as a string.
     """
-    # Load environment variables
-    API_KEY = os.environ.get("HUGGINGFACE_API_KEY")
-    if not API_KEY:
-        raise ValueError("HUGGINGFACE_API_KEY is not set in environment variables.")
-
     # Fetch video document from MongoDB
-    print("Received video_id: ", video_id)
-    video_document = videos_collection.find_one({"_id": ObjectId(video_id)})
-    
+    video_document = videos_collection.find_one({"_id": ObjectId(video_id)}, {"transcript": 1})
+
     if not video_document or "transcript" not in video_document:
         return {"error": "Transcript not found for the provided video_id."}
-    
+
     transcript = video_document["transcript"]
-    if (transcript != ""):
-        print("Transcript fetched")
-    elif (transcript == ""):
+    if transcript == "":
         print("Transcript empty")
-    else:
-        print("Transcript fetch unsuccessful:", type(transcript))
 
-    # Hugging Face API settings
-    API_URL = "https://api-inference.huggingface.co/models/mistralai/Mistral-7B-Instruct-v0.3"
-    HEADERS = {"Authorization": f"Bearer {API_KEY}"}
-
-    # Create the API request prompt
-    prompt = f"""
-    You are an AI assistant that summarizes transcripts into a compelling and neutral title (3 words or less) and a brief description.
-
-    Based on the following transcript, generate a *concise and informative title* along with a *description* summarizing the topic.
-
-    After that provide 2 lines on why this topic is politically contended. Do not make bullet points. Make paragraphs
-
-    Transcript:
-    {transcript}
-    """
-
-    # Send request to Hugging Face API
-    response = requests.post(API_URL, headers=HEADERS, json={"inputs": prompt})
-
-    if response.status_code == 200:
-        result = response.json()
-        generated_text = result[0]['generated_text']
-        trimmed_response = generated_text[len(prompt):].strip()
-        return trimmed_response
-    else:
-        return f"Error {response.status_code}: {response.text}"
+    # Memoised per transcript + prompt version; concurrent taps share one upstream call
+    try:
+        return summary_cache.get_summary(transcript)
+    except SummaryError as e:
+        return str(e)
 
 if __name__ == "__main__":
     app.run(debug=True, host="0.0.0.0", port=5001)
\ No newline at end of file
@@ -0,0 +1,183 @@
+import asyncio
+from collections import OrderedDict
+import aiohttp
+from bson.objectid import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.server_api import ServerApi
+from quart import Quart, Response, request
+from database import dbConfig
+import metrics
+from database.dbOperations import feed_cards_collection, videos_collection
+from feed_sampler import FeedSampler
+from feed_buffer import FeedBuffer
+from visited_store import VisitedStore
+from summary_cache import AsyncSummaryCache, SummaryError, CONNECT_TIMEOUT, READ_TIMEOUT
+from streaming import aiter_file_range, evaluate_request, multipart_layout, stream_headers
+
+# -----------------------------------------------------------------------------
+# Async serving mode: the same /randomize_feed, /stream and /summary routes as
+# app.py on Quart, with motor for Mongo/GridFS and aiohttp for the summary
+# model. A stream is a coroutine awaiting chunk batches rather than a thread
+# blocked on GridFS, so one process can hold thousands of open streams.
+#
+#   hypercorn async_app:app --bind 0.0.0.0:5001
+#
+# app.py stays the default (Flask) server.
+# -----------------------------------------------------------------------------
+
+MAX_CACHED_FILES = 10000
+
+app = Quart(__name__)
+# Streams last as long as the video; don't cut them off after Quart's default 60s
+app.config["RESPONSE_TIMEOUT"] = None
+
+# The feed sampler/buffer are shared with app.py and serve from memory; their
+# occasional claim/refill round trips run on worker threads via asyncio.to_thread.
+visited_store = VisitedStore(dbConfig.lazy_collection("visited_videos"))
+feed_sampler = FeedSampler(feed_cards_collection, videos_collection, visited_store)
+feed_buffer = FeedBuffer(feed_sampler, feed_cards_collection)
+
+# Created on the serving loop in connect()
+mongo_client = None
+db = None
+http_session = None
+summary_cache = None
+file_docs = OrderedDict()
+
+
+@app.before_serving
+async def connect():
+    global mongo_client, db, http_session, summary_cache
+    mongo_client = AsyncIOMotorClient(dbConfig.uri, server_api=ServerApi('1'), **dbConfig.client_options)
+    db = mongo_client[dbConfig.DB_NAME]
+    http_session = aiohttp.ClientSession(
+        timeout=aiohttp.ClientTimeout(sock_connect=CONNECT_TIMEOUT, sock_read=READ_TIMEOUT),
+        connector=aiohttp.TCPConnector(limit=32)
+    )
+    summary_cache = AsyncSummaryCache(db["summaries"], http_session)
+
+
+@app.after_serving
+async def disconnect():
+    await http_session.close()
+    mongo_client.close()
+
+
+@app.after_request
+async def allow_cors(response):
+    # Same effect as flask_cors' CORS(app) defaults in app.py
+    response.headers.setdefault("Access-Control-Allow-Origin", "*")
+    return response
+
+
+@app.route("/randomize_feed", methods=["GET"])
+async def randomize_feed():
+    """API endpoint to fetch a random video that hasn't been returned yet."""
+    user_id = request.args.get("user_id")
+    if not user_id:
+        return {"error": "Missing user_id parameter"}, 400
+
+    items = await asyncio.to_thread(feed_buffer.take, user_id, 1)
+    if not items:
+        return {"error": "No more new videos available."}, 403
+    return items[0]
+
+
+async def _file_doc(file_id):
+    doc = file_docs.get(file_id)
+    if doc is not None:
+        file_docs.move_to_end(file_id)
+        return doc
+    doc = await db["fs.files"].find_one({"_id": file_id})
+    if doc is not None:
+        file_docs[file_id] = doc
+        while len(file_docs) > MAX_CACHED_FILES:
+            file_docs.popitem(last=False)
+    return doc
+
+
+@app.route("/stream/<video_id>")
+async def stream_video(video_id):
+    """Streams an MP4 video stored in MongoDB GridFS, honouring Range and
+    conditional (If-None-Match / If-Modified-Since) requests."""
+    if not ObjectId.is_valid(video_id):
+        return {"error": "Video not found"}, 404
+    doc = await _file_doc(ObjectId(video_id))
+    if doc is None:
+        return {"error": "Video not found"}, 404
+
+    file_id = doc["_id"]
+    length = doc["length"]
+    chunk_size = doc["chunkSize"]
+    content_type = doc.get("contentType") or doc.get("metadata", {}).get("contentType") or "video/mp4"
+    etag, last_modified, headers = stream_headers(file_id, length, doc["uploadDate"])
+    chunks = db["fs.chunks"]
+
+    status, ranges = evaluate_request(request, etag, last_modified, length)
+    if status == 304:
+        return Response(b"", status=304, headers=headers)
+    if status == 416:
+        headers["Content-Range"] = f"bytes */{length}"
+        return Response(b"", status=416, headers=headers)
+    if status == 200:
+        headers["Content-Length"] = str(length)
+        body = aiter_file_range(chunks, file_id, 0, length - 1, chunk_size) if length else b""
+        return Response(body, status=200, headers=headers, content_type=content_type)
+
+    if len(ranges) == 1:
+        start, end = ranges[0]
+        headers["Content-Range"] = f"bytes {start}-{end}/{length}"
+        headers["Content-Length"] = str(end - start + 1)
+        body = aiter_file_range(chunks, file_id, start, end, chunk_size)
+        return Response(body, status=206, headers=headers, content_type=content_type)
+
+    boundary, part_headers, closing, content_length = multipart_layout(ranges, length, content_type)
+
+    async def generate():
+        for i, ((start, end), header) in enumerate(zip(ranges, part_headers)):
+            if i:
+                yield b"\r\n"
+            yield header
+            async for data in aiter_file_range(chunks, file_id, start, end, chunk_size):
+                yield data
+        yield closing
+
+    headers["Content-Length"] = str(content_length)
+    return Response(generate(), status=206, headers=headers,
+                    content_type=f"multipart/byteranges; boundary={boundary}")
+
+
+@app.route("/metrics")
+async def prometheus_metrics():
+    """Mongo, model and outbound HTTP timings in Prometheus text format."""
+    rendered = metrics.render()
+    if rendered is None:
+        return {"error": "Metrics are disabled (POLAR_METRICS=0)."}, 404
+    body, content_type = rendered
+    return Response(body, content_type=content_type)
+
+
+@app.route("/summary/<video_id>")
+async def generate_summary_from_video(video_id: str):
+    """
+    Generates a concise title and summary from a given video_id by fetching its transcript from MongoDB.
+    Returns the generated response as a string.
+    """
+    video_document = await db["videos"].find_one({"_id": ObjectId(video_id)}, {"transcript": 1})
+
+    if not video_document or "transcript" not in video_document:
+        return {"error": "Transcript not found for the provided video_id."}
+
+    transcript = video_document["transcript"]
+    if transcript == "":
+        print("Transcript empty")
+
+    # Memoised per transcript + prompt version; concurrent taps share one upstream call
+    try:
+        return await summary_cache.get_summary(transcript)
+    except SummaryError as e:
+        return str(e)
+
+
+if __name__ == "__main__":
+    app.run(debug=True, host="0.0.0.0", port=5001)
@@ -0,0 +1,223 @@
+"""
+Benchmarks for the feed, similarity, recommendation and streaming hot paths.
+
+For every catalog size a fresh synthetic corpus is generated (corpus.py), the
+app's in-process caches are reset, and each scenario is timed through the same
+entry points production uses (Flask test client for routes, recommender for
+library calls). Reports p50/p95/p99 latency and throughput per scenario, at
+several visited-set sizes for the feed, as JSON so runs can be diffed across
+commits.
+
+    python benchmarks/bench.py --sizes 1000,10000 --visited 0,0.5,0.9 --out bench.json
+    python benchmarks/bench.py --backend mongod --uri mongodb://localhost:27017
+    python benchmarks/bench.py --ingest      # also time the embedding/bias backfills (loads the models)
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+
+from corpus import generate_corpus
+from stand_in import BitwiseCollection, memory_client
+
+
+def summarize(samples, wall_seconds):
+    samples_ms = np.asarray(samples) * 1000
+    return {
+        "count": len(samples),
+        "p50_ms": round(float(np.percentile(samples_ms, 50)), 4),
+        "p95_ms": round(float(np.percentile(samples_ms, 95)), 4),
+        "p99_ms": round(float(np.percentile(samples_ms, 99)), 4),
+        "mean_ms": round(float(samples_ms.mean()), 4),
+        "throughput_per_s": round(len(samples) / wall_seconds, 2) if wall_seconds else None,
+    }
+
+
+def measure(fn, requests, warmup=10):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    started = time.perf_counter()
+    for _ in range(requests):
+        t = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t)
+    return summarize(samples, time.perf_counter() - started)
+
+
+def mark_visited(visited_collection, user_id, size, fraction, rng):
+    """Stores a visited bitmap covering `fraction` of feed indices for user_id."""
+    seen = np.zeros(size, dtype=bool)
+    seen[rng.choice(size, int(size * fraction), replace=False)] = True
+    bits = np.packbits(np.pad(seen, (0, -size % 32)), bitorder="little")
+    words = bits.view("<u4")
+    visited_collection.replace_one(
+        {"_id": user_id},
+        {"_id": user_id, "w": {str(k): int(word) for k, word in enumerate(words) if word}},
+        upsert=True
+    )
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=BACKEND_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=("memory", "mongod"), default="memory")
+    parser.add_argument("--uri", default="mongodb://localhost:27017")
+    parser.add_argument("--db", default="polar_bench")
+    parser.add_argument("--sizes", default="1000,10000")
+    parser.add_argument("--visited", default="0,0.5,0.9", help="visited fractions for the feed scenarios")
+    parser.add_argument("--requests", type=int, default=300, help="timed calls per scenario")
+    parser.add_argument("--blob-bytes", type=int, default=256 * 1024)
+    parser.add_argument("--blob-count", type=int, default=32)
+    parser.add_argument("--ingest", action="store_true")
+    parser.add_argument("--ingest-max", type=int, default=2000, help="largest catalog to run --ingest on")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="also write the JSON report here")
+    args = parser.parse_args()
+    sizes = [int(s) for s in args.sizes.split(",")]
+    fractions = [float(f) for f in args.visited.split(",")]
+
+    # Keep on-disk state (ANN index, snapshots) out of the real data directory
+    scratch = tempfile.mkdtemp(prefix="polar-bench-")
+    os.environ["ANN_INDEX_PATH"] = os.path.join(scratch, "ann_index.npz")
+    os.environ["EMBEDDING_SNAPSHOT_DIR"] = os.path.join(scratch, "snapshots")
+    os.environ.pop("VIDEO_CACHE_DISK_DIR", None)
+    os.environ["POLAR_WARMUP"] = "0"
+    sys.path.insert(0, BACKEND_DIR)
+
+    if args.backend == "memory":
+        client = memory_client()
+    else:
+        from pymongo import MongoClient
+        client = MongoClient(args.uri)
+
+    from database import dbConfig
+    dbConfig.DB_NAME = args.db
+    dbConfig._client = client
+    db = dbConfig.get_db()
+
+    import app as flask_app
+    import ann_index
+    import recommender
+    from database import dbOperations
+    from video_cache import VideoCache
+
+    visited_collection = db["visited_videos"]
+    if args.backend == "memory":
+        flask_app.visited_store.collection = BitwiseCollection(visited_collection)
+    http = flask_app.app.test_client()
+    rng = np.random.default_rng(args.seed)
+    results = []
+
+    def record(scenario, size, stats, **extra):
+        row = {"scenario": scenario, "catalog_size": size, **extra, **stats}
+        results.append(row)
+        print(json.dumps(row), file=sys.stderr)
+
+    for size in sizes:
+        for name in db.list_collection_names():
+            db[name].delete_many({})
+        generate_start = time.perf_counter()
+        ids = generate_corpus(db, size, args.blob_bytes, args.blob_count, seed=args.seed)
+        dbOperations.feed_cards.rebuild()
+        print(f"Generated {size} videos in {time.perf_counter() - generate_start:.1f}s", file=sys.stderr)
+
+        # Fresh in-process state for this corpus
+        flask_app.feed_sampler.catalog.last_full_reload = 0.0
+        flask_app.feed_buffer.buffers.clear()
+        flask_app.visited_store.cache.clear()
+        flask_app.video_cache = VideoCache(db)
+        dbOperations.video_bias_index.last_full_reload = 0.0
+        ann_index._index = None
+        if os.path.exists(ann_index.INDEX_PATH):
+            os.remove(ann_index.INDEX_PATH)
+
+        for fraction in fractions:
+            remaining = int(size * (1 - fraction))
+            for scenario, path in (("randomize_feed", "/randomize_feed?user_id={}"),
+                                   ("feed_batch_10", "/feed/batch?n=10&user_id={}")):
+                user_id = f"bench-{scenario}-{size}-{fraction}"
+                mark_visited(visited_collection, user_id, size, fraction, rng)
+                flask_app.visited_store.forget(user_id)
+                per_call = 10 if scenario == "feed_batch_10" else 1
+                requests = min(args.requests, remaining // per_call - 10)
+                if requests <= 0:
+                    continue
+
+                def call(url=path.format(user_id)):
+                    response = http.get(url)
+                    if response.status_code != 200:
+                        raise RuntimeError(f"{url} -> {response.status_code} {response.get_data(as_text=True)}")
+
+                record(scenario, size, measure(call, requests), visited_fraction=fraction)
+
+        sample_ids = [str(ids[i]) for i in rng.integers(0, size, args.requests + 10)]
+        cursor = iter(sample_ids)
+        record("similar_ann", size, measure(lambda: recommender.get_top_k_similar(next(cursor), 5), args.requests),
+               ann_index_size=len(ann_index.get_index() or []))
+        cursor = iter(sample_ids)
+        record("similar_exact", size,
+               measure(lambda: recommender.get_top_k_similar(next(cursor), 5, exact=True), args.requests))
+
+        user_ids = [
+            db["users"].insert_one({"bias_score": float(b), "num_poles": int(n)}).inserted_id
+            for b, n in zip(rng.uniform(-1, 1, 100), rng.integers(0, 50, 100))
+        ]
+        record("get_random_video", size,
+               measure(lambda: recommender.get_random_video(random.choice(user_ids)), args.requests))
+
+        blob_ids = [doc["_id"] for doc in db["fs.files"].find({}, {"_id": 1})]
+        for scenario, headers in (("stream_full", {}), ("stream_range_64k", {"Range": "bytes=0-65535"})):
+            def stream(headers=headers):
+                response = http.get(f"/stream/{random.choice(blob_ids)}", headers=headers)
+                response.get_data()
+                if response.status_code not in (200, 206):
+                    raise RuntimeError(f"/stream -> {response.status_code}")
+            record(scenario, size, measure(stream, args.requests), blob_bytes=args.blob_bytes)
+
+        if args.ingest and size <= args.ingest_max:
+            for scenario, backfill in (("ingest_embeddings", dbOperations.update_video_embeddings),
+                                       ("ingest_bias_scores", dbOperations.update_video_bias_scores)):
+                started = time.perf_counter()
+                updated = backfill()
+                wall = time.perf_counter() - started
+                record(scenario, size, {"count": updated, "seconds": round(wall, 3),
+                                        "throughput_per_s": round(updated / wall, 2) if wall else None})
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "backend": args.backend,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "args": vars(args),
+        },
+        "results": results,
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
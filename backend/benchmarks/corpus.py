@@ -0,0 +1,86 @@
+"""
+Synthetic corpus for the benchmarks: N videos with random 384-d embeddings,
+bias scores, transcripts and GridFS blobs, written straight into a database
+in the same shape dbOperations.insert_video + the ingest pipeline produce.
+
+    python benchmarks/corpus.py --uri mongodb://localhost:27017 --db polar_bench -n 10000
+"""
+import argparse
+import os
+import sys
+from datetime import datetime
+import numpy as np
+import gridfs
+from bson.objectid import ObjectId
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import embedding_codec
+
+WORDS = (
+    "policy tax healthcare border climate energy vote court rights school budget "
+    "market union police housing wage trade defense speech election debt reform"
+).split()
+
+
+def generate_corpus(db, n, blob_bytes=64 * 1024, blob_count=64, dim=384, seed=0, batch_size=1000):
+    """
+    Inserts n videos and returns their _ids. Only `blob_count` distinct GridFS
+    files of `blob_bytes` each are stored and shared round-robin, so large
+    catalogs don't need gigabytes of video data.
+    """
+    rng = np.random.default_rng(seed)
+    fs = gridfs.GridFS(db)
+    blob_ids = [
+        fs.put(rng.bytes(blob_bytes), filename=f"bench-{i}.mp4", contentType="video/mp4")
+        for i in range(max(1, min(blob_count, n)))
+    ]
+
+    now = datetime.utcnow()
+    ids = []
+    for start in range(0, n, batch_size):
+        count = min(batch_size, n - start)
+        embeddings = rng.normal(size=(count, dim)).astype(np.float32)
+        biases = rng.uniform(-1, 1, count)
+        docs = []
+        for i in range(count):
+            feed_index = start + i
+            transcript = " ".join(rng.choice(WORDS, size=int(rng.integers(50, 400))))
+            docs.append({
+                "_id": ObjectId(),
+                "uploader_id": f"bench-{feed_index % 100}",
+                "url": f"gridfs://{blob_ids[feed_index % len(blob_ids)]}",
+                "transcript": transcript,
+                "bias_score": float(biases[i]),
+                "embedding": embedding_codec.encode(embeddings[i]),
+                "embedding_updated_at": now,
+                "bias_updated_at": now,
+                "uploaded_at": now,
+                "feed_index": feed_index,
+                "ingest_status": "ready",
+            })
+        db["videos"].insert_many(docs)
+        ids.extend(doc["_id"] for doc in docs)
+    db["counters"].update_one({"_id": "feed_index"}, {"$set": {"seq": n}}, upsert=True)
+    return ids
+
+
+def main():
+    from pymongo import MongoClient
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uri", default=os.environ.get("MONGO_URI", "mongodb://localhost:27017"))
+    parser.add_argument("--db", default="polar_bench")
+    parser.add_argument("-n", type=int, default=10000)
+    parser.add_argument("--blob-bytes", type=int, default=64 * 1024)
+    parser.add_argument("--blob-count", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    client = MongoClient(args.uri)
+    client.drop_database(args.db)
+    ids = generate_corpus(client[args.db], args.n, args.blob_bytes, args.blob_count, seed=args.seed)
+    print(f"✅ Generated {len(ids)} videos in {args.db}.")
+
+
+if __name__ == "__main__":
+    main()
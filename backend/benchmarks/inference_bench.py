@@ -0,0 +1,146 @@
+"""
+CPU cost and output parity of the inference backends (inference_backend.py)
+for the embedding model and the zero-shot bias classifier. The first backend
+listed is the reference the others are compared against (default: fp32 torch).
+
+Per backend: load time, ms per transcript for embedding and for bias scoring,
+and against the reference: embedding cosine similarity (min / mean), bias
+score difference (max / mean) and how often the bias lands on the same side.
+
+    python benchmarks/inference_bench.py --backends torch,torch-int8,onnx --threads 4
+    python benchmarks/inference_bench.py --texts transcripts.txt --out inference.json
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from bench import git_commit
+from corpus import WORDS
+
+# Same-side comparison; matches the opposition / bias head neutral band
+NEUTRAL_BAND = 0.05
+
+
+def synthetic_transcripts(n, seed=0):
+    """Transcripts of 50-800 words, so long ones exercise the windowing."""
+    rng = np.random.default_rng(seed)
+    return [" ".join(rng.choice(WORDS, size=int(rng.integers(50, 800)))) for _ in range(n)]
+
+
+def sides(scores):
+    scores = np.asarray(scores)
+    return np.where(scores >= NEUTRAL_BAND, 1, np.where(scores <= -NEUTRAL_BAND, -1, 0))
+
+
+def run_backend(backend, texts, args):
+    import inference_backend
+    from database import dbOperations
+
+    row = {"backend": backend}
+    embeddings = scores = None
+    if not args.skip_embed:
+        started = time.perf_counter()
+        encoder = inference_backend.load_sentence_encoder(args.embedding_model, backend, args.threads)
+        row["embed_load_s"] = round(time.perf_counter() - started, 3)
+        encoder.encode(texts[:args.batch_size], batch_size=args.batch_size)  # warm-up
+        started = time.perf_counter()
+        embeddings = np.asarray(encoder.encode(texts, batch_size=args.batch_size), dtype=np.float32)
+        row["embed_ms_per_text"] = round((time.perf_counter() - started) / len(texts) * 1000, 3)
+        del encoder
+    if not args.skip_bias:
+        started = time.perf_counter()
+        classifier = inference_backend.load_zero_shot(args.bias_model, backend, args.threads)
+        row["bias_load_s"] = round(time.perf_counter() - started, 3)
+        dbOperations.score_transcripts(texts[:2], args.bias_batch_size, classifier)  # warm-up
+        started = time.perf_counter()
+        scores = np.asarray(dbOperations.score_transcripts(texts, args.bias_batch_size, classifier))
+        row["bias_ms_per_text"] = round((time.perf_counter() - started) / len(texts) * 1000, 3)
+        del classifier
+    return row, embeddings, scores
+
+
+def parity(row, reference_row, embeddings, reference_embeddings, scores, reference_scores):
+    if embeddings is not None and reference_embeddings is not None:
+        a = embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+        b = reference_embeddings / np.maximum(np.linalg.norm(reference_embeddings, axis=1, keepdims=True), 1e-12)
+        cosine = (a * b).sum(axis=1)
+        row["embed_cosine_min"] = round(float(cosine.min()), 6)
+        row["embed_cosine_mean"] = round(float(cosine.mean()), 6)
+        row["embed_speedup"] = round(reference_row["embed_ms_per_text"] / row["embed_ms_per_text"], 2)
+    if scores is not None and reference_scores is not None:
+        diff = np.abs(scores - reference_scores)
+        row["bias_abs_diff_max"] = round(float(diff.max()), 6)
+        row["bias_abs_diff_mean"] = round(float(diff.mean()), 6)
+        row["bias_same_side"] = round(float((sides(scores) == sides(reference_scores)).mean()), 4)
+        row["bias_speedup"] = round(reference_row["bias_ms_per_text"] / row["bias_ms_per_text"], 2)
+
+
+def main():
+    from database.dbOperations import BIAS_MODEL, BIAS_BATCH_SIZE
+    from vectorize_transcript import EMBEDDING_MODEL
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", default="torch,torch-int8,onnx")
+    parser.add_argument("--threads", type=int, default=None, help="intra-op threads (default: library default)")
+    parser.add_argument("--texts", help="file with one transcript per line (default: synthetic)")
+    parser.add_argument("-n", type=int, default=64, help="synthetic transcripts")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--bias-batch-size", type=int, default=BIAS_BATCH_SIZE)
+    parser.add_argument("--embedding-model", default=EMBEDDING_MODEL)
+    parser.add_argument("--bias-model", default=BIAS_MODEL)
+    parser.add_argument("--skip-embed", action="store_true")
+    parser.add_argument("--skip-bias", action="store_true")
+    parser.add_argument("--out", help="also write the JSON report here")
+    args = parser.parse_args()
+
+    if args.texts:
+        with open(args.texts) as f:
+            texts = [line.strip() for line in f if line.strip()]
+    else:
+        texts = synthetic_transcripts(args.n)
+
+    results = []
+    reference = None
+    for backend in args.backends.split(","):
+        try:
+            row, embeddings, scores = run_backend(backend, texts, args)
+        except ImportError as e:
+            print(f"⚠️ Skipping {backend}: {e}", file=sys.stderr)
+            results.append({"backend": backend, "skipped": str(e)})
+            continue
+        if reference is None:
+            reference = (row, embeddings, scores)
+        else:
+            parity(row, reference[0], embeddings, reference[1], scores, reference[2])
+        results.append(row)
+        print(json.dumps(row), file=sys.stderr)
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "texts": len(texts),
+            "args": vars(args),
+        },
+        "results": results,
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
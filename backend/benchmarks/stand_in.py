@@ -0,0 +1,82 @@
+"""
+In-memory stand-in for mongod, for running the benchmarks without a server.
+
+mongomock covers everything the hot paths use except the bitwise operators
+behind VisitedStore.claim ($bit updates and $bitsAnySet queries), so the
+visited collection is wrapped in BitwiseCollection. Latencies measured here
+are those of the Python code paths, not of a real database round trip; use a
+local mongod (--backend mongod) for end-to-end numbers.
+"""
+import threading
+from pymongo.errors import DuplicateKeyError
+
+
+def memory_client():
+    try:
+        import mongomock
+        import mongomock.collection
+        import mongomock.gridfs
+    except ImportError:
+        raise SystemExit("The in-memory backend needs mongomock: pip install mongomock")
+    mongomock.gridfs.enable_gridfs_integration()
+
+    # pymongo >= 4.9 passes sort= to bulk update ops, which mongomock doesn't accept yet
+    for name in ("add_update", "add_replace"):
+        method = getattr(mongomock.collection.BulkOperationBuilder, name, None)
+        if method is not None and not getattr(method, "_accepts_sort", False):
+            def accept_sort(self, *args, _method=method, sort=None, **kwargs):
+                return _method(self, *args, **kwargs)
+            accept_sort._accepts_sort = True
+            setattr(mongomock.collection.BulkOperationBuilder, name, accept_sort)
+
+    # mongomock edits the projection dict it is given; module-level projections
+    # (e.g. feed_buffer.CARD_PROJECTION) are shared across threads
+    find = mongomock.collection.Collection.find
+    if not getattr(find, "_copies_projection", False):
+        def copy_projection(self, filter=None, projection=None, *args, **kwargs):
+            if isinstance(projection, dict):
+                projection = dict(projection)
+            return find(self, filter, projection, *args, **kwargs)
+        copy_projection._copies_projection = True
+        mongomock.collection.Collection.find = copy_projection
+    return mongomock.MongoClient()
+
+
+class _UpdateResult:
+    def __init__(self, modified_count=0, upserted_id=None):
+        self.modified_count = modified_count
+        self.upserted_id = upserted_id
+
+
+class BitwiseCollection:
+    """
+    The two calls VisitedStore makes, with mongod's semantics for
+    {"_id": u, "w.<k>": {"$not": {"$bitsAnySet": mask}}} + {"$bit": {"w.<k>": {"or": mask}}}
+    + upsert=True: an already-set bit makes the upsert collide on _id.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.lock = threading.Lock()
+
+    def find_one(self, query, *args, **kwargs):
+        return self.collection.find_one(query, *args, **kwargs)
+
+    def update_one(self, query, update, upsert=False):
+        field = next(key for key in query if key != "_id")
+        mask = update["$bit"][field]["or"]
+        word = field.split(".", 1)[1]
+        with self.lock:
+            doc = self.collection.find_one({"_id": query["_id"]})
+            if doc is None:
+                if not upsert:
+                    return _UpdateResult()
+                self.collection.insert_one({"_id": query["_id"], "w": {word: mask}})
+                return _UpdateResult(upserted_id=query["_id"])
+            current = doc.get("w", {}).get(word, 0)
+            if current & mask:
+                if not upsert:
+                    return _UpdateResult()
+                raise DuplicateKeyError("E11000 duplicate key error (bit already set)")
+            self.collection.update_one({"_id": query["_id"]}, {"$set": {field: current | mask}})
+            return _UpdateResult(modified_count=1)
@@ -0,0 +1,72 @@
+"""
+Start-up benchmark for the Flask backend: wall-clock time to `import app` and
+peak RSS of the process, for a serving-only worker and for one that runs the
+warm-up hook.
+
+    python benchmarks/startup_bench.py [--runs 5] [--warmup] [--models]
+
+Each run is a fresh interpreter so nothing is shared between measurements.
+Prints one JSON document; exits non-zero if a serving-only worker takes longer
+than --max-seconds to import.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ("torch", "transformers", "sentence_transformers", "sklearn", "whisper")
+
+SNIPPET = f"""
+import json, resource, sys, time
+start = time.perf_counter()
+import app
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    "import_seconds": elapsed,
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "heavy_modules": [m for m in {HEAVY_MODULES!r} if m in sys.modules],
+}}))
+"""
+
+
+def measure(runs, env_overrides):
+    env = dict(os.environ, **env_overrides)
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", SNIPPET], cwd=BACKEND_DIR, env=env,
+                             capture_output=True, text=True, check=True)
+        samples.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    seconds = [s["import_seconds"] for s in samples]
+    rss = [s["max_rss_mb"] for s in samples]
+    return {
+        "runs": runs,
+        "import_seconds_median": statistics.median(seconds),
+        "import_seconds_max": max(seconds),
+        "max_rss_mb_median": statistics.median(rss),
+        "heavy_modules": samples[-1]["heavy_modules"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--warmup", action="store_true", help="also measure POLAR_WARMUP=1 (needs Mongo)")
+    parser.add_argument("--models", action="store_true", help="also load models during warm-up")
+    parser.add_argument("--max-seconds", type=float, default=1.0)
+    args = parser.parse_args()
+
+    results = {"serving": measure(args.runs, {"POLAR_WARMUP": "0"})}
+    if args.warmup:
+        results["warmup"] = measure(args.runs, {
+            "POLAR_WARMUP": "1", "POLAR_WARMUP_MODELS": "1" if args.models else "0"
+        })
+    print(json.dumps(results, indent=2))
+    if results["serving"]["import_seconds_max"] > args.max_seconds:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+import os
+import sys
+import threading
+import time
+import zlib
+from datetime import datetime
+import numpy as np
+import embedding_codec
+
+# -----------------------------------------------------------------------------
+# Bias head: a ridge-regression probe from a video's MiniLM embedding to the
+# bias score bart-large-mnli would give it. Trained on the zero-shot scores
+# already stored on videos, so scoring an upload is one dot product on the
+# embedding the ingest pipeline computed anyway; BART is only needed to
+# (re)label videos for training and periodic relabeling.
+#
+#   python bias_head.py --train [--ridge 1.0] [--promote] [--force]
+#   python bias_head.py --report [<version>]   # accuracy vs BART on the holdout
+#   python bias_head.py --list | --promote <version> | --score
+#
+# Heads are stored per version in bias_heads; {"_id": "active"} names the one
+# the ingest worker and --score use. Videos scored by a head get its version as
+# bias_version, so update_video_bias_scores (BART) relabels them on its next run
+# and only BART-labelled videos are ever used for training.
+# -----------------------------------------------------------------------------
+
+# Set BIAS_HEAD_ENABLED=0 to always score with BART
+ENABLED = os.environ.get("BIAS_HEAD_ENABLED", "1") == "1"
+RIDGE = float(os.environ.get("BIAS_HEAD_RIDGE", "1.0"))
+# Fraction of labelled videos (by _id hash) held out for the report
+HOLDOUT = float(os.environ.get("BIAS_HEAD_HOLDOUT", "0.2"))
+# Holdout correlation with BART a head needs before --promote accepts it
+MIN_CORRELATION = float(os.environ.get("BIAS_HEAD_MIN_CORRELATION", "0.8"))
+# Scores within +-band count as neutral when comparing sides
+NEUTRAL_BAND = float(os.environ.get("BIAS_HEAD_NEUTRAL_BAND", "0.05"))
+# How often (seconds) a process re-reads which head is active
+CHECK_INTERVAL = float(os.environ.get("BIAS_HEAD_CHECK_INTERVAL", "60"))
+TRAIN_BATCH_SIZE = 2048
+
+
+def _unit_rows(matrix):
+    return matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+
+
+def _sides(scores, band=NEUTRAL_BAND):
+    return np.where(scores >= band, 1, np.where(scores <= -band, -1, 0))
+
+
+def in_holdout(video_id, holdout=HOLDOUT):
+    """Deterministic train/holdout split, stable across runs and machines."""
+    return zlib.crc32(str(video_id).encode("utf-8")) % 10000 < holdout * 10000
+
+
+class BiasHead:
+    def __init__(self, weights, intercept, version, embedding_model, label_version, ridge=RIDGE,
+                 trained_at=None, n_train=0, report=None):
+        self.weights = np.asarray(weights, dtype=np.float32)
+        self.intercept = float(intercept)
+        self.version = version
+        self.embedding_model = embedding_model
+        self.label_version = label_version
+        self.ridge = ridge
+        self.trained_at = trained_at
+        self.n_train = n_train
+        self.report = report or {}
+
+    def score_many(self, matrix):
+        """Bias scores in [-1, 1] for an (n, dim) matrix of raw embeddings."""
+        matrix = _unit_rows(np.asarray(matrix, dtype=np.float32).reshape(-1, len(self.weights)))
+        return np.clip(matrix @ self.weights + self.intercept, -1.0, 1.0)
+
+    def score(self, embedding):
+        return float(self.score_many(embedding)[0])
+
+    def to_doc(self):
+        return {
+            "_id": self.version,
+            "weights": embedding_codec.encode(self.weights, "float32"),
+            "intercept": self.intercept,
+            "embedding_model": self.embedding_model,
+            "label_version": self.label_version,
+            "ridge": self.ridge,
+            "trained_at": self.trained_at,
+            "n_train": self.n_train,
+            "report": self.report,
+        }
+
+    @classmethod
+    def from_doc(cls, doc):
+        return cls(embedding_codec.decode(doc["weights"]), doc["intercept"], doc["_id"], doc["embedding_model"],
+                   doc["label_version"], doc.get("ridge", RIDGE), doc.get("trained_at"), doc.get("n_train", 0),
+                   doc.get("report"))
+
+
+class BiasHeads:
+    def __init__(self, heads_collection, videos_collection, label_version, embedding_model):
+        self.heads_collection = heads_collection
+        self.videos_collection = videos_collection
+        # Only BART scores from the current model + label set are used as labels
+        self.label_version = label_version
+        self.embedding_model = embedding_model
+        self._active = None
+        self._last_check = 0.0
+        self.lock = threading.Lock()
+
+    def _labelled_batches(self, batch_size=TRAIN_BATCH_SIZE):
+        """Yields (ids, embedding matrix, BART scores) for every labelled video."""
+        query = {"$and": [embedding_codec.EMBEDDING_FILTER, {
+            "bias_version": self.label_version, "embedding_model": self.embedding_model,
+        }]}
+        ids, stored, labels = [], [], []
+        for video in self.videos_collection.find(query, {"embedding": 1, "bias_score": 1}):
+            ids.append(video["_id"])
+            stored.append(video["embedding"])
+            labels.append(video.get("bias_score") or 0.0)
+            if len(ids) >= batch_size:
+                yield ids, embedding_codec.decode_matrix(stored), np.asarray(labels, dtype=np.float64)
+                ids, stored, labels = [], [], []
+        if ids:
+            yield ids, embedding_codec.decode_matrix(stored), np.asarray(labels, dtype=np.float64)
+
+    def train(self, ridge=RIDGE, holdout=HOLDOUT, batch_size=TRAIN_BATCH_SIZE):
+        """
+        Fits the head on the non-holdout labelled videos, streaming them in
+        batches into the normal equations (memory is O(dim^2), not O(videos)),
+        then evaluates it on the holdout and stores it as a new, inactive version.
+        """
+        gram = target = None
+        n_train = 0
+        for ids, matrix, labels in self._labelled_batches(batch_size):
+            train_rows = np.array([not in_holdout(video_id, holdout) for video_id in ids])
+            if not train_rows.any():
+                continue
+            features = np.hstack([_unit_rows(matrix[train_rows]), np.ones((train_rows.sum(), 1), dtype=np.float32)])
+            features = features.astype(np.float64)
+            if gram is None:
+                gram = np.zeros((features.shape[1], features.shape[1]))
+                target = np.zeros(features.shape[1])
+            gram += features.T @ features
+            target += features.T @ labels[train_rows]
+            n_train += int(train_rows.sum())
+        if not n_train:
+            raise ValueError("No BART-labelled videos with embeddings to train on; run update_video_bias_scores first.")
+
+        penalty = ridge * np.eye(len(gram))
+        penalty[-1, -1] = 0.0  # the intercept isn't shrunk
+        solution = np.linalg.solve(gram + penalty, target)
+
+        trained_at = datetime.utcnow()
+        head = BiasHead(solution[:-1], solution[-1], f"bias-head:{trained_at:%Y%m%dT%H%M%S}", self.embedding_model,
+                        self.label_version, ridge=ridge, trained_at=trained_at, n_train=n_train)
+        head.report = self.evaluate(head, holdout, batch_size)
+        self.heads_collection.replace_one({"_id": head.version}, head.to_doc(), upsert=True)
+        print(f"✅ Trained {head.version} on {n_train} videos.")
+        return head
+
+    def evaluate(self, head, holdout=HOLDOUT, batch_size=TRAIN_BATCH_SIZE):
+        """Compares the head's scores with BART's on the holdout videos."""
+        predicted, labels = [], []
+        scoring_seconds = 0.0
+        for ids, matrix, batch_labels in self._labelled_batches(batch_size):
+            rows = np.array([in_holdout(video_id, holdout) for video_id in ids])
+            if not rows.any():
+                continue
+            started = time.perf_counter()
+            predicted.append(head.score_many(matrix[rows]))
+            scoring_seconds += time.perf_counter() - started
+            labels.append(batch_labels[rows])
+        if not predicted:
+            return {"n": 0}
+
+        predicted, labels = np.concatenate(predicted).astype(np.float64), np.concatenate(labels)
+        errors = predicted - labels
+        agree = _sides(predicted) == _sides(labels)
+        correlation = float(np.corrcoef(predicted, labels)[0, 1]) if labels.std() and predicted.std() else 0.0
+        return {
+            "n": int(len(labels)),
+            "mae": float(np.abs(errors).mean()),
+            "rmse": float(np.sqrt((errors ** 2).mean())),
+            "correlation": correlation,
+            # Same side (left / neutral / right) as BART
+            "side_agreement": float(agree.mean()),
+            "opposite_side": float((_sides(predicted) * _sides(labels) == -1).mean()),
+            "microseconds_per_video": scoring_seconds / len(labels) * 1e6,
+        }
+
+    def get(self, version):
+        doc = self.heads_collection.find_one({"_id": version})
+        return BiasHead.from_doc(doc) if doc else None
+
+    def list_versions(self):
+        return [BiasHead.from_doc(doc) for doc in
+                self.heads_collection.find({"_id": {"$ne": "active"}}).sort("trained_at", -1)]
+
+    def promote(self, version, force=False):
+        """Makes `version` the active head; refuses a head whose holdout
+        correlation with BART is below MIN_CORRELATION unless forced."""
+        head = self.get(version)
+        if head is None:
+            raise ValueError(f"No bias head {version!r}.")
+        correlation = head.report.get("correlation", 0.0)
+        if correlation < MIN_CORRELATION and not force:
+            raise ValueError(f"{version} correlates {correlation:.3f} with BART on the holdout "
+                             f"(< {MIN_CORRELATION}); pass --force to promote anyway.")
+        self.heads_collection.replace_one(
+            {"_id": "active"}, {"_id": "active", "version": version, "promoted_at": datetime.utcnow()}, upsert=True
+        )
+        with self.lock:
+            self._active, self._last_check = head, time.time()
+        print(f"✅ {version} is now the active bias head.")
+        return head
+
+    def get_active(self):
+        """The active head if it matches the current embedding model and label
+        set (else None), re-reading the active pointer every CHECK_INTERVAL."""
+        if not ENABLED:
+            return None
+        now = time.time()
+        if now - self._last_check >= CHECK_INTERVAL:
+            with self.lock:
+                if now - self._last_check >= CHECK_INTERVAL:
+                    pointer = self.heads_collection.find_one({"_id": "active"})
+                    if pointer is None:
+                        self._active = None
+                    elif self._active is None or self._active.version != pointer["version"]:
+                        self._active = self.get(pointer["version"])
+                    self._last_check = now
+        head = self._active
+        if head is None or head.embedding_model != self.embedding_model or head.label_version != self.label_version:
+            return None
+        return head
+
+
+def print_report(head):
+    report = head.report
+    print(f"{head.version}  (trained {head.trained_at}, {head.n_train} videos, ridge={head.ridge})")
+    if not report.get("n"):
+        print("  no holdout videos to evaluate on")
+        return
+    print(f"  holdout videos     {report['n']}")
+    print(f"  MAE / RMSE vs BART {report['mae']:.4f} / {report['rmse']:.4f}")
+    print(f"  correlation        {report['correlation']:.4f}")
+    print(f"  same side as BART  {report['side_agreement']:.1%}  (opposite side {report['opposite_side']:.1%})")
+    print(f"  scoring cost       {report['microseconds_per_video']:.2f} µs/video")
+
+
+if __name__ == "__main__":
+    from database.dbOperations import bias_heads, update_video_bias_scores_from_head
+
+    args = sys.argv[1:]
+    if "--train" in args:
+        ridge = float(args[args.index("--ridge") + 1]) if "--ridge" in args else RIDGE
+        head = bias_heads.train(ridge=ridge)
+        print_report(head)
+        if "--promote" in args:
+            bias_heads.promote(head.version, force="--force" in args)
+    elif "--promote" in args:
+        bias_heads.promote(args[args.index("--promote") + 1], force="--force" in args)
+    elif "--report" in args:
+        position = args.index("--report") + 1
+        head = bias_heads.get(args[position]) if position < len(args) else bias_heads.get_active()
+        if head is None:
+            print("No such bias head (or none is active).")
+            sys.exit(1)
+        # Re-evaluated against the current labels, not the stored training-time report
+        head.report = bias_heads.evaluate(head)
+        print_report(head)
+    elif "--list" in args:
+        active = bias_heads.get_active()
+        for head in bias_heads.list_versions():
+            marker = "*" if active and head.version == active.version else " "
+            print(f"{marker} {head.version}  corr={head.report.get('correlation', 0):.3f}  n={head.n_train}")
+    elif "--score" in args:
+        update_video_bias_scores_from_head()
+    else:
+        print("Usage: python bias_head.py --train [--ridge R] [--promote [--force]] | --report [version] "
+              "| --list | --promote <version> [--force] | --score")
@@ -0,0 +1,123 @@
+import os
+import random
+import threading
+import time
+from bisect import bisect_left
+
+# -----------------------------------------------------------------------------
+# In-memory (bias_score, _id) index sorted by bias, so "the video whose bias is
+# closest to X" is a bisect over the whole catalog instead of the best of a
+# 10-document $sample.
+#
+# Write paths in this process update it directly; changes made elsewhere (e.g.
+# by ingest workers) are picked up through `bias_updated_at`, and a periodic
+# full reload also drops deleted videos.
+# -----------------------------------------------------------------------------
+
+# Seconds between checks for bias scores written by other processes
+REFRESH_INTERVAL = float(os.environ.get("BIAS_INDEX_REFRESH_INTERVAL", "5"))
+# Seconds between full reloads, which also pick up deletions
+FULL_RELOAD_INTERVAL = float(os.environ.get("BIAS_INDEX_FULL_RELOAD_INTERVAL", "600"))
+# Picks are drawn at random from this many nearest candidates
+JITTER_CANDIDATES = int(os.environ.get("BIAS_JITTER_CANDIDATES", "5"))
+
+
+class BiasIndex:
+    def __init__(self, videos_collection):
+        self.videos_collection = videos_collection
+        # Parallel lists kept sorted by score; score_of maps _id -> its score
+        self.scores = []
+        self.ids = []
+        self.score_of = {}
+        self.synced_until = None
+        self.last_refresh = 0.0
+        self.last_full_reload = 0.0
+        self.lock = threading.Lock()
+        # Loaded by the first refresh(), not here, so constructing is free
+
+    def __len__(self):
+        return len(self.ids)
+
+    def reload(self):
+        """Full scan of (bias_score, _id)."""
+        self.videos_collection.create_index("bias_updated_at")
+        pairs = []
+        synced_until = None
+        for video in self.videos_collection.find({}, {"bias_score": 1, "bias_updated_at": 1}):
+            pairs.append((float(video.get("bias_score") or 0.0), str(video["_id"])))
+            updated_at = video.get("bias_updated_at")
+            if updated_at and (synced_until is None or updated_at > synced_until):
+                synced_until = updated_at
+        pairs.sort()
+        with self.lock:
+            self.scores = [score for score, _ in pairs]
+            self.ids = [video_id for _, video_id in pairs]
+            self.score_of = {video_id: score for score, video_id in pairs}
+            self.synced_until = synced_until
+            self.last_refresh = self.last_full_reload = time.time()
+
+    def refresh(self, force=False):
+        """Cheap incremental refresh: only fetches scores written since the last one."""
+        now = time.time()
+        if now - self.last_full_reload >= FULL_RELOAD_INTERVAL:
+            self.reload()
+            return
+        if not force and now - self.last_refresh < REFRESH_INTERVAL:
+            return
+        self.last_refresh = now
+        query = {"bias_updated_at": {"$gte": self.synced_until}} if self.synced_until else {}
+        for video in self.videos_collection.find(query, {"bias_score": 1, "bias_updated_at": 1}):
+            self.update(video["_id"], video.get("bias_score") or 0.0)
+            updated_at = video.get("bias_updated_at")
+            if updated_at and (self.synced_until is None or updated_at > self.synced_until):
+                self.synced_until = updated_at
+
+    def _pop(self, video_id):
+        # Caller holds the lock
+        score = self.score_of.pop(video_id, None)
+        if score is None:
+            return
+        position = bisect_left(self.scores, score)
+        while self.ids[position] != video_id:
+            position += 1
+        del self.scores[position]
+        del self.ids[position]
+
+    def update(self, video_id, score):
+        """Inserts a video or moves it to its new score."""
+        video_id, score = str(video_id), float(score)
+        with self.lock:
+            if self.score_of.get(video_id) == score:
+                return
+            self._pop(video_id)
+            position = bisect_left(self.scores, score)
+            self.scores.insert(position, score)
+            self.ids.insert(position, video_id)
+            self.score_of[video_id] = score
+
+    def remove(self, video_id):
+        with self.lock:
+            self._pop(str(video_id))
+
+    def nearest(self, target, n=JITTER_CANDIDATES, exclude=()):
+        """The n video ids whose bias is closest to target, nearest first."""
+        with self.lock:
+            scores, ids = self.scores, self.ids
+            below = bisect_left(scores, target) - 1
+            above = below + 1
+            found = []
+            while len(found) < n and (below >= 0 or above < len(ids)):
+                if above >= len(ids) or (below >= 0 and target - scores[below] <= scores[above] - target):
+                    candidate = ids[below]
+                    below -= 1
+                else:
+                    candidate = ids[above]
+                    above += 1
+                if candidate not in exclude:
+                    found.append(candidate)
+            return found
+
+    def pick(self, target, jitter=JITTER_CANDIDATES, exclude=()):
+        """A random one of the `jitter` videos nearest to target, or None if empty."""
+        candidates = self.nearest(target, jitter, exclude)
+        return random.choice(candidates) if candidates else None
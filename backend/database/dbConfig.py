@@ -1,31 +1,88 @@
 # ✅ MongoDB Connection Setup
 from pymongo.mongo_client import MongoClient
 from pymongo.server_api import ServerApi
-from bson.objectid import ObjectId
-import pymongo
+import threading
 import gridfs
 import os
 
 # Use the provided connection URI
 uri = os.environ.get("MONGO_URI")
-# Create a new client and connect to the server
-client = MongoClient(uri, server_api=ServerApi('1'))
-db = client["polar_db"]
-fs = gridfs.GridFS(db)
+DB_NAME = "polar_db"
 
+# Nothing below touches the network at import time: the client, database and
+# GridFS handles are created on first use, so serving-only processes start fast.
+_client = None
+_fs = None
+_lock = threading.Lock()
+# Extra keyword arguments for MongoClient; must be set before first use
+client_options = {}
 
-# Send a ping to confirm a successful connection
-try:
-    client.admin.command('ping')
-    print("✅ Successfully connected to MongoDB Atlas!")
-    users_collection = db["users"]
-    videos_collection = db["videos"]
 
-    user = users_collection.find_one({"_id": ObjectId("67ba811352fcae1c36e18adc")})
-    print(user)
+def get_client():
+    """Creates the MongoClient on first use."""
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _client = MongoClient(uri, server_api=ServerApi('1'), **client_options)
+    return _client
 
-    # video = videos_collection.find_one({}, sort=[("_id", -1)])
-    # print(video)
 
-except Exception as e:
-    print(f"❌ Connection failed: {e}")
+def get_db():
+    return get_client()[DB_NAME]
+
+
+def get_fs():
+    global _fs
+    if _fs is None:
+        _fs = gridfs.GridFS(get_db())
+    return _fs
+
+
+def ping():
+    """Sends a ping to confirm a successful connection."""
+    try:
+        get_client().admin.command('ping')
+        print("✅ Successfully connected to MongoDB Atlas!")
+        return True
+    except Exception as e:
+        print(f"❌ Connection failed: {e}")
+        return False
+
+
+class _Lazy:
+    """Stands in for a pymongo object and resolves it on first access."""
+
+    def __init__(self, factory):
+        object.__setattr__(self, "_factory", factory)
+        object.__setattr__(self, "_target", None)
+
+    def _resolve(self):
+        if self._target is None:
+            object.__setattr__(self, "_target", self._factory())
+        return self._target
+
+    def __getattr__(self, name):
+        return getattr(self._resolve(), name)
+
+    def __getitem__(self, key):
+        return self._resolve()[key]
+
+    def __repr__(self):
+        return f"<lazy {self._target!r}>"
+
+
+def lazy_collection(name):
+    return _Lazy(lambda: get_db()[name])
+
+
+def lazy(factory):
+    """A handle resolved by calling factory() on first use."""
+    return _Lazy(factory)
+
+
+client = _Lazy(get_client)
+db = _Lazy(get_db)
+fs = _Lazy(get_fs)
+users_collection = lazy_collection("users")
+videos_collection = lazy_collection("videos")
@@ -1,17 +1,56 @@
 # ✅ Updated Schemas and Database Operations
 
-from .dbConfig import db, fs  # Assuming GridFS and db are initialized
+from .dbConfig import db, fs, lazy, lazy_collection  # Lazy handles; nothing connects at import
 from datetime import datetime
 from bson.objectid import ObjectId
+from pymongo import UpdateOne
+import hashlib
 import os
-from transformers import pipeline
 
-from vectorize_transcript import vectorize_transcript
-# from transcript import transcribe_mp4
+from vectorize_transcript import vectorize_transcript, vectorize_transcripts, EMBEDDING_MODEL_VERSION
+import vectorize_transcript as vectorizer
+import ann_index
+import inference_backend
+import embedding_codec
+import metrics
+import embedding_snapshot
+from feed_sampler import next_feed_index
+from ingest_queue import IngestQueue
+from bias_index import BiasIndex
+from bias_head import BiasHeads
+from feed_cards import FeedCards
+from opposition import OppositionPairs
+from summary_cache import SummaryCache
 
 # Collections
-users_collection = db["users"]
-videos_collection = db["videos"]
+users_collection = lazy_collection("users")
+videos_collection = lazy_collection("videos")
+checkpoints_collection = lazy_collection("checkpoints")
+bias_cache_collection = lazy_collection("bias_cache")
+ingest_jobs_collection = lazy_collection("ingest_jobs")
+opposition_pairs_collection = lazy_collection("opposition_pairs")
+bias_heads_collection = lazy_collection("bias_heads")
+
+# Compact per-video cards the feed and recommenders read instead of full video
+# documents; kept in sync by the write paths below. The first use backfills an
+# empty collection.
+feed_cards = FeedCards(lazy_collection("feed_cards"), videos_collection)
+feed_cards_collection = lazy(feed_cards.prepare)
+
+# New uploads are transcribed, embedded and bias-scored by ingest_worker.py
+ingest = IngestQueue(ingest_jobs_collection, videos_collection)
+# Videos sorted by bias_score, for balance-seeking picks over the whole catalog
+video_bias_index = BiasIndex(feed_cards_collection)
+# Similar videos from the other side, precomputed by `python opposition.py`
+opposition_pairs = OppositionPairs(videos_collection, opposition_pairs_collection, checkpoints_collection)
+# Mongo-backed + in-process LRU cache of "Learn More" summaries, shared by
+# /summary and learn_more.py
+summary_cache = SummaryCache(lazy_collection("summaries"))
+
+# Transcripts encoded per SentenceTransformer call / per bulk_write
+EMBEDDING_BATCH_SIZE = int(os.environ.get("EMBEDDING_BATCH_SIZE", "64"))
+# Transcript windows fed through the zero-shot pipeline per forward batch
+BIAS_BATCH_SIZE = int(os.environ.get("BIAS_BATCH_SIZE", "16"))
 
 # 🔹 User Operations
 def insert_user(username, email, bias_score):
@@ -35,24 +74,35 @@ def delete_user(user_id):
     return users_collection.delete_one({"_id": ObjectId(user_id)})
 
 # 🔹 Video Operations
-def insert_video(file_path, uploader_id, bias_score):
+def insert_video(file_path, uploader_id, bias_score, embedding=None):
+    """
+    Stores the file and its metadata and queues the video for transcription,
+    embedding and bias scoring; returns without waiting for any of them.
+    """
     # Save the video file to GridFS
     with open(file_path, "rb") as video_file:
         gridfs_id = fs.put(video_file, filename=file_path.split("/")[-1])
-    if os.path.isfile(file_path) and file_path.lower().endswith(".mp4"):
-        # transcript = transcribe_mp4(file_path)
-        transcript = ""
-    # Video metadata document
+    # Video metadata document; transcript is filled in by the ingest worker
     video = {
         "uploader_id": uploader_id,
         "url": f"gridfs://{gridfs_id}",
-        "transcript": transcript,
+        "transcript": "",
         "bias_score": bias_score,
-        "uploaded_at": datetime.utcnow()
+        "uploaded_at": datetime.utcnow(),
+        "feed_index": next_feed_index(db)
     }
+    video["bias_updated_at"] = video["uploaded_at"]
+    if embedding is not None:
+        video["embedding"] = embedding_codec.encode(embedding)
+        video["embedding_updated_at"] = video["uploaded_at"]
 
     # Insert metadata and return the auto-generated _id
     result = videos_collection.insert_one(video)
+    feed_cards.upsert(video)
+    if embedding is not None:
+        ann_index.add_vector(result.inserted_id, embedding)
+    video_bias_index.update(result.inserted_id, bias_score)
+    ingest.enqueue(result.inserted_id)
     return result.inserted_id
 
 def get_videos_by_uploader(uploader_id):
@@ -64,32 +114,157 @@ def delete_video(video_id):
         gridfs_id = video_data["url"].split("gridfs://")[-1]
         fs.delete(ObjectId(gridfs_id))
         videos_collection.delete_one({"_id": ObjectId(video_id)})
+        feed_cards.remove(ObjectId(video_id))
+        ingest.remove(ObjectId(video_id))
+        video_bias_index.remove(video_id)
+        opposition_pairs.remove(video_id)
+        ann_index.remove_vector(video_id)
         return True
     return False
 
-def update_video_bias_scores():
-    videos = videos_collection.find()
-    for video in videos:
-        transcript = video.get("transcript", "")
-        if transcript:
-            new_bias_score = get_bias_score(transcript)
-            videos_collection.update_one(
-                {"_id": video["_id"]},
-                {"$set": {"bias_score": new_bias_score}}
-            )
-    print("✅ All video bias scores have been updated.")
-
-def update_video_embeddings():
-    videos = videos_collection.find()
-    for video in videos:
-        transcript = video.get("transcript", "")
-        if transcript:
-            embedding = vectorize_transcript(transcript)
-            videos_collection.update_one(
-                {"_id": video["_id"]},
-                {"$set": {"embedding": embedding}}
-            )
-    print("✅ All video embeddings have been updated.")
+def update_video_bias_scores(batch_size=BIAS_BATCH_SIZE):
+    """
+    Re-scores only videos whose transcript or bias model/label set changed,
+    scoring them in batches and writing each batch with one bulk_write.
+    """
+    cursor = videos_collection.find(
+        {"transcript": {"$nin": ["", None]}}, {"transcript": 1, "bias_hash": 1, "bias_version": 1}
+    )
+    updated = 0
+    batch = []
+    for video in cursor:
+        text_hash = transcript_hash(video["transcript"])
+        if video.get("bias_hash") == text_hash and video.get("bias_version") == BIAS_SCORER_VERSION:
+            continue
+        batch.append((video["_id"], video["transcript"], text_hash))
+        if len(batch) >= batch_size:
+            updated += _write_bias_batch(batch, batch_size)
+            batch = []
+    if batch:
+        updated += _write_bias_batch(batch, batch_size)
+    print(f"✅ Video bias scores are up to date ({updated} re-scored).")
+    return updated
+
+def _write_bias_batch(batch, batch_size):
+    scores = get_bias_scores([text for _, text, _ in batch], batch_size=batch_size)
+    now = datetime.utcnow()
+    videos_collection.bulk_write([
+        UpdateOne({"_id": video_id}, {"$set": {
+            "bias_score": score,
+            "bias_hash": text_hash,
+            "bias_version": BIAS_SCORER_VERSION,
+            "bias_updated_at": now,
+        }})
+        for (video_id, _, text_hash), score in zip(batch, scores)
+    ], ordered=False)
+    feed_cards.update_many(
+        (video_id, {"bias_score": score, "bias_updated_at": now}) for (video_id, _, _), score in zip(batch, scores)
+    )
+    for (video_id, _, _), score in zip(batch, scores):
+        video_bias_index.update(video_id, score)
+    return len(batch)
+
+def update_video_bias_scores_from_head(batch_size=1000):
+    """
+    Scores every embedded video that has neither a current BART score nor a
+    score from the active bias head, straight from its stored embedding.
+    """
+    head = bias_heads.get_active()
+    if head is None:
+        print("⚠️ No active bias head for the current embedding model; train one with `python bias_head.py --train`.")
+        return 0
+    cursor = videos_collection.find({"$and": [embedding_codec.EMBEDDING_FILTER, {
+        "embedding_model": EMBEDDING_MODEL_VERSION,
+        "bias_version": {"$nin": [BIAS_SCORER_VERSION, head.version]},
+    }]}, {"embedding": 1, "embedding_hash": 1})
+    updated = 0
+    batch = []
+    for video in cursor:
+        batch.append(video)
+        if len(batch) >= batch_size:
+            updated += _write_head_batch(head, batch)
+            batch = []
+    if batch:
+        updated += _write_head_batch(head, batch)
+    print(f"✅ Scored {updated} videos with {head.version}.")
+    return updated
+
+def _write_head_batch(head, batch):
+    scores = head.score_many(embedding_codec.decode_matrix([video["embedding"] for video in batch]))
+    now = datetime.utcnow()
+    updates = [(video["_id"], {
+        "bias_score": float(score),
+        # The embedding is of this transcript, so its hash is the transcript's
+        "bias_hash": video.get("embedding_hash"),
+        "bias_version": head.version,
+        "bias_updated_at": now,
+    }) for video, score in zip(batch, scores)]
+    videos_collection.bulk_write([UpdateOne({"_id": video_id}, {"$set": fields}) for video_id, fields in updates],
+                                 ordered=False)
+    feed_cards.update_many(updates)
+    for video_id, fields in updates:
+        video_bias_index.update(video_id, fields["bias_score"])
+    return len(updates)
+
+def transcript_hash(transcript):
+    return hashlib.sha1(transcript.encode("utf-8")).hexdigest()
+
+def update_video_embeddings(batch_size=EMBEDDING_BATCH_SIZE, resume=True):
+    """
+    Re-embeds only videos whose transcript or embedding model changed since the
+    last run. Transcripts are encoded in batches, written with one bulk_write per
+    batch, and progress is checkpointed by _id so a crashed run can resume.
+    """
+    query = {"transcript": {"$nin": ["", None]}}
+    checkpoint = checkpoints_collection.find_one({"_id": "embedding_backfill"}) if resume else None
+    if checkpoint and checkpoint.get("model") == EMBEDDING_MODEL_VERSION:
+        query["_id"] = {"$gt": checkpoint["last_id"]}
+        print(f"Resuming embedding backfill after {checkpoint['last_id']}")
+
+    cursor = videos_collection.find(
+        query, {"transcript": 1, "embedding_hash": 1, "embedding_model": 1}
+    ).sort("_id", 1)
+
+    updated = 0
+    batch = []
+    for video in cursor:
+        text_hash = transcript_hash(video["transcript"])
+        if video.get("embedding_hash") == text_hash and video.get("embedding_model") == EMBEDDING_MODEL_VERSION:
+            continue
+        batch.append((video["_id"], video["transcript"], text_hash))
+        if len(batch) >= batch_size:
+            updated += _write_embedding_batch(batch, batch_size)
+            batch = []
+    if batch:
+        updated += _write_embedding_batch(batch, batch_size)
+
+    checkpoints_collection.delete_one({"_id": "embedding_backfill"})
+    if updated:
+        ann_index.save_index()
+        embedding_snapshot.export_snapshot(videos_collection)
+    print(f"✅ Video embeddings are up to date ({updated} re-embedded).")
+    return updated
+
+def _write_embedding_batch(batch, batch_size):
+    embeddings = vectorize_transcripts([text for _, text, _ in batch], batch_size=batch_size)
+    now = datetime.utcnow()
+    videos_collection.bulk_write([
+        UpdateOne({"_id": video_id}, {"$set": {
+            "embedding": embedding_codec.encode(embedding),
+            "embedding_hash": text_hash,
+            "embedding_model": EMBEDDING_MODEL_VERSION,
+            "embedding_updated_at": now,
+        }})
+        for (video_id, _, text_hash), embedding in zip(batch, embeddings)
+    ], ordered=False)
+    for (video_id, _, _), embedding in zip(batch, embeddings):
+        ann_index.add_vector(video_id, embedding)
+    checkpoints_collection.update_one(
+        {"_id": "embedding_backfill"},
+        {"$set": {"last_id": batch[-1][0], "model": EMBEDDING_MODEL_VERSION, "updated_at": now}},
+        upsert=True
+    )
+    return len(batch)
 
 def populate_sample_videos():
     user = get_user("0")
@@ -106,22 +281,28 @@ def populate_sample_videos():
     
 def get_video_closest_to_user_bias(user_id):
     # Step 1: Retrieve the user's bias score
-    user = users_collection.find_one({"_id": ObjectId(user_id)})
+    user = users_collection.find_one({"_id": ObjectId(user_id)}, {"bias_score": 1})
     if not user:
         return f"User with ID {user_id} not found."
     
     user_bias = user.get("bias_score", 0.0)  # Default bias score is 0.0 if not found
 
-    # Step 2: Randomly sample 10 videos from the database
-    random_videos = list(videos_collection.aggregate([{"$sample": {"size": 10}}]))
-    
-    if not random_videos:
-        return "No videos found in the database."
-
-    # Step 3: Find the video with the bias score closest to the user's bias
-    closest_video = min(random_videos, key=lambda video: abs(video["bias_score"] - user_bias))
+    # Step 2: Bisect the bias index for the closest videos, picking one of the nearest few
+    video_bias_index.refresh()
+    closest_video = None
+    while closest_video is None:
+        video_id = video_bias_index.pick(user_bias)
+        if video_id is None:
+            return "No videos found in the database."
+        closest_video = feed_cards_collection.find_one(
+            {"_id": ObjectId(video_id)}, {"uploader_id": 1, "url": 1, "bias_score": 1}
+        )
+        if closest_video is None:
+            # Deleted by another process since the last reload
+            video_bias_index.remove(video_id)
+            opposition_pairs.remove(video_id)
 
-    # Step 4: Return video details
+    # Step 3: Return video details
     return {
         "_id": str(closest_video["_id"]),
         "uploader_id": closest_video["uploader_id"],
@@ -131,13 +312,90 @@ def get_video_closest_to_user_bias(user_id):
 
 
 # from recommender.py
-# Load the zero-shot classification model
-classifier = pipeline("zero-shot-classification", model="facebook/bart-large-mnli")
+# The zero-shot classification model is loaded on first use (see get_classifier)
+BIAS_MODEL = "facebook/bart-large-mnli"
+_classifier = None
+
+def get_classifier():
+    global _classifier
+    if _classifier is None:
+        # fp32 PyTorch, int8-quantized or ONNX per INFERENCE_BACKEND
+        _classifier = inference_backend.load_zero_shot(BIAS_MODEL)
+    return _classifier
+
+def warm_up_models():
+    """Loads both models up front, e.g. in ingest workers before taking jobs."""
+    get_classifier()
+    vectorizer.get_model()
+
 # Labels for classification
 labels = ["progressive policies", "conservative policies", "neutral"]
+# Cached scores are only reused for the same model, inference backend and label set
+BIAS_SCORER_VERSION = (f"{inference_backend.version_key(BIAS_MODEL)}:"
+                       + hashlib.sha1("|".join(labels).encode("utf-8")).hexdigest()[:8])
+# Long transcripts are scored in overlapping word windows instead of being
+# truncated at the model's max length
+BIAS_WINDOW_WORDS = int(os.environ.get("BIAS_WINDOW_WORDS", "350"))
+BIAS_WINDOW_OVERLAP = int(os.environ.get("BIAS_WINDOW_OVERLAP", "50"))
+# Embedding probes trained on these scores; see bias_head.py
+bias_heads = BiasHeads(bias_heads_collection, videos_collection, BIAS_SCORER_VERSION, EMBEDDING_MODEL_VERSION)
+
+def _bias_from_result(result):
+    scores = {label: score for label, score in zip(result["labels"], result["scores"])}
+    return scores["conservative policies"] - scores["progressive policies"]
+
+def _transcript_windows(text):
+    words = text.split()
+    if len(words) <= BIAS_WINDOW_WORDS:
+        return [text]
+    step = max(1, BIAS_WINDOW_WORDS - BIAS_WINDOW_OVERLAP)
+    return [" ".join(words[start:start + BIAS_WINDOW_WORDS])
+            for start in range(0, len(words) - BIAS_WINDOW_OVERLAP, step)]
+
+def score_transcripts(texts, batch_size=BIAS_BATCH_SIZE, classifier=None):
+    """
+    Uncached bias scores: each transcript is split into windows, all windows
+    go through the classifier in batches, and each transcript's window scores
+    are averaged weighted by window length.
+    """
+    classifier = classifier or get_classifier()
+    text_windows = [_transcript_windows(text) for text in texts]
+    windows = [window for key_windows in text_windows for window in key_windows]
+    with metrics.timer(metrics.MODEL_SECONDS, model="bart_mnli"):
+        results = classifier(windows, labels, batch_size=batch_size)
+    if isinstance(results, dict):
+        results = [results]
+    scores = []
+    position = 0
+    for key_windows in text_windows:
+        window_results = results[position:position + len(key_windows)]
+        position += len(key_windows)
+        weights = [len(window.split()) or 1 for window in key_windows]
+        scores.append(float(sum(w * _bias_from_result(r) for w, r in zip(weights, window_results)) / sum(weights)))
+    return scores
+
+def get_bias_scores(texts, batch_size=BIAS_BATCH_SIZE):
+    """
+    Scores many transcripts at once. Results are cached in bias_cache keyed on
+    transcript hash + scorer version; only uncached transcripts are scored.
+    """
+    keys = [f"{transcript_hash(text)}:{BIAS_SCORER_VERSION}" for text in texts]
+    cached = {doc["_id"]: doc["bias_score"] for doc in bias_cache_collection.find({"_id": {"$in": list(set(keys))}})}
+
+    pending = {}
+    for key, text in zip(keys, texts):
+        if key not in cached and key not in pending:
+            pending[key] = text
+
+    if pending:
+        cached.update(zip(pending, score_transcripts(list(pending.values()), batch_size)))
+        bias_cache_collection.bulk_write([
+            UpdateOne({"_id": key}, {"$set": {"bias_score": cached[key], "version": BIAS_SCORER_VERSION}}, upsert=True)
+            for key in pending
+        ], ordered=False)
+
+    return [cached[key] for key in keys]
+
 def get_bias_score(text):
     """Calculates bias score based on text classification."""
-    result = classifier(text, labels)
-    scores = {label: score for label, score in zip(result["labels"], result["scores"])}
-    bias_score = scores["conservative policies"] - scores["progressive policies"]
-    return bias_score
\ No newline at end of file
+    return get_bias_scores([text])[0]
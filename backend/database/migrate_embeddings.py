@@ -0,0 +1,66 @@
+"""
+Rewrites stored embeddings in a packed BinData format (see embedding_codec),
+in _id order and one bulk_write per batch. Documents already in the target
+format are skipped, so the migration can be stopped and re-run at any time,
+including while the app is serving (readers accept every format).
+
+    python -m database.migrate_embeddings                  # float32
+    python -m database.migrate_embeddings --format int8 --batch-size 2000
+    python -m database.migrate_embeddings --dry-run        # report sizes only
+"""
+import argparse
+import bson
+from pymongo import UpdateOne
+import embedding_codec
+from database.dbOperations import videos_collection
+
+
+def migrate(storage=embedding_codec.STORAGE, batch_size=1000, dry_run=False):
+    """Converts every stored embedding to `storage`; returns (converted, bytes_before, bytes_after)."""
+    converted = bytes_before = bytes_after = 0
+    last_id = None
+    while True:
+        query = dict(embedding_codec.EMBEDDING_FILTER)
+        if last_id is not None:
+            query = {"$and": [query, {"_id": {"$gt": last_id}}]}
+        batch = list(videos_collection.find(query, {"embedding": 1}).sort("_id", 1).limit(batch_size))
+        if not batch:
+            break
+        last_id = batch[-1]["_id"]
+
+        updates = []
+        for video in batch:
+            stored = video["embedding"]
+            if embedding_codec.storage_format(stored) == storage:
+                continue
+            packed = embedding_codec.encode(embedding_codec.decode(stored), storage)
+            bytes_before += len(bson.encode({"embedding": stored}))
+            bytes_after += len(bson.encode({"embedding": packed}))
+            updates.append(UpdateOne({"_id": video["_id"], "embedding": stored}, {"$set": {"embedding": packed}}))
+        if updates and not dry_run:
+            # Matching on the old value leaves vectors re-embedded meanwhile alone
+            videos_collection.bulk_write(updates, ordered=False)
+        converted += len(updates)
+        print(f"… {converted} so far (through {last_id})")
+
+    return converted, bytes_before, bytes_after
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--format", choices=("float32", "int8", "list"), default=embedding_codec.STORAGE)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    converted, before, after = migrate(args.format, args.batch_size, args.dry_run)
+    verb = "Would convert" if args.dry_run else "Converted"
+    if converted:
+        print(f"✅ {verb} {converted} embeddings to {args.format}: "
+              f"{before / converted:.0f} → {after / converted:.0f} bytes per vector.")
+    else:
+        print(f"✅ All embeddings are already stored as {args.format}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,7 @@ VideosSchema = {
     "uploader_id": str,
     "url": str,
     "bias_score": float,
-    "embedding": list,
+    # Packed float32/int8 BinData (see embedding_codec); older documents hold a list of doubles
+    "embedding": (bytes, list),
     "transcript": str
 }
\ No newline at end of file
@@ -0,0 +1,79 @@
+import os
+import numpy as np
+from bson.binary import Binary
+
+# -----------------------------------------------------------------------------
+# Packed embedding storage. A 384-d vector as a BSON double array costs ~4.5KB
+# (a type tag and a "0".."383" key per element) and is rebuilt element by
+# element on every read; packed into BinData it is one length-prefixed blob
+# that np.frombuffer reads in place.
+#
+#   float32  subtype 0x80: dim little-endian float32s             (4 * dim bytes)
+#   int8     subtype 0x81: float32 scale, then dim int8s, x = q * scale  (dim + 4 bytes)
+#
+# Writers use EMBEDDING_STORAGE (float32 | int8 | list); readers go through
+# decode(), which also accepts the legacy double arrays, so documents can be
+# migrated (database/migrate_embeddings.py) while the app is serving.
+# -----------------------------------------------------------------------------
+
+STORAGE = os.environ.get("EMBEDDING_STORAGE", "float32")
+
+FLOAT32_SUBTYPE = 0x80
+INT8_SUBTYPE = 0x81
+_FLOAT32 = np.dtype("<f4")
+
+# Matches documents that have a non-empty embedding in any of the formats
+EMBEDDING_FILTER = {"$or": [{"embedding.0": {"$exists": True}}, {"embedding": {"$type": "binData"}}]}
+
+
+def encode(vector, storage=STORAGE):
+    """Packs an embedding for storage in the given format."""
+    vector = np.asarray(vector, dtype=np.float32).ravel()
+    if storage == "float32":
+        return Binary(vector.astype(_FLOAT32, copy=False).tobytes(), FLOAT32_SUBTYPE)
+    if storage == "int8":
+        scale = float(np.abs(vector).max()) / 127.0 or 1.0
+        quantized = np.clip(np.rint(vector / scale), -127, 127).astype(np.int8)
+        return Binary(np.float32(scale).astype(_FLOAT32).tobytes() + quantized.tobytes(), INT8_SUBTYPE)
+    if storage == "list":
+        return vector.tolist()
+    raise ValueError(f"Unknown embedding storage format: {storage!r}")
+
+
+def storage_format(value):
+    """The format of a stored embedding value: float32, int8, list or None."""
+    if isinstance(value, Binary):
+        return {FLOAT32_SUBTYPE: "float32", INT8_SUBTYPE: "int8"}.get(value.subtype)
+    if isinstance(value, list):
+        return "list"
+    return None
+
+
+def decode(value):
+    """
+    Returns the stored embedding as a float32 vector, or None if there isn't
+    one. float32 blobs are a read-only view over the BSON bytes (no copy).
+    """
+    if value is None or not len(value):
+        return None
+    if isinstance(value, Binary):
+        if value.subtype == FLOAT32_SUBTYPE:
+            return np.frombuffer(value, dtype=_FLOAT32)
+        if value.subtype == INT8_SUBTYPE:
+            scale = np.frombuffer(value, dtype=_FLOAT32, count=1)[0]
+            return np.frombuffer(value, dtype=np.int8, offset=4).astype(np.float32) * scale
+        raise ValueError(f"Unknown embedding BinData subtype: {value.subtype:#x}")
+    return np.asarray(value, dtype=np.float32)
+
+
+def decode_matrix(values, dim=None):
+    """Decodes many stored embeddings into one writable (n, dim) float32 matrix."""
+    values = list(values)
+    if not values:
+        return np.zeros((0, dim or 0), dtype=np.float32)
+    first = decode(values[0])
+    matrix = np.empty((len(values), dim or len(first)), dtype=np.float32)
+    matrix[0] = first
+    for row, value in enumerate(values[1:], start=1):
+        matrix[row] = decode(value)
+    return matrix
@@ -0,0 +1,151 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime
+import numpy as np
+import embedding_codec
+
+# -----------------------------------------------------------------------------
+# On-disk float32 snapshot of every video embedding, shared between worker
+# processes through the page cache via np.memmap.
+#
+#   <dir>/CURRENT                  {"version": ..., "count": ..., "dim": ..., "created_at": ...}
+#   <dir>/embeddings-<version>.f32 (count, dim) L2-normalised float32 rows
+#   <dir>/embeddings-<version>.ids.npy  sorted video ids, one per row
+#
+# A new snapshot is written under a fresh version and published by atomically
+# replacing CURRENT, so readers never see a half-written matrix.
+# -----------------------------------------------------------------------------
+
+SNAPSHOT_DIR = os.environ.get(
+    "EMBEDDING_SNAPSHOT_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "snapshots")
+)
+# How often (seconds) a worker checks CURRENT for a newer version
+CHECK_INTERVAL = float(os.environ.get("EMBEDDING_SNAPSHOT_CHECK_INTERVAL", "5"))
+KEEP_VERSIONS = 2
+
+EMBEDDING_FILTER = embedding_codec.EMBEDDING_FILTER
+
+
+def _paths(directory, version):
+    base = os.path.join(directory, f"embeddings-{version}")
+    return base + ".f32", base + ".ids.npy"
+
+
+class EmbeddingSnapshot:
+    """Read-only view of one snapshot version."""
+
+    def __init__(self, directory, meta):
+        self.version = meta["version"]
+        self.dim = meta["dim"]
+        self.created_at = datetime.fromisoformat(meta["created_at"])
+        matrix_path, ids_path = _paths(directory, self.version)
+        count = meta["count"]
+        self.matrix = (np.memmap(matrix_path, dtype=np.float32, mode="r", shape=(count, self.dim))
+                       if count else np.zeros((0, self.dim), dtype=np.float32))
+        self.ids = np.load(ids_path, mmap_mode="r")
+
+    def __len__(self):
+        return len(self.ids)
+
+    def row(self, video_id):
+        """Row index of video_id, or None if it isn't in this snapshot."""
+        video_id = str(video_id)
+        row = int(np.searchsorted(self.ids, video_id))
+        if row < len(self.ids) and self.ids[row] == video_id:
+            return row
+        return None
+
+    def vector(self, video_id):
+        row = self.row(video_id)
+        return None if row is None else np.asarray(self.matrix[row])
+
+
+def export_snapshot(videos_collection, directory=SNAPSHOT_DIR, dim=384):
+    """Streams every embedding into a new snapshot version and publishes it."""
+    os.makedirs(directory, exist_ok=True)
+    version = time.time_ns()
+    created_at = datetime.utcnow()
+    matrix_path, ids_path = _paths(directory, version)
+
+    ids = []
+    cursor = videos_collection.find(EMBEDDING_FILTER, {"_id": 1, "embedding": 1}).sort("_id", 1)
+    with open(matrix_path, "wb") as f:
+        for video in cursor:
+            vector = embedding_codec.decode(video["embedding"])
+            if vector.shape != (dim,):
+                continue
+            norm = np.linalg.norm(vector)
+            f.write((vector / norm if norm else vector).tobytes())
+            ids.append(str(video["_id"]))
+    np.save(ids_path, np.array(ids, dtype="U24"))
+
+    meta = {"version": version, "count": len(ids), "dim": dim, "created_at": created_at.isoformat()}
+    tmp_path = os.path.join(directory, f"CURRENT.{version}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, os.path.join(directory, "CURRENT"))
+    _prune(directory, version)
+    print(f"✅ Embedding snapshot {version} written: {len(ids)} vectors.")
+    return meta
+
+
+def _prune(directory, current_version):
+    """Deletes all but the newest KEEP_VERSIONS snapshots. Workers that still
+    have an old matrix mapped keep reading it until they switch."""
+    versions = set()
+    for name in os.listdir(directory):
+        if name.startswith("embeddings-"):
+            versions.add(int(name[len("embeddings-"):].split(".")[0]))
+    for version in sorted(versions)[:-KEEP_VERSIONS]:
+        if version == current_version:
+            continue
+        for path in _paths(directory, version):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def read_current(directory=SNAPSHOT_DIR):
+    try:
+        with open(os.path.join(directory, "CURRENT")) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+# -----------------------------------------------------------------------------
+# Per-process handle that follows CURRENT
+# -----------------------------------------------------------------------------
+_snapshot = None
+_last_check = 0.0
+_lock = threading.Lock()
+
+
+def get_snapshot(directory=SNAPSHOT_DIR):
+    """Returns the newest published snapshot (or None), re-checking CURRENT at
+    most every CHECK_INTERVAL seconds."""
+    global _snapshot, _last_check
+    now = time.time()
+    if _snapshot is not None and now - _last_check < CHECK_INTERVAL:
+        return _snapshot
+    with _lock:
+        _last_check = now
+        meta = read_current(directory)
+        if meta is None:
+            return _snapshot
+        if _snapshot is None or _snapshot.version != meta["version"]:
+            try:
+                _snapshot = EmbeddingSnapshot(directory, meta)
+            except FileNotFoundError:
+                # Pruned between reading CURRENT and opening; pick it up next time
+                pass
+        return _snapshot
+
+
+if __name__ == "__main__":
+    from database.dbOperations import videos_collection
+
+    export_snapshot(videos_collection)
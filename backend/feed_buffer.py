@@ -0,0 +1,147 @@
+import os
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+# -----------------------------------------------------------------------------
+# Per-user buffer of ready-to-serve feed items in front of FeedSampler.
+#
+# Buffered items are only candidates: a video is claimed in the visited bitmap
+# when it is actually served, so a buffer that is evicted, dropped on restart
+# or raced by another worker never marks anything as seen. Buffers are topped
+# up in the background once they run low, so a burst of swipes is served from
+# memory with one batched metadata query per refill.
+# -----------------------------------------------------------------------------
+
+# Items kept ready per active user
+BUFFER_SIZE = int(os.environ.get("FEED_BUFFER_SIZE", "10"))
+# Refill in the background once a buffer drops below this
+REFILL_THRESHOLD = int(os.environ.get("FEED_BUFFER_REFILL_THRESHOLD", "4"))
+# Users with a buffer per process
+MAX_BUFFERED_USERS = int(os.environ.get("FEED_BUFFER_USERS", "10000"))
+# Upper bound on n for /feed/batch
+MAX_BATCH = int(os.environ.get("FEED_BATCH_MAX", "20"))
+
+CARD_PROJECTION = {"uploader_id": 1, "url": 1, "bias_score": 1}
+
+
+class FeedBuffer:
+    def __init__(self, sampler, cards_collection, size=BUFFER_SIZE,
+                 refill_threshold=REFILL_THRESHOLD, max_users=MAX_BUFFERED_USERS):
+        self.sampler = sampler
+        self.cards_collection = cards_collection
+        self.size = size
+        self.refill_threshold = refill_threshold
+        self.max_users = max_users
+        self.buffers = OrderedDict()  # user_id -> deque of (feed_index, item)
+        self.refilling = set()
+        self.lock = threading.Lock()
+        self.refiller = ThreadPoolExecutor(max_workers=2, thread_name_prefix="feed-refill")
+        self.stats = {"served": 0, "sync_refills": 0, "background_refills": 0, "lost_claims": 0}
+
+    def _buffer(self, user_id):
+        # Caller holds the lock
+        buffer = self.buffers.get(user_id)
+        if buffer is None:
+            buffer = self.buffers[user_id] = deque()
+            while len(self.buffers) > self.max_users:
+                self.buffers.popitem(last=False)
+        self.buffers.move_to_end(user_id)
+        return buffer
+
+    def _load(self, user_id, n, exclude):
+        """Picks up to n unvisited videos and fetches their feed cards in one query."""
+        indexes = self.sampler.candidate_indexes(user_id, n, exclude)
+        ids = self.sampler.catalog.ids
+        index_of = {ids[i]: i for i in indexes if i < len(ids) and ids[i] is not None}
+        items = []
+        for video in self.cards_collection.find({"_id": {"$in": list(index_of)}}, CARD_PROJECTION):
+            url = video.get("url", "")
+            if not url.startswith("gridfs://"):
+                continue
+            gridfs_id = url.replace("gridfs://", "")
+            items.append((index_of.pop(video["_id"]), {
+                "_id": str(video["_id"]),
+                "uploader_id": video.get("uploader_id"),
+                "gridfs_id": gridfs_id,
+                "stream_url": f"/stream/{gridfs_id}",
+                "bias_score": video.get("bias_score"),
+            }))
+        # Deleted or url-less videos would be picked again forever; count them as seen
+        for index in index_of.values():
+            self.sampler.visited.claim(user_id, index)
+        return items
+
+    def refill(self, user_id, extra=0):
+        """Tops the user's buffer up to size (+ extra); returns how many were added."""
+        with self.lock:
+            buffer = self._buffer(user_id)
+            exclude = {index for index, _ in buffer}
+            missing = self.size + extra - len(buffer)
+        if missing <= 0:
+            return 0
+        items = self._load(user_id, missing, exclude)
+        with self.lock:
+            buffer = self._buffer(user_id)
+            known = {index for index, _ in buffer}
+            fresh = [item for item in items if item[0] not in known]
+            buffer.extend(fresh)
+        return len(fresh)
+
+    def _schedule_refill(self, user_id):
+        with self.lock:
+            if user_id in self.refilling or len(self._buffer(user_id)) >= self.refill_threshold:
+                return
+            self.refilling.add(user_id)
+
+        def run():
+            try:
+                self.refill(user_id)
+                with self.lock:
+                    self.stats["background_refills"] += 1
+            except Exception as e:
+                print(f"❌ Feed buffer refill for {user_id} failed: {e}")
+            finally:
+                with self.lock:
+                    self.refilling.discard(user_id)
+        self.refiller.submit(run)
+
+    def take(self, user_id, n=1):
+        """Claims and returns up to n unvisited feed items for the user."""
+        n = max(1, min(n, MAX_BATCH))
+        served = []
+        while len(served) < n:
+            with self.lock:
+                buffer = self._buffer(user_id)
+                entry = buffer.popleft() if buffer else None
+            if entry is None:
+                with self.lock:
+                    self.stats["sync_refills"] += 1
+                if not self.refill(user_id, extra=n - len(served)):
+                    with self.lock:
+                        # A background refill may have filled it meanwhile
+                        if not self._buffer(user_id):
+                            break
+                continue
+            index, item = entry
+            if not self.sampler.visited.claim(user_id, index):
+                # Served by another worker since it was buffered
+                with self.lock:
+                    self.stats["lost_claims"] += 1
+                continue
+            served.append(item)
+        with self.lock:
+            self.stats["served"] += len(served)
+        self._schedule_refill(user_id)
+        return served
+
+    def discard(self, user_id):
+        """Drops a user's buffer; nothing in it was claimed, so nothing is lost."""
+        with self.lock:
+            self.buffers.pop(user_id, None)
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+            stats["buffered_users"] = len(self.buffers)
+            return stats
@@ -0,0 +1,102 @@
+import sys
+import threading
+from pymongo import DeleteOne, ReplaceOne, UpdateOne
+from feed_sampler import assign_missing_feed_indexes
+
+# -----------------------------------------------------------------------------
+# feed_cards: a compact read model of the videos collection holding only what
+# the feed and the recommenders serve or scan. A card is ~150 bytes where a
+# video document carries the transcript and embedding too, so catalog loads,
+# bias-index scans and card lookups never pull those over the wire.
+#
+#   {_id, uploader_id, url, bias_score, bias_updated_at, feed_index}
+#
+# The videos collection stays canonical: every dbOperations / ingest write
+# that touches one of these fields also updates the card. `python
+# feed_cards.py --rebuild` recopies them all (e.g. after writes made by code
+# that predates this collection); an empty collection is backfilled on first use.
+# -----------------------------------------------------------------------------
+
+CARD_FIELDS = ("uploader_id", "url", "bias_score", "bias_updated_at", "feed_index")
+BACKFILL_BATCH_SIZE = 1000
+
+
+class FeedCards:
+    def __init__(self, cards_collection, videos_collection):
+        self.cards_collection = cards_collection
+        self.videos_collection = videos_collection
+        self.prepared = False
+        self.lock = threading.Lock()
+
+    def prepare(self):
+        """Returns the cards collection, backfilling it first if it is empty
+        while videos exist. Runs the check once per process."""
+        if not self.prepared:
+            with self.lock:
+                if not self.prepared:
+                    if (self.cards_collection.estimated_document_count() == 0
+                            and self.videos_collection.estimated_document_count() > 0):
+                        self.rebuild()
+                    self.prepared = True
+        return self.cards_collection
+
+    @staticmethod
+    def card_fields(fields):
+        """The subset of a video document / $set that belongs on its card."""
+        return {field: fields[field] for field in CARD_FIELDS if field in fields}
+
+    def upsert(self, video):
+        """Writes the card for a full video document (must include _id)."""
+        card = {"_id": video["_id"], **self.card_fields(video)}
+        self.cards_collection.replace_one({"_id": card["_id"]}, card, upsert=True)
+
+    def update(self, video_id, fields):
+        """Mirrors a $set on a video onto its card; no-op if no card field changed."""
+        card = self.card_fields(fields)
+        if card:
+            self.cards_collection.update_one({"_id": video_id}, {"$set": card})
+
+    def update_many(self, updates):
+        """Mirrors many (video_id, fields) $sets with one bulk_write."""
+        requests = [UpdateOne({"_id": video_id}, {"$set": self.card_fields(fields)})
+                    for video_id, fields in updates if self.card_fields(fields)]
+        if requests:
+            self.cards_collection.bulk_write(requests, ordered=False)
+
+    def remove(self, video_id):
+        self.cards_collection.delete_one({"_id": video_id})
+
+    def rebuild(self, batch_size=BACKFILL_BATCH_SIZE):
+        """Recopies every card from the videos collection and drops orphans;
+        returns how many cards were written."""
+        assign_missing_feed_indexes(self.videos_collection)
+        projection = {field: 1 for field in CARD_FIELDS}
+        written = 0
+        live = set()
+        batch = []
+        for video in self.videos_collection.find({}, projection):
+            live.add(video["_id"])
+            batch.append(ReplaceOne({"_id": video["_id"]}, video, upsert=True))
+            if len(batch) >= batch_size:
+                self.cards_collection.bulk_write(batch, ordered=False)
+                written += len(batch)
+                batch = []
+        if batch:
+            self.cards_collection.bulk_write(batch, ordered=False)
+            written += len(batch)
+
+        orphans = [DeleteOne({"_id": card["_id"]}) for card in self.cards_collection.find({}, {"_id": 1})
+                   if card["_id"] not in live]
+        if orphans:
+            self.cards_collection.bulk_write(orphans, ordered=False)
+        print(f"✅ Feed cards rebuilt: {written} written, {len(orphans)} orphans removed.")
+        return written
+
+
+if __name__ == "__main__":
+    from database.dbOperations import feed_cards
+
+    if "--rebuild" in sys.argv:
+        feed_cards.rebuild()
+    else:
+        print("Usage: python feed_cards.py --rebuild")
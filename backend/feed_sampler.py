@@ -0,0 +1,171 @@
+import os
+import random
+import threading
+import time
+import numpy as np
+from pymongo import ReturnDocument, UpdateOne
+
+# -----------------------------------------------------------------------------
+# Constant-time "never repeat until exhausted" sampling for /randomize_feed.
+#
+# Every video carries a dense, never-reused `feed_index`. A user's history is a
+# visited set over those indices (see visited_store.py), so picking an unseen
+# video is a few random probes into it, falling back to a vectorised scan of
+# the unvisited indices once the user has seen most of the catalog.
+# -----------------------------------------------------------------------------
+
+# Seconds between checks for newly uploaded videos
+CATALOG_REFRESH_INTERVAL = float(os.environ.get("FEED_CATALOG_REFRESH_INTERVAL", "30"))
+# Seconds between full reloads, which also pick up deletions
+CATALOG_FULL_RELOAD_INTERVAL = float(os.environ.get("FEED_CATALOG_FULL_RELOAD_INTERVAL", "600"))
+# Random probes before scanning for unvisited videos
+RANDOM_PROBES = 8
+
+
+def next_feed_index(db):
+    """Allocates the next dense feed_index from the counters collection."""
+    counter = db["counters"].find_one_and_update(
+        {"_id": "feed_index"}, {"$inc": {"seq": 1}}, upsert=True, return_document=ReturnDocument.AFTER
+    )
+    return counter["seq"] - 1
+
+
+def assign_missing_feed_indexes(videos_collection, cards_collection=None):
+    """Gives a feed_index to videos inserted before it existed. Indices are
+    allocated on the (canonical) videos collection and, if given, mirrored onto
+    feed cards that don't carry one yet."""
+    for video in videos_collection.find({"feed_index": {"$exists": False}}, {"_id": 1}).sort("_id", 1):
+        videos_collection.update_one(
+            {"_id": video["_id"], "feed_index": {"$exists": False}},
+            {"$set": {"feed_index": next_feed_index(videos_collection.database)}}
+        )
+    if cards_collection is not None:
+        unindexed = [card["_id"] for card in cards_collection.find({"feed_index": {"$exists": False}}, {"_id": 1})]
+        mirrored = [
+            UpdateOne({"_id": video["_id"]}, {"$set": {"feed_index": video["feed_index"]}})
+            for video in videos_collection.find(
+                {"_id": {"$in": unindexed}, "feed_index": {"$exists": True}}, {"feed_index": 1}
+            )
+        ]
+        if mirrored:
+            cards_collection.bulk_write(mirrored, ordered=False)
+
+
+class VideoCatalog:
+    """feed_index -> video _id (None for deleted or not-yet-seen indices)."""
+
+    def __init__(self, cards_collection, videos_collection):
+        # Scanned from the feed cards; new feed_index values are allocated on
+        # the canonical videos and mirrored onto the cards
+        self.cards_collection = cards_collection
+        self.videos_collection = videos_collection
+        self.ids = []
+        self.live = np.zeros(0, dtype=bool)
+        self.last_refresh = 0.0
+        self.last_full_reload = 0.0
+        self.lock = threading.Lock()
+        # Loaded by the first refresh(), not here, so constructing is free
+
+    def __len__(self):
+        return len(self.ids)
+
+    @staticmethod
+    def _place(ids, video):
+        index = video["feed_index"]
+        if index >= len(ids):
+            ids.extend([None] * (index + 1 - len(ids)))
+        ids[index] = video["_id"]
+
+    def _publish(self, ids):
+        # Readers don't take the lock, so swap in complete lists only
+        live = np.fromiter((video_id is not None for video_id in ids), dtype=bool, count=len(ids))
+        self.ids, self.live = ids, live
+
+    def reload(self):
+        """Full scan of (feed_index, _id): picks up new videos and deletions."""
+        # (feed_index, _id) covers both catalog scans
+        self.cards_collection.create_index([("feed_index", 1), ("_id", 1)])
+        assign_missing_feed_indexes(self.videos_collection, self.cards_collection)
+        with self.lock:
+            ids = []
+            for video in self.cards_collection.find({"feed_index": {"$exists": True}}, {"feed_index": 1}):
+                self._place(ids, video)
+            self._publish(ids)
+            self.last_refresh = self.last_full_reload = time.time()
+
+    def refresh(self, force=False):
+        """Cheap incremental refresh: only fetches indices past the known end."""
+        now = time.time()
+        if now - self.last_full_reload >= CATALOG_FULL_RELOAD_INTERVAL:
+            self.reload()
+            return
+        if not force and now - self.last_refresh < CATALOG_REFRESH_INTERVAL:
+            return
+        with self.lock:
+            ids = list(self.ids)
+            for video in self.cards_collection.find({"feed_index": {"$gte": len(ids)}}, {"feed_index": 1}):
+                self._place(ids, video)
+            self._publish(ids)
+            self.last_refresh = now
+
+
+class FeedSampler:
+    def __init__(self, cards_collection, videos_collection, visited_store):
+        self.catalog = VideoCatalog(cards_collection, videos_collection)
+        self.visited = visited_store
+        self.rng = random.Random()
+
+    def next_video_id(self, user_id):
+        """Claims and returns an unseen video _id for the user, or None once
+        they've seen the whole catalog."""
+        self.catalog.refresh()
+        while True:
+            index = self._pick_unvisited(user_id)
+            if index is None and not self._caught_up():
+                continue
+            if index is None:
+                return None
+            if not self.visited.claim(user_id, index):
+                continue
+            ids = self.catalog.ids
+            if index < len(ids) and ids[index] is not None:
+                return ids[index]
+
+    def candidate_indexes(self, user_id, n, exclude=()):
+        """Up to n distinct unvisited feed_indexes, without claiming them."""
+        self.catalog.refresh()
+        exclude = set(exclude)
+        picked = []
+        while len(picked) < n:
+            index = self._pick_unvisited(user_id, exclude)
+            if index is None:
+                if picked or self._caught_up():
+                    break
+                continue
+            exclude.add(index)
+            picked.append(index)
+        return picked
+
+    def _pick_unvisited(self, user_id, exclude=()):
+        ids, live = self.catalog.ids, self.catalog.live
+        n = min(len(ids), len(live))
+        live = live[:n]
+        if not n:
+            return None
+        for _ in range(RANDOM_PROBES):
+            index = self.rng.randrange(n)
+            if ids[index] is not None and index not in exclude and not self.visited.is_visited(user_id, index):
+                return index
+        seen = self.visited.visited(user_id).mask(n)
+        candidates = np.flatnonzero(live & ~seen)
+        if exclude:
+            candidates = np.setdiff1d(candidates, np.fromiter(exclude, dtype=np.int64), assume_unique=True)
+        if not len(candidates):
+            return None
+        return int(candidates[self.rng.randrange(len(candidates))])
+
+    def _caught_up(self):
+        """Forces a catalog refresh; True if no new videos turned up."""
+        size = len(self.catalog)
+        self.catalog.refresh(force=True)
+        return len(self.catalog) == size
@@ -0,0 +1,71 @@
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# -----------------------------------------------------------------------------
+# Local stand-in for the Hugging Face inference endpoint, for testing without
+# network access or an API key:
+#
+#   python hf_stub_server.py 8089
+#   HF_SUMMARY_API_URL=http://localhost:8089/models/mistral HUGGINGFACE_API_KEY=stub python app.py
+#
+# Text-generation requests ({"inputs": prompt}) get the prompt echoed back with
+# a canned summary appended, like the real endpoint does. Requests to a
+# .../whisper... path get a {"text": ...} transcription reply.
+# -----------------------------------------------------------------------------
+
+# Artificial latency per request, to make coalescing/caching visible
+STUB_DELAY = float(os.environ.get("HF_STUB_DELAY", "0.5"))
+
+request_count = 0
+_count_lock = threading.Lock()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        global request_count
+        with _count_lock:
+            request_count += 1
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(STUB_DELAY)
+
+        if "whisper" in self.path:
+            response = {"text": f" Stub transcript of {len(body)} bytes of audio."}
+        else:
+            payload = json.loads(body or b"{}")
+            response = [{"generated_text": payload.get("inputs", "") +
+                         "\nTitle: Stub Summary\nThis is a canned summary from the local stub server."}]
+        data = json.dumps(response).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        data = json.dumps({"requests": request_count}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port=8089):
+    """Starts the stub in a daemon thread and returns the server."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    import sys
+
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8089
+    print(f"✅ HF stub listening on http://127.0.0.1:{port}")
+    ThreadingHTTPServer(("127.0.0.1", port), StubHandler).serve_forever()
@@ -0,0 +1,136 @@
+import os
+
+# -----------------------------------------------------------------------------
+# How the transformer models run on CPU. Every model load goes through here so
+# the ingest fleet can trade a little precision for a lot of CPU time:
+#
+#   INFERENCE_BACKEND=torch        eager PyTorch, fp32 (default, the reference)
+#   INFERENCE_BACKEND=torch-int8   PyTorch with int8 dynamic quantization of every nn.Linear
+#   INFERENCE_BACKEND=onnx         exported ONNX graph on onnxruntime (needs optimum[onnxruntime])
+#
+#   INFERENCE_THREADS=<n>          intra-op threads per process (default: library default)
+#
+# Check a backend against the fp32 outputs before switching a fleet to it:
+#   python benchmarks/inference_bench.py --backends torch,torch-int8,onnx
+#
+# Non-default backends tag the stored embedding_model / bias_version (see
+# version_key), so switching one re-embeds and re-scores the catalog instead of
+# mixing its vectors with fp32 ones.
+# -----------------------------------------------------------------------------
+
+BACKENDS = ("torch", "torch-int8", "onnx")
+BACKEND = os.environ.get("INFERENCE_BACKEND", "torch")
+THREADS = int(os.environ.get("INFERENCE_THREADS", "0")) or None
+# Exported ONNX graphs are cached here, one directory per model
+ONNX_DIR = os.environ.get(
+    "INFERENCE_ONNX_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "onnx")
+)
+
+_threads_configured = False
+
+
+def version_key(model_name, backend=BACKEND):
+    """The model name for the fp32 torch reference, "<model>@<backend>" for the
+    others: their outputs differ slightly, so embeddings, bias scores and cache
+    entries produced by different backends are never treated as interchangeable."""
+    _check(backend)
+    return model_name if backend == "torch" else f"{model_name}@{backend}"
+
+
+def _check(backend):
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend {backend!r}; expected one of {', '.join(BACKENDS)}.")
+
+
+def configure_threads(threads=THREADS):
+    """Applies INFERENCE_THREADS to PyTorch once per process."""
+    global _threads_configured
+    if _threads_configured or not threads:
+        return
+    import torch
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(max(1, threads // 2))
+    except RuntimeError:
+        # Only settable before the first parallel op; intra-op is what matters here
+        pass
+    _threads_configured = True
+
+
+def _onnx_session_options(threads):
+    import onnxruntime
+    options = onnxruntime.SessionOptions()
+    if threads:
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+    return options
+
+
+def _require_optimum():
+    try:
+        import optimum.onnxruntime  # noqa: F401
+    except ImportError:
+        raise ImportError("INFERENCE_BACKEND=onnx needs optimum with onnxruntime: pip install 'optimum[onnxruntime]'")
+
+
+def _onnx_path(model_name):
+    return os.path.join(ONNX_DIR, model_name.strip("/").replace("/", "--"))
+
+
+def quantize_int8(module):
+    """int8 dynamic quantization of every nn.Linear: weights stored as int8,
+    activations quantized per batch at run time. Returns the module."""
+    import torch
+    return torch.quantization.quantize_dynamic(module, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+
+def load_zero_shot(model_name, backend=BACKEND, threads=THREADS):
+    """A transformers zero-shot-classification pipeline on the given backend."""
+    _check(backend)
+    configure_threads(threads)
+    from transformers import pipeline
+
+    if backend == "onnx":
+        _require_optimum()
+        from optimum.onnxruntime import ORTModelForSequenceClassification
+        from transformers import AutoTokenizer
+        path = _onnx_path(model_name)
+        options = _onnx_session_options(threads)
+        if os.path.isdir(path):
+            model = ORTModelForSequenceClassification.from_pretrained(path, session_options=options)
+            tokenizer = AutoTokenizer.from_pretrained(path)
+        else:
+            print(f"Exporting {model_name} to ONNX in {path} (first use only)...")
+            model = ORTModelForSequenceClassification.from_pretrained(model_name, export=True, session_options=options)
+            tokenizer = AutoTokenizer.from_pretrained(model_name)
+            model.save_pretrained(path)
+            tokenizer.save_pretrained(path)
+        return pipeline("zero-shot-classification", model=model, tokenizer=tokenizer)
+
+    classifier = pipeline("zero-shot-classification", model=model_name)
+    if backend == "torch-int8":
+        quantize_int8(classifier.model)
+    return classifier
+
+
+def load_sentence_encoder(model_name, backend=BACKEND, threads=THREADS):
+    """A SentenceTransformer on the given backend."""
+    _check(backend)
+    configure_threads(threads)
+    from sentence_transformers import SentenceTransformer
+
+    if backend == "onnx":
+        _require_optimum()
+        path = _onnx_path(model_name)
+        model_kwargs = {"provider": "CPUExecutionProvider", "session_options": _onnx_session_options(threads)}
+        if os.path.isdir(path):
+            return SentenceTransformer(path, backend="onnx", model_kwargs=model_kwargs)
+        print(f"Exporting {model_name} to ONNX in {path} (first use only)...")
+        model = SentenceTransformer(model_name, backend="onnx", model_kwargs=model_kwargs)
+        model.save_pretrained(path)
+        return model
+
+    model = SentenceTransformer(model_name, device="cpu")
+    if backend == "torch-int8":
+        quantize_int8(model)
+    return model
@@ -0,0 +1,127 @@
+import os
+import time
+import uuid
+from datetime import datetime
+from pymongo import ReturnDocument
+
+# -----------------------------------------------------------------------------
+# Mongo-backed work queue for newly uploaded videos.
+#
+# One job per video ({"_id": video_id, "stage": ..., "available_at": ...}) that
+# walks through STAGES. A worker claims a job by pushing its available_at one
+# lease into the future, so a crashed worker's job simply becomes claimable
+# again; failures are retried with exponential backoff. Progress is mirrored on
+# the video document as `ingest_status` plus `ingest.<stage>` status/timings.
+# -----------------------------------------------------------------------------
+
+STAGES = ("transcribe", "embed", "bias")
+# A claim older than this is assumed to belong to a crashed worker
+LEASE_SECONDS = int(os.environ.get("INGEST_LEASE_SECONDS", "900"))
+# Attempts per stage before the video is marked failed
+MAX_ATTEMPTS = int(os.environ.get("INGEST_MAX_ATTEMPTS", "3"))
+RETRY_BACKOFF = float(os.environ.get("INGEST_RETRY_BACKOFF", "5"))
+
+
+def next_stage(stage):
+    position = STAGES.index(stage) + 1
+    return STAGES[position] if position < len(STAGES) else None
+
+
+class IngestQueue:
+    def __init__(self, jobs_collection, videos_collection, lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS):
+        self.jobs_collection = jobs_collection
+        self.videos_collection = videos_collection
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.indexed = False
+
+    def _ensure_indexes(self):
+        if not self.indexed:
+            self.jobs_collection.create_index([("stage", 1), ("available_at", 1)])
+            self.indexed = True
+
+    def enqueue(self, video_id, stage=STAGES[0]):
+        """Queues (or re-queues) a video at `stage`; safe to call repeatedly."""
+        self._ensure_indexes()
+        now = time.time()
+        self.jobs_collection.update_one(
+            {"_id": video_id},
+            {"$set": {"stage": stage, "available_at": now, "attempts": 0, "claim": None},
+             "$setOnInsert": {"enqueued_at": now}},
+            upsert=True
+        )
+        self.videos_collection.update_one({"_id": video_id}, {"$set": {"ingest_status": stage}})
+
+    def claim(self, stage):
+        """Claims the oldest runnable job at `stage`; returns the job or None."""
+        self._ensure_indexes()
+        now = time.time()
+        job = self.jobs_collection.find_one_and_update(
+            {"stage": stage, "available_at": {"$lte": now}},
+            {"$set": {"available_at": now + self.lease_seconds, "claim": uuid.uuid4().hex},
+             "$inc": {"attempts": 1}},
+            sort=[("available_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+        if job is not None:
+            self.videos_collection.update_one({"_id": job["_id"]}, {"$set": {
+                f"ingest.{stage}.status": "running",
+                f"ingest.{stage}.started_at": datetime.utcnow(),
+                f"ingest.{stage}.attempts": job["attempts"],
+            }})
+        return job
+
+    def _release(self, job, update):
+        # Only the current holder of the claim may move the job on
+        return self.jobs_collection.update_one({"_id": job["_id"], "claim": job["claim"]}, update).matched_count
+
+    def complete(self, job, fields, seconds, skipped=False):
+        """
+        Writes a stage's output onto the video and advances the job; the last
+        stage removes it. Returns False if the lease was lost meanwhile.
+        """
+        stage = job["stage"]
+        following = next_stage(stage)
+        self.videos_collection.update_one({"_id": job["_id"]}, {"$set": {
+            **fields,
+            f"ingest.{stage}.status": "skipped" if skipped else "done",
+            f"ingest.{stage}.finished_at": datetime.utcnow(),
+            f"ingest.{stage}.seconds": round(seconds, 3),
+            "ingest_status": following or "ready",
+        }, "$unset": {f"ingest.{stage}.error": ""}})
+        if following is None:
+            return bool(self.jobs_collection.delete_one({"_id": job["_id"], "claim": job["claim"]}).deleted_count)
+        return bool(self._release(job, {"$set": {
+            "stage": following, "available_at": time.time(), "attempts": 0, "claim": None
+        }}))
+
+    def fail(self, job, error, seconds):
+        """Retries the stage with backoff, or marks the video failed once attempts run out."""
+        stage = job["stage"]
+        exhausted = job["attempts"] >= self.max_attempts
+        self.videos_collection.update_one({"_id": job["_id"]}, {"$set": {
+            f"ingest.{stage}.status": "failed" if exhausted else "retrying",
+            f"ingest.{stage}.error": error,
+            f"ingest.{stage}.finished_at": datetime.utcnow(),
+            f"ingest.{stage}.seconds": round(seconds, 3),
+            **({"ingest_status": "failed"} if exhausted else {}),
+        }})
+        if exhausted:
+            return self._release(job, {"$set": {"stage": "failed", "claim": None, "error": error}})
+        return self._release(job, {"$set": {
+            "available_at": time.time() + RETRY_BACKOFF * 2 ** (job["attempts"] - 1), "claim": None
+        }})
+
+    def remove(self, video_id):
+        self.jobs_collection.delete_one({"_id": video_id})
+
+    def get_stats(self):
+        """Jobs per stage, and how many of them are runnable right now."""
+        now = time.time()
+        stats = {}
+        for stage in STAGES + ("failed",):
+            stats[stage] = {
+                "queued": self.jobs_collection.count_documents({"stage": stage}),
+                "runnable": self.jobs_collection.count_documents({"stage": stage, "available_at": {"$lte": now}}),
+            }
+        return stats
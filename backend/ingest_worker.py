@@ -0,0 +1,182 @@
+import os
+import sys
+import time
+import threading
+from datetime import datetime
+from bson.objectid import ObjectId
+import embedding_codec
+from database import dbOperations
+from database.dbOperations import ingest, transcript_hash, EMBEDDING_MODEL_VERSION, BIAS_SCORER_VERSION
+from ingest_queue import STAGES
+
+# -----------------------------------------------------------------------------
+# Worker for the ingest queue: transcribe -> embed -> bias-score each new
+# upload. Every stage first checks whether its output is already current (same
+# transcript hash / model version) so re-running a job is harmless.
+#
+#   python ingest_worker.py [--once] [--stages transcribe,embed,bias]
+#
+# Concurrency is per stage and per worker process, e.g. one Whisper thread
+# but several embedding threads: INGEST_<STAGE>_CONCURRENCY.
+# -----------------------------------------------------------------------------
+
+STAGE_CONCURRENCY = {
+    "transcribe": int(os.environ.get("INGEST_TRANSCRIBE_CONCURRENCY", "1")),
+    "embed": int(os.environ.get("INGEST_EMBED_CONCURRENCY", "2")),
+    "bias": int(os.environ.get("INGEST_BIAS_CONCURRENCY", "1")),
+}
+# Seconds an idle stage thread waits before polling the queue again
+POLL_INTERVAL = float(os.environ.get("INGEST_POLL_INTERVAL", "1"))
+
+PROJECTION = {
+    "url": 1, "transcript": 1,
+    "embedding_hash": 1, "embedding_model": 1,
+    "bias_hash": 1, "bias_version": 1, "embedding": 1,
+}
+
+
+def transcribe_stage(video):
+    """Returns (fields, skipped)."""
+    if video.get("transcript"):
+        return {}, True
+    # Imported here so workers that don't run this stage never load Whisper
+    import voice_to_text
+    transcript = voice_to_text.get_transcript(video["url"].replace("gridfs://", ""))
+    return {"transcript": transcript.strip(), "transcript_status": "done"}, False
+
+
+def embed_stage(video):
+    transcript = video.get("transcript")
+    if not transcript:
+        return {}, True
+    text_hash = transcript_hash(transcript)
+    if video.get("embedding_hash") == text_hash and video.get("embedding_model") == EMBEDDING_MODEL_VERSION:
+        return {}, True
+    embedding = dbOperations.vectorize_transcript(transcript)
+    return {
+        "embedding": embedding_codec.encode(embedding),
+        "embedding_hash": text_hash,
+        "embedding_model": EMBEDDING_MODEL_VERSION,
+        "embedding_updated_at": datetime.utcnow(),
+    }, False
+
+
+def bias_stage(video):
+    transcript = video.get("transcript")
+    if not transcript:
+        return {}, True
+    text_hash = transcript_hash(transcript)
+    if video.get("bias_hash") == text_hash and video.get("bias_version") == BIAS_SCORER_VERSION:
+        return {}, True
+    # A dot product on the embedding when a trained head is active; BART otherwise
+    head = dbOperations.bias_heads.get_active()
+    if head is not None and video.get("embedding_hash") == text_hash and video.get("embedding"):
+        if video.get("bias_hash") == text_hash and video.get("bias_version") == head.version:
+            return {}, True
+        return {
+            "bias_score": head.score(embedding_codec.decode(video["embedding"])),
+            "bias_hash": text_hash,
+            "bias_version": head.version,
+            "bias_updated_at": datetime.utcnow(),
+        }, False
+    return {
+        "bias_score": dbOperations.get_bias_score(transcript),
+        "bias_hash": text_hash,
+        "bias_version": BIAS_SCORER_VERSION,
+        "bias_updated_at": datetime.utcnow(),
+    }, False
+
+
+STAGE_HANDLERS = {"transcribe": transcribe_stage, "embed": embed_stage, "bias": bias_stage}
+
+
+def run_job(job):
+    """Runs one claimed job and records the outcome; returns True on success."""
+    stage = job["stage"]
+    started = time.time()
+    try:
+        video = dbOperations.videos_collection.find_one({"_id": job["_id"]}, PROJECTION)
+        if video is None:
+            # Deleted while queued
+            ingest.remove(job["_id"])
+            return False
+        fields, skipped = STAGE_HANDLERS[stage](video)
+    except Exception as e:
+        print(f"❌ {stage} failed for {job['_id']}: {e}")
+        ingest.fail(job, str(e), time.time() - started)
+        return False
+    completed = ingest.complete(job, fields, time.time() - started, skipped=skipped)
+    # The fields are on the video either way; mirror them onto its feed card
+    dbOperations.feed_cards.update(job["_id"], fields)
+    if not completed:
+        print(f"⚠️ Lost the lease on {job['_id']} during {stage}; another worker will redo it.")
+        return False
+    print(f"✅ {stage} {'skipped' if skipped else 'done'} for {job['_id']} in {time.time() - started:.1f}s")
+    return True
+
+
+def _stage_loop(stage, once, stop):
+    while not stop.is_set():
+        job = ingest.claim(stage)
+        if job is None:
+            if once:
+                return
+            stop.wait(POLL_INTERVAL)
+            continue
+        run_job(job)
+
+
+def run_worker(stages=STAGES, concurrency=STAGE_CONCURRENCY, once=False):
+    """
+    Runs `concurrency[stage]` threads per stage until interrupted. With
+    once=True each thread exits when its stage has no runnable jobs left, so a
+    single call drains the queue stage by stage.
+    """
+    stop = threading.Event()
+    if once:
+        # Later stages are fed by earlier ones, so drain them in order
+        for stage in stages:
+            _run_stage_threads([stage], concurrency, once, stop)
+        return
+    _run_stage_threads(stages, concurrency, once, stop)
+
+
+def _run_stage_threads(stages, concurrency, once, stop):
+    threads = [
+        threading.Thread(target=_stage_loop, args=(stage, once, stop), name=f"ingest-{stage}-{i}", daemon=True)
+        for stage in stages
+        for i in range(concurrency[stage])
+    ]
+    for thread in threads:
+        thread.start()
+    try:
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(timeout=1)
+    except KeyboardInterrupt:
+        stop.set()
+
+
+def requeue(video_id, stage=STAGES[0]):
+    """Puts a video (e.g. one whose ingest failed) back on the queue."""
+    ingest.enqueue(ObjectId(video_id), stage)
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    selected = STAGES
+    if "--stages" in args:
+        selected = tuple(args[args.index("--stages") + 1].split(","))
+        unknown = set(selected) - set(STAGES)
+        if unknown:
+            print(f"Unknown stages: {', '.join(sorted(unknown))}")
+            sys.exit(1)
+    if "--requeue" in args:
+        requeue(args[args.index("--requeue") + 1])
+        sys.exit(0)
+    # Load this worker's models before taking jobs so the first ones aren't slow
+    if "embed" in selected:
+        dbOperations.vectorizer.get_model()
+    if "bias" in selected and dbOperations.bias_heads.get_active() is None:
+        dbOperations.get_classifier()
+    run_worker(selected, once="--once" in args)
@@ -0,0 +1,165 @@
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from pymongo import monitoring
+from database import dbConfig
+
+# -----------------------------------------------------------------------------
+# Prometheus instrumentation for the hot paths:
+#   polar_http_request_seconds      Flask route latency (route template, method, status)
+#   polar_mongo_command_seconds     every Mongo command, via a pymongo CommandListener
+#   polar_model_inference_seconds   BART classifier, sentence embedder, Whisper
+#   polar_outbound_http_seconds     Hugging Face API calls
+# exposed in text format on /metrics.
+#
+# With several worker processes (gunicorn -w N, hypercorn --workers N) each
+# worker has its own histograms, so set PROMETHEUS_MULTIPROC_DIR to an empty
+# directory before starting them: prometheus_client then keeps the values in
+# files there and /metrics aggregates every worker's. Without it, /metrics
+# only reports the worker that happened to serve the scrape.
+#
+# POLAR_METRICS=0 disables all of it: prometheus_client is never imported, no
+# listener or request hooks are installed, and timer() hands back a shared
+# no-op context manager.
+# -----------------------------------------------------------------------------
+
+ENABLED = os.environ.get("POLAR_METRICS", "1") != "0"
+
+# Mongo round trips are sub-millisecond to seconds; inference runs to minutes
+MONGO_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+MODEL_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+_NOOP = nullcontext()
+
+REQUEST_SECONDS = MONGO_SECONDS = MODEL_SECONDS = OUTBOUND_SECONDS = None
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+if ENABLED:
+    from prometheus_client import CONTENT_TYPE_LATEST as CONTENT_TYPE, Histogram, generate_latest
+
+    REQUEST_SECONDS = Histogram(
+        "polar_http_request_seconds", "Time to produce a Flask response (headers; streamed bodies excluded)",
+        ["route", "method", "status"]
+    )
+    MONGO_SECONDS = Histogram(
+        "polar_mongo_command_seconds", "MongoDB command round trip as seen by the driver",
+        ["collection", "command", "outcome"], buckets=MONGO_BUCKETS
+    )
+    MODEL_SECONDS = Histogram(
+        "polar_model_inference_seconds", "Wall time of one model call (a whole batch for batched calls)",
+        ["model"], buckets=MODEL_BUCKETS
+    )
+    OUTBOUND_SECONDS = Histogram(
+        "polar_outbound_http_seconds", "Outbound HTTP calls to hosted models",
+        ["target", "status"], buckets=MODEL_BUCKETS
+    )
+
+
+def timer(histogram, **labels):
+    """Context manager observing the enclosed block's duration; a no-op when disabled."""
+    if histogram is None:
+        return _NOOP
+    return histogram.labels(**labels).time()
+
+
+@contextmanager
+def time_outbound(target):
+    """Times an outbound HTTP call. The block sets call["status"] from the
+    response; exceptions are recorded as status="error"."""
+    call = {"status": "error"}
+    if OUTBOUND_SECONDS is None:
+        yield call
+        return
+    started = time.perf_counter()
+    try:
+        yield call
+    finally:
+        OUTBOUND_SECONDS.labels(target=target, status=str(call["status"])).observe(time.perf_counter() - started)
+
+
+class MongoCommandTimer(monitoring.CommandListener):
+    """Records each command's duration tagged by collection and command name.
+    Runs on the driver's thread for every command, so it only does dict work."""
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+        self.collections = {}  # (connection, request_id) -> collection name
+        self.lock = threading.Lock()
+
+    def started(self, event):
+        target = event.command.get(event.command_name)
+        if event.command_name == "getMore":
+            target = event.command.get("collection")
+        if isinstance(target, str):
+            with self.lock:
+                self.collections[(event.connection_id, event.request_id)] = target
+
+    def _observe(self, event, outcome):
+        with self.lock:
+            collection = self.collections.pop((event.connection_id, event.request_id), "")
+        self.histogram.labels(
+            collection=collection, command=event.command_name, outcome=outcome
+        ).observe(event.duration_micros / 1e6)
+
+    def succeeded(self, event):
+        self._observe(event, "ok")
+
+    def failed(self, event):
+        self._observe(event, "error")
+
+
+def install_mongo_listener():
+    """Adds the command listener to the shared client options. Must run before
+    the first database use (dbConfig creates the client lazily)."""
+    if MONGO_SECONDS is None:
+        return
+    listeners = dbConfig.client_options.setdefault("event_listeners", [])
+    if not any(isinstance(listener, MongoCommandTimer) for listener in listeners):
+        listeners.append(MongoCommandTimer(MONGO_SECONDS))
+    if dbConfig._client is not None:
+        print("⚠️ MongoClient already created; Mongo command metrics start with the next client.")
+
+
+def init_app(app):
+    """Times every Flask request by route template. The observation is made at
+    teardown, which also runs when a view raises and no response (or
+    after_request) is produced; those are recorded as 500."""
+    if REQUEST_SECONDS is None:
+        return
+    from flask import g, request
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def _record_status(response):
+        g.metrics_status = response.status_code
+        return response
+
+    @app.teardown_request
+    def _observe_request(exc):
+        started = g.pop("metrics_started", None)
+        if started is None:
+            return
+        status = 500 if exc is not None else g.pop("metrics_status", 500)
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        REQUEST_SECONDS.labels(route=route, method=request.method, status=str(status)).observe(
+            time.perf_counter() - started
+        )
+
+
+def render():
+    """The /metrics payload as (body, content type), or None when disabled."""
+    if not ENABLED:
+        return None
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import CollectorRegistry, multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE
+    return generate_latest(), CONTENT_TYPE
+
+
+install_mongo_listener()
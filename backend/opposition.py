@@ -0,0 +1,275 @@
+import os
+import sys
+import time
+from datetime import datetime
+import numpy as np
+import embedding_codec
+import embedding_snapshot
+from bson.objectid import ObjectId
+from pymongo import ReplaceOne, UpdateOne
+
+# -----------------------------------------------------------------------------
+# Precomputed "swipe for opposition" pairs: for every video, the most
+# topically similar videos whose bias_score has the opposite sign.
+#
+# The offline job scores the normalised embedding matrix against itself in
+# row x column blocks, keeping a running top-k per row, so memory stays at one
+# block of scores regardless of catalog size. Results live in the
+# opposition_pairs collection ({"_id": video_id, "pairs": [...], "floor": ...})
+# and serving a swipe is a single _id lookup.
+#
+#   python opposition.py           # incremental: new/changed videos only
+#   python opposition.py --full    # recompute everything
+#   python opposition.py --watch   # incremental every OPPOSITION_WATCH_INTERVAL s
+#
+# Incremental runs don't reread the whole catalog: the matrix is seeded from the
+# published embedding snapshot (or kept from the previous run under --watch)
+# and only embeddings updated since then are fetched from Mongo.
+# -----------------------------------------------------------------------------
+
+OPPOSITION_K = int(os.environ.get("OPPOSITION_K", "20"))
+# Query rows and candidate columns per matrix multiply
+ROW_BLOCK = int(os.environ.get("OPPOSITION_ROW_BLOCK", "512"))
+COL_BLOCK = int(os.environ.get("OPPOSITION_COL_BLOCK", "8192"))
+# Videos this close to neutral have no opposing side and aren't offered as one
+NEUTRAL_BAND = float(os.environ.get("OPPOSITION_NEUTRAL_BAND", "0.05"))
+WATCH_INTERVAL = float(os.environ.get("OPPOSITION_WATCH_INTERVAL", "30"))
+
+EMBEDDING_FILTER = embedding_codec.EMBEDDING_FILTER
+CHECKPOINT_ID = "opposition_pairs"
+# floor of a list that isn't full yet: any candidate qualifies
+OPEN_FLOOR = -2.0
+
+
+def bias_signs(scores, band=NEUTRAL_BAND):
+    scores = np.asarray(scores, dtype=np.float32)
+    return np.where(scores >= band, 1, np.where(scores <= -band, -1, 0)).astype(np.int8)
+
+
+def top_opposites(queries, query_signs, matrix, signs, k=OPPOSITION_K, col_block=COL_BLOCK):
+    """
+    For each query row, the k columns of `matrix` with the opposite sign and
+    the highest inner product. Returns (indices, scores), both (m, k), sorted
+    best first and padded with -1 / -inf.
+    """
+    m = len(queries)
+    best_idx = np.full((m, k), -1, dtype=np.int64)
+    best = np.full((m, k), -np.inf, dtype=np.float32)
+    for start in range(0, len(matrix), col_block):
+        block = matrix[start:start + col_block]
+        scores = queries @ block.T
+        scores[(query_signs[:, None] * signs[None, start:start + len(block)]) >= 0] = -np.inf
+        candidates = np.concatenate([best, scores], axis=1)
+        candidate_idx = np.concatenate(
+            [best_idx, np.broadcast_to(np.arange(start, start + len(block)), (m, len(block)))], axis=1
+        )
+        top = np.argpartition(-candidates, k - 1, axis=1)[:, :k]
+        best = np.take_along_axis(candidates, top, axis=1)
+        best_idx = np.take_along_axis(candidate_idx, top, axis=1)
+    order = np.argsort(-best, axis=1)
+    return np.take_along_axis(best_idx, order, axis=1), np.take_along_axis(best, order, axis=1)
+
+
+def _floor(pairs, k):
+    return pairs[-1]["similarity"] if len(pairs) >= k else OPEN_FLOOR
+
+
+class OppositionPairs:
+    def __init__(self, videos_collection, pairs_collection, checkpoints_collection, k=OPPOSITION_K):
+        self.videos_collection = videos_collection
+        self.pairs_collection = pairs_collection
+        self.checkpoints_collection = checkpoints_collection
+        self.k = k
+        # (ids, matrix, as_of) from the last run, reused by the next update_new()
+        self._cached = None
+
+    def _load_catalog(self):
+        ids, stored, biases = [], [], []
+        for video in self.videos_collection.find(EMBEDDING_FILTER, {"embedding": 1, "bias_score": 1}):
+            ids.append(video["_id"])
+            stored.append(video["embedding"])
+            biases.append(video.get("bias_score") or 0.0)
+        matrix = embedding_codec.decode_matrix(stored)
+        matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+        return ids, matrix, np.asarray(biases, dtype=np.float32)
+
+    def _refresh_catalog(self):
+        """
+        Same as _load_catalog(), but rows already in the cached matrix (or in
+        the embedding snapshot on the first run) are reused and only embeddings
+        updated since then are decoded. Biases are small and always reread.
+        """
+        loaded_at = datetime.utcnow()
+        base = self._cached
+        if base is None:
+            snapshot = embedding_snapshot.get_snapshot()
+            if snapshot is not None:
+                base = ([ObjectId(video_id) for video_id in snapshot.ids], snapshot.matrix, snapshot.created_at)
+        if base is None or not len(base[0]):
+            ids, matrix, biases = self._load_catalog()
+            self._cached = (ids, matrix, loaded_at)
+            return ids, matrix, biases
+        base_ids, base_matrix, as_of = base
+        base_row = {video_id: row for row, video_id in enumerate(base_ids)}
+
+        ids, biases, stale = [], [], []
+        for video in self.videos_collection.find(EMBEDDING_FILTER, {"bias_score": 1, "embedding_updated_at": 1}):
+            ids.append(video["_id"])
+            biases.append(video.get("bias_score") or 0.0)
+            updated_at = video.get("embedding_updated_at")
+            if video["_id"] not in base_row or (updated_at is not None and updated_at >= as_of):
+                stale.append(video["_id"])
+
+        matrix = np.empty((len(ids), base_matrix.shape[1]), dtype=np.float32)
+        kept = [(row, base_row[video_id]) for row, video_id in enumerate(ids) if video_id in base_row]
+        if kept:
+            rows, source = map(list, zip(*kept))
+            matrix[rows] = base_matrix[source]
+        row_of = {video_id: row for row, video_id in enumerate(ids)}
+        for start in range(0, len(stale), ROW_BLOCK):
+            for video in self.videos_collection.find({"_id": {"$in": stale[start:start + ROW_BLOCK]}}, {"embedding": 1}):
+                vector = embedding_codec.decode(video["embedding"])
+                matrix[row_of[video["_id"]]] = vector / max(np.linalg.norm(vector), 1e-12)
+
+        self._cached = (ids, matrix, loaded_at)
+        return ids, matrix, np.asarray(biases, dtype=np.float32)
+
+    def _pairs_doc(self, ids, biases, row, idx, sims, now):
+        pairs = [
+            {"video_id": str(ids[j]), "similarity": float(s), "bias_score": float(biases[j])}
+            for j, s in zip(idx, sims) if j >= 0 and np.isfinite(s)
+        ]
+        return {"pairs": pairs, "floor": _floor(pairs, self.k), "bias_score": float(biases[row]), "computed_at": now}
+
+    def _write_rows(self, ids, matrix, biases, signs, rows, now, row_block=ROW_BLOCK):
+        for start in range(0, len(rows), row_block):
+            block_rows = rows[start:start + row_block]
+            idx, sims = top_opposites(matrix[block_rows], signs[block_rows], matrix, signs, self.k)
+            self.pairs_collection.bulk_write([
+                ReplaceOne({"_id": ids[row]}, self._pairs_doc(ids, biases, row, idx[i], sims[i], now), upsert=True)
+                for i, row in enumerate(block_rows)
+            ], ordered=False)
+
+    def _mark_synced(self, started):
+        self.checkpoints_collection.update_one(
+            {"_id": CHECKPOINT_ID}, {"$set": {"synced_until": started, "k": self.k}}, upsert=True
+        )
+
+    def compute_all(self):
+        """Recomputes every video's list and drops lists of deleted videos."""
+        started = datetime.utcnow()
+        self.pairs_collection.create_index("pairs.video_id")
+        ids, matrix, biases = self._load_catalog()
+        self._cached = (ids, matrix, started)
+        signs = bias_signs(biases)
+        self._write_rows(ids, matrix, biases, signs, list(range(len(ids))), started)
+        self.pairs_collection.delete_many({"computed_at": {"$lt": started}})
+        self._mark_synced(started)
+        print(f"✅ Opposition pairs computed for {len(ids)} videos.")
+        return len(ids)
+
+    def update_new(self):
+        """
+        Computes lists for videos embedded or re-scored since the last run and
+        splices them into the existing lists they now belong in. Falls back to
+        compute_all() when there's no previous run.
+        """
+        checkpoint = self.checkpoints_collection.find_one({"_id": CHECKPOINT_ID})
+        if not checkpoint or checkpoint.get("k") != self.k:
+            return self.compute_all()
+        since = checkpoint["synced_until"]
+        started = datetime.utcnow()
+        changed = {v["_id"] for v in self.videos_collection.find(
+            {"$or": [{"embedding_updated_at": {"$gt": since}}, {"bias_updated_at": {"$gt": since}}]}, {"_id": 1}
+        )}
+        if not changed:
+            self._mark_synced(started)
+            return 0
+
+        ids, matrix, biases = self._refresh_catalog()
+        signs = bias_signs(biases)
+        rows = [row for row, video_id in enumerate(ids) if video_id in changed]
+        changed_ids = [str(ids[row]) for row in rows]
+
+        # Their old entries may now be on the wrong side or stale
+        touched = {doc["_id"] for doc in self.pairs_collection.find({"pairs.video_id": {"$in": changed_ids}}, {"_id": 1})}
+        self.pairs_collection.update_many(
+            {"pairs.video_id": {"$in": changed_ids}}, {"$pull": {"pairs": {"video_id": {"$in": changed_ids}}}}
+        )
+        self._write_rows(ids, matrix, biases, signs, rows, started)
+
+        # Floors as they stand after the pull: lists that lost entries get them
+        # recomputed, and ones left short of k are refilled from the whole catalog
+        floors = {doc["_id"]: doc.get("floor", OPEN_FLOOR) for doc in self.pairs_collection.find({}, {"floor": 1})}
+        short = set()
+        for doc in self.pairs_collection.find({"_id": {"$in": list(touched - changed)}}, {"pairs.similarity": 1}):
+            floors[doc["_id"]] = _floor(doc["pairs"], self.k)
+            if len(doc["pairs"]) < self.k:
+                short.add(doc["_id"])
+        refill = [row for row, video_id in enumerate(ids) if video_id in short]
+        self._write_rows(ids, matrix, biases, signs, refill, started)
+
+        # Reverse direction: existing lists the changed videos now qualify for
+        row_of = {str(video_id): row for row, video_id in enumerate(ids)}
+        updates = []
+        for start in range(0, len(ids), ROW_BLOCK):
+            block = range(start, min(start + ROW_BLOCK, len(ids)))
+            scores = matrix[start:block.stop] @ matrix[rows].T
+            scores[(signs[start:block.stop, None] * signs[None, rows]) >= 0] = -np.inf
+            for i, row in enumerate(block):
+                if ids[row] in changed or ids[row] in short:
+                    continue
+                floor = floors.get(ids[row], OPEN_FLOOR)
+                # Ties with the floor are merged and settled by the top-k cut below
+                hits = np.flatnonzero(scores[i] >= floor)
+                if len(hits):
+                    updates.append((ids[row], [(changed_ids[h], float(scores[i, h])) for h in hits]))
+
+        merged = 0
+        for start in range(0, len(updates), ROW_BLOCK):
+            batch = updates[start:start + ROW_BLOCK]
+            current = {doc["_id"]: doc["pairs"] for doc in self.pairs_collection.find(
+                {"_id": {"$in": [video_id for video_id, _ in batch]}}, {"pairs": 1}
+            )}
+            writes = []
+            for video_id, hits in batch:
+                pairs = current.get(video_id, []) + [
+                    {"video_id": hit_id, "similarity": similarity, "bias_score": float(biases[row_of[hit_id]])}
+                    for hit_id, similarity in hits
+                ]
+                pairs = sorted(pairs, key=lambda pair: -pair["similarity"])[:self.k]
+                writes.append(UpdateOne({"_id": video_id}, {"$set": {"pairs": pairs, "floor": _floor(pairs, self.k)}}))
+            if writes:
+                self.pairs_collection.bulk_write(writes, ordered=False)
+                merged += len(writes)
+
+        self._mark_synced(started)
+        print(f"✅ Opposition pairs updated for {len(rows)} new/changed videos "
+              f"({len(refill)} lists refilled, {merged} lists extended).")
+        return len(rows)
+
+    def remove(self, video_id):
+        """Drops a deleted video's list and its entries in other lists."""
+        video_id = ObjectId(video_id)
+        self.pairs_collection.delete_one({"_id": video_id})
+        self.pairs_collection.update_many(
+            {"pairs.video_id": str(video_id)}, {"$pull": {"pairs": {"video_id": str(video_id)}}}
+        )
+
+    def get(self, video_id, k=OPPOSITION_K):
+        """The stored opposition list for a video (best first), or None."""
+        doc = self.pairs_collection.find_one({"_id": ObjectId(video_id)}, {"pairs": {"$slice": k}})
+        return None if doc is None else doc["pairs"]
+
+
+if __name__ == "__main__":
+    from database.dbOperations import opposition_pairs
+
+    if "--full" in sys.argv:
+        opposition_pairs.compute_all()
+    elif "--watch" in sys.argv:
+        while True:
+            opposition_pairs.update_new()
+            time.sleep(WATCH_INTERVAL)
+    else:
+        opposition_pairs.update_new()
@@ -1,16 +1,95 @@
 
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
-from database.dbOperations import videos_collection, users_collection
+from database.dbOperations import videos_collection, users_collection, feed_cards_collection, video_bias_index
 from bson.objectid import ObjectId
+import ann_index
+import embedding_codec
+import embedding_snapshot
+
+def get_top_k_similar(video_id, k=5, exact=False):
+    """Finds the top k most similar videos, via the ANN index when it's loaded."""
+    index = ann_index.get_index()
+    if index is None and not exact and ann_index.ENABLED:
+        index = ann_index.ensure_index(videos_collection)
+    elif index is not None:
+        ann_index.catch_up(videos_collection)
+    if exact or index is None or str(video_id) not in index.row_of:
+        return get_top_k_similar_exact(video_id, k)
+
+    video_id = str(video_id)
+    target_vector = index.vectors[index.row_of[video_id]]
+    results = index.search(target_vector, k, exclude=video_id)
+    if not results:
+        return None
+    return [similar_id for similar_id, _ in results]
+
+
+def get_top_k_similar_exact(video_id, k=5):
+    """Exact top k by cosine similarity over the shared embedding snapshot.
+    Only vectors written after the snapshot was taken are read from Mongo."""
+    snapshot = embedding_snapshot.get_snapshot()
+    if snapshot is None:
+        return get_top_k_similar_mongo(video_id, k)
+
+    video_id = str(video_id)
+    fresh = {
+        str(v["_id"]): embedding_codec.decode(v["embedding"])
+        for v in videos_collection.find(
+            {"embedding_updated_at": {"$gt": snapshot.created_at}}, {"_id": 1, "embedding": 1}
+        )
+        if v.get("embedding")
+    }
+
+    target_vector = fresh.get(video_id)
+    if target_vector is None:
+        target_vector = snapshot.vector(video_id)
+    if target_vector is None:
+        target_video = videos_collection.find_one({"_id": ObjectId(video_id)}, {"embedding": 1})
+        if not target_video or not target_video.get("embedding"):
+            return None
+        target_vector = embedding_codec.decode(target_video["embedding"])
+    target_vector = target_vector / (np.linalg.norm(target_vector) or 1.0)
+
+    # Snapshot rows are already unit-norm, so cosine similarity is a mat-vec
+    similarities = np.asarray(snapshot.matrix @ target_vector)
+    stale_rows = [row for row in map(snapshot.row, list(fresh) + [video_id]) if row is not None]
+    similarities[stale_rows] = -np.inf
+
+    n_snapshot = len(snapshot)
+    candidate_scores = [similarities]
+    fresh_ids = [i for i in fresh if i != video_id]
+    if fresh_ids:
+        fresh_vectors = np.stack([fresh[i] for i in fresh_ids])
+        fresh_vectors /= np.maximum(np.linalg.norm(fresh_vectors, axis=1, keepdims=True), 1e-12)
+        candidate_scores.append(fresh_vectors @ target_vector)
+    scores = np.concatenate(candidate_scores)
+    if not len(scores):
+        return None
 
-def get_top_k_similar(video_id, k=5):
+    # Snapshot rows outlive deleted videos until the next export, so candidates
+    # are checked against Mongo, widening the cut until k live ones are found
+    take = min(2 * k, len(scores))
+    while True:
+        top_k_indices = np.argpartition(-scores, take - 1)[:take]
+        top_k_indices = top_k_indices[np.argsort(-scores[top_k_indices])]
+        top_k_indices = top_k_indices[np.isfinite(scores[top_k_indices])]
+        ids = [str(snapshot.ids[i]) if i < n_snapshot else fresh_ids[i - n_snapshot] for i in top_k_indices]
+        live = {str(v["_id"]) for v in videos_collection.find({"_id": {"$in": [ObjectId(i) for i in ids]}}, {"_id": 1})}
+        results = [i for i in ids if i in live][:k]
+        if len(results) >= k or take >= len(scores) or len(top_k_indices) < take:
+            return results or None
+        take = min(4 * take, len(scores))
+
+
+def get_top_k_similar_mongo(video_id, k=5):
     """Finds the top k most similar videos using cosine similarity."""
-    target_video = videos_collection.find_one({"_id": ObjectId(video_id)})
+    from sklearn.metrics.pairwise import cosine_similarity
+
+    target_video = videos_collection.find_one({"_id": ObjectId(video_id)}, {"embedding": 1})
     if not target_video or "embedding" not in target_video:
         return None
 
-    target_vector = np.array(target_video["embedding"], dtype=np.float32)
+    target_vector = embedding_codec.decode(target_video["embedding"])
 
     all_videos = list(videos_collection.find({"_id": {"$ne": ObjectId(video_id)}}, {"_id": 1, "embedding": 1}))
 
@@ -18,7 +97,7 @@ def get_top_k_similar(video_id, k=5):
         return None
 
     video_ids = [str(v["_id"]) for v in all_videos]
-    all_vectors = np.array([v["embedding"] for v in all_videos], dtype=np.float32)
+    all_vectors = embedding_codec.decode_matrix([v["embedding"] for v in all_videos])
 
     similarities = cosine_similarity(target_vector.reshape(1, -1), all_vectors).flatten()
     top_k_indices = np.argsort(similarities)[::-1][:k]
@@ -33,36 +112,50 @@ def calculate_user_bias(current_user_bias, pole_bias, user_num_poles):
     return new_user_bias
 
 
+def user_state(user):
+    """(bias, num_poles) of a user document."""
+    num_poles = user.get("num_poles", 0) or 0
+    if num_poles and user.get("bias_sum") is not None:
+        # With alpha = 1 / (n + 1) the running bias is the mean of all poles watched,
+        # and bias_sum is exact even when several workers fold events for one user
+        return user["bias_sum"] / num_poles, num_poles
+    return user.get("bias_score", 0.0) or 0.0, num_poles
+
+
+def target_pole_bias(current_user_bias, user_num_poles):
+    """
+    Solves calculate_user_bias(current_user_bias, pole_bias, user_num_poles) == 0
+    for pole_bias, clamped to the range bias scores live in.
+    """
+    return max(-1.0, min(1.0, -user_num_poles * current_user_bias))
+
+
 def get_random_video(user_id):
-    """Fetches the best random video for a user to balance bias."""
-    user = users_collection.find_one({"_id": ObjectId(user_id)})
+    """Fetches the video that moves the user's bias closest to zero, picked at
+    random among the few nearest candidates in the sorted bias index."""
+    user = users_collection.find_one({"_id": ObjectId(user_id)}, {"bias_score": 1, "num_poles": 1, "bias_sum": 1})
     if not user:
         return {"error": f"User with ID {user_id} not found."}
 
-    user_bias = user.get("bias_score", 0.0)
-    user_num_poles = user.get("num_poles", 0)
-
-    random_videos = list(videos_collection.aggregate([{"$sample": {"size": 10}}]))
-    if not random_videos:
-        return {"error": "No videos available in the database."}
-
-    best_video = None
-    closest_bias_to_zero = float('inf')
-
-    for video in random_videos:
-        video_bias = video.get("bias_score", 0.0)
-        new_bias = calculate_user_bias(user_bias, video_bias, user_num_poles)
-
-        if abs(new_bias) < closest_bias_to_zero:
-            closest_bias_to_zero = abs(new_bias)
-            best_video = video
-
-    if best_video:
-        return {
-            "_id": str(best_video["_id"]),
-            "uploader_id": best_video["uploader_id"],
-            "url": best_video["url"],
-            "bias_score": best_video["bias_score"]
-        }
-    else:
-        return {"error": "No suitable video found."}
+    user_bias, user_num_poles = user_state(user)
+    target = target_pole_bias(user_bias, user_num_poles)
+
+    video_bias_index.refresh()
+    while True:
+        video_id = video_bias_index.pick(target)
+        if video_id is None:
+            return {"error": "No videos available in the database."}
+        best_video = feed_cards_collection.find_one(
+            {"_id": ObjectId(video_id)}, {"uploader_id": 1, "url": 1, "bias_score": 1}
+        )
+        if best_video:
+            break
+        # Deleted by another process since the last reload
+        video_bias_index.remove(video_id)
+
+    return {
+        "_id": str(best_video["_id"]),
+        "uploader_id": best_video["uploader_id"],
+        "url": best_video["url"],
+        "bias_score": best_video["bias_score"]
+    }
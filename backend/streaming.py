@@ -0,0 +1,154 @@
+import os
+import uuid
+from datetime import timezone
+from werkzeug.http import http_date
+
+# -----------------------------------------------------------------------------
+# Helpers for serving GridFS files with HTTP Range / conditional request support
+# -----------------------------------------------------------------------------
+
+# Bytes per read when streaming; rounded to a multiple of the file's GridFS
+# chunk size so each read maps onto whole chunks.
+STREAM_READ_SIZE = int(os.environ.get("STREAM_READ_SIZE", str(255 * 1024)))
+
+
+def aligned_read_size(chunk_size, read_size=STREAM_READ_SIZE):
+    return max(1, round(read_size / chunk_size)) * chunk_size
+
+
+def resolve_ranges(range_header, length):
+    """
+    Turns a parsed werkzeug Range into a sorted list of inclusive (start, end)
+    byte ranges, merging overlapping/adjacent ones. Returns [] if none of the
+    ranges is satisfiable.
+    """
+    ranges = []
+    for start, stop in range_header.ranges:
+        if start < 0:
+            # Suffix range: the last -start bytes
+            start, stop = max(0, length + start), length
+        elif stop is None or stop > length:
+            stop = length
+        if start < stop:
+            ranges.append([start, stop - 1])
+    ranges.sort()
+    merged = []
+    for start, end in ranges:
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [tuple(r) for r in merged]
+
+
+def iter_file_range(grid_out, start, end, chunk_size, read_size=STREAM_READ_SIZE):
+    """Yields bytes [start, end] of a GridOut. The first read stops at a chunk
+    boundary so every later read is chunk-aligned."""
+    read_size = aligned_read_size(chunk_size, read_size)
+    grid_out.seek(start)
+    remaining = end - start + 1
+    size = chunk_size - (start % chunk_size) if start % chunk_size else read_size
+    while remaining > 0:
+        data = grid_out.read(min(size, remaining))
+        if not data:
+            break
+        remaining -= len(data)
+        size = read_size
+        yield data
+
+
+def stream_headers(file_id, length, upload_date):
+    """Returns (etag, last_modified, headers) for a stored file."""
+    etag = f"{file_id}-{length}"
+    last_modified = upload_date.replace(tzinfo=timezone.utc, microsecond=0)
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": f'"{etag}"',
+        "Last-Modified": http_date(last_modified),
+        "Cache-Control": "public, max-age=86400",
+    }
+    return etag, last_modified, headers
+
+
+def evaluate_request(request, etag, last_modified, length):
+    """
+    Applies the conditional and Range headers of a werkzeug-style request
+    (Flask or Quart). Returns (status, ranges): 304 or 416 with no ranges,
+    200 for the whole file, or 206 with the ranges to send.
+    """
+    if request.if_none_match:
+        # Weak comparison (RFC 9110 13.1.2): W/"x" matches "x"
+        if request.if_none_match.contains_weak(etag):
+            return 304, None
+    elif request.if_modified_since and last_modified <= request.if_modified_since:
+        return 304, None
+
+    # If-Range: only honour Range when the client's copy is still current
+    range_header = request.range
+    if range_header and "If-Range" in request.headers:
+        if_range = request.if_range
+        # Strong comparison: an ETag, or exactly the Last-Modified date sent out
+        if if_range.etag != etag and not (if_range.date and last_modified == if_range.date):
+            range_header = None
+
+    if range_header is None or range_header.units != "bytes":
+        return 200, None
+    ranges = resolve_ranges(range_header, length)
+    if not ranges:
+        return 416, None
+    return 206, ranges
+
+
+def multipart_layout(ranges, length, content_type):
+    """Returns (boundary, part_headers, closing, content_length) for a multipart/byteranges body."""
+    boundary = uuid.uuid4().hex
+    part_headers = [
+        (f"--{boundary}\r\nContent-Type: {content_type}\r\n"
+         f"Content-Range: bytes {start}-{end}/{length}\r\n\r\n").encode("ascii")
+        for start, end in ranges
+    ]
+    closing = f"\r\n--{boundary}--\r\n".encode("ascii")
+    content_length = (sum(len(h) for h in part_headers)
+                      + sum(end - start + 1 for start, end in ranges)
+                      + 2 * (len(ranges) - 1)
+                      + len(closing))
+    return boundary, part_headers, closing, content_length
+
+
+def multipart_byteranges(grid_out, ranges, length, content_type, chunk_size, read_size=STREAM_READ_SIZE):
+    """Returns (boundary, content_length, generator) for a multipart/byteranges body."""
+    boundary, part_headers, closing, content_length = multipart_layout(ranges, length, content_type)
+
+    def generate():
+        for i, ((start, end), header) in enumerate(zip(ranges, part_headers)):
+            if i:
+                yield b"\r\n"
+            yield header
+            yield from iter_file_range(grid_out, start, end, chunk_size, read_size)
+        yield closing
+
+    return boundary, content_length, generate()
+
+
+async def aiter_file_range(chunks_collection, file_id, start, end, chunk_size, read_size=STREAM_READ_SIZE):
+    """
+    Async version of iter_file_range for async_app.py: yields bytes [start, end]
+    of a GridFS file straight from an async (motor) fs.chunks collection, one
+    chunk-range query fetched in batches of about read_size bytes.
+    """
+    first, last = start // chunk_size, end // chunk_size
+    cursor = chunks_collection.find(
+        {"files_id": file_id, "n": {"$gte": first, "$lte": last}}, {"n": 1, "data": 1}
+    ).sort("n", 1).batch_size(aligned_read_size(chunk_size, read_size) // chunk_size)
+    expected = first
+    async for chunk in cursor:
+        n = chunk["n"]
+        if n != expected:
+            raise IOError(f"GridFS file {file_id} is missing chunk {expected}")
+        data = chunk["data"]
+        lo = start - n * chunk_size if n == first else 0
+        hi = end - n * chunk_size + 1 if n == last else len(data)
+        yield bytes(data[lo:hi])
+        expected += 1
+    if expected <= last:
+        raise IOError(f"GridFS file {file_id} is missing chunk {expected}")
@@ -0,0 +1,193 @@
+import asyncio
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+import requests
+from requests.adapters import HTTPAdapter
+import metrics
+
+# -----------------------------------------------------------------------------
+# "Learn More" summaries: one pooled HTTP session to the hosted Mistral endpoint,
+# results memoised in Mongo + an in-process LRU, and concurrent requests for the
+# same transcript coalesced into a single upstream call.
+# -----------------------------------------------------------------------------
+
+API_URL = os.environ.get(
+    "HF_SUMMARY_API_URL", "https://api-inference.huggingface.co/models/mistralai/Mistral-7B-Instruct-v0.3"
+)
+# Bump whenever PROMPT_TEMPLATE changes so stale summaries aren't served
+PROMPT_VERSION = "v1"
+CONNECT_TIMEOUT = float(os.environ.get("HF_CONNECT_TIMEOUT", "3"))
+READ_TIMEOUT = float(os.environ.get("HF_READ_TIMEOUT", "60"))
+LRU_SIZE = int(os.environ.get("SUMMARY_LRU_SIZE", "1024"))
+
+PROMPT_TEMPLATE = """
+    You are an AI assistant that summarizes transcripts into a compelling and neutral title (3 words or less) and a brief description.
+
+    Based on the following transcript, generate a *concise and informative title* along with a *description* summarizing the topic.
+
+    After that provide 2 lines on why this topic is politically contended. Do not make bullet points. Make paragraphs
+
+    Transcript:
+    {transcript}
+    """
+
+
+class SummaryError(Exception):
+    def __init__(self, status_code, text):
+        super().__init__(f"Error {status_code}: {text}")
+        self.status_code = status_code
+        self.text = text
+
+
+def _make_session():
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=32)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+session = _make_session()
+
+
+def build_prompt(transcript):
+    return PROMPT_TEMPLATE.format(transcript=transcript)
+
+
+def _parse_summary(prompt, payload):
+    return payload[0]["generated_text"][len(prompt):].strip()
+
+
+def request_summary(transcript):
+    """Calls the hosted model once; raises SummaryError on a non-200 reply."""
+    api_key = os.environ.get("HUGGINGFACE_API_KEY")
+    if not api_key:
+        raise ValueError("HUGGINGFACE_API_KEY is not set in environment variables.")
+
+    prompt = build_prompt(transcript)
+    with metrics.time_outbound("hf_summary") as call:
+        response = session.post(
+            API_URL,
+            headers={"Authorization": f"Bearer {api_key}"},
+            json={"inputs": prompt},
+            timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)
+        )
+        call["status"] = response.status_code
+    if response.status_code != 200:
+        raise SummaryError(response.status_code, response.text)
+
+    return _parse_summary(prompt, response.json())
+
+
+async def request_summary_async(http_session, transcript):
+    """request_summary for async_app.py, over a shared aiohttp.ClientSession."""
+    api_key = os.environ.get("HUGGINGFACE_API_KEY")
+    if not api_key:
+        raise ValueError("HUGGINGFACE_API_KEY is not set in environment variables.")
+
+    prompt = build_prompt(transcript)
+    with metrics.time_outbound("hf_summary") as call:
+        async with http_session.post(
+            API_URL, headers={"Authorization": f"Bearer {api_key}"}, json={"inputs": prompt}
+        ) as response:
+            call["status"] = response.status
+            if response.status != 200:
+                raise SummaryError(response.status, await response.text())
+            return _parse_summary(prompt, await response.json())
+
+
+class SummaryCache:
+    def __init__(self, collection, max_entries=LRU_SIZE):
+        self.collection = collection
+        self.max_entries = max_entries
+        self.lru = OrderedDict()
+        self.inflight = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(transcript):
+        return f"{hashlib.sha1(transcript.encode('utf-8')).hexdigest()}:{PROMPT_VERSION}"
+
+    def _remember(self, key, summary):
+        with self.lock:
+            self.lru[key] = summary
+            self.lru.move_to_end(key)
+            while len(self.lru) > self.max_entries:
+                self.lru.popitem(last=False)
+
+    def get_summary(self, transcript):
+        key = self.key(transcript)
+        with self.lock:
+            if key in self.lru:
+                self.lru.move_to_end(key)
+                return self.lru[key]
+            future = self.inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self.inflight[key] = Future()
+        if not leader:
+            return future.result()
+
+        try:
+            doc = self.collection.find_one({"_id": key}, {"summary": 1})
+            if doc:
+                summary = doc["summary"]
+            else:
+                summary = request_summary(transcript)
+                self.collection.update_one(
+                    {"_id": key}, {"$set": {"summary": summary, "prompt_version": PROMPT_VERSION}}, upsert=True
+                )
+            self._remember(key, summary)
+            future.set_result(summary)
+            return summary
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self.lock:
+                self.inflight.pop(key, None)
+
+
+class AsyncSummaryCache(SummaryCache):
+    """
+    SummaryCache for the asyncio server: same keys, LRU and Mongo documents,
+    with a motor collection, an aiohttp session and coalescing on asyncio
+    futures. Only used from the event loop thread.
+    """
+
+    def __init__(self, collection, http_session, max_entries=LRU_SIZE):
+        super().__init__(collection, max_entries)
+        self.http_session = http_session
+
+    async def get_summary(self, transcript):
+        key = self.key(transcript)
+        if key in self.lru:
+            self.lru.move_to_end(key)
+            return self.lru[key]
+        future = self.inflight.get(key)
+        if future is not None:
+            return await asyncio.shield(future)
+
+        future = self.inflight[key] = asyncio.get_running_loop().create_future()
+        try:
+            doc = await self.collection.find_one({"_id": key}, {"summary": 1})
+            if doc:
+                summary = doc["summary"]
+            else:
+                summary = await request_summary_async(self.http_session, transcript)
+                await self.collection.update_one(
+                    {"_id": key}, {"$set": {"summary": summary, "prompt_version": PROMPT_VERSION}}, upsert=True
+                )
+            self._remember(key, summary)
+            future.set_result(summary)
+            return summary
+        except Exception as e:
+            future.set_exception(e)
+            # Retrieved here so a failure nobody else awaited isn't logged as unhandled
+            future.exception()
+            raise
+        finally:
+            self.inflight.pop(key, None)
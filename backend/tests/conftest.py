@@ -0,0 +1,31 @@
+import os
+import sys
+import pytest
+
+# The backend modules import each other as top-level modules (scripts are run
+# from backend/), so make them importable however pytest is invoked
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, "benchmarks"))
+
+
+@pytest.fixture(scope="session")
+def memory_client():
+    """The in-memory Mongo stand-in from benchmarks/, installed as dbConfig's
+    client. Modules that call get_db() at import (voice_to_text) may already
+    have created a real client; it never connected, so it is just replaced."""
+    pytest.importorskip("mongomock")
+    from stand_in import memory_client as make_client
+    from database import dbConfig
+    dbConfig._client, dbConfig._fs = make_client(), None
+    return dbConfig._client
+
+
+@pytest.fixture
+def db(memory_client):
+    """The app database, emptied for each test."""
+    from database import dbConfig
+    database = dbConfig.get_db()
+    for name in database.list_collection_names():
+        database.drop_collection(name)
+    return database
@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+import ann_index
+from ann_index import IVFIndex
+
+
+def _clustered(n, dim=32, clusters=8, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    return (centers[rng.integers(clusters, size=n)] + 0.1 * rng.normal(size=(n, dim))).astype(np.float32)
+
+
+@pytest.fixture
+def index(monkeypatch):
+    monkeypatch.setattr(ann_index, "MIN_INDEX_SIZE", 0)
+    vectors = _clustered(400)
+    index = IVFIndex(dim=32, nprobe=2)
+    index.build([f"v{i}" for i in range(len(vectors))], vectors)
+    return index, vectors
+
+
+def test_search_finds_itself_first(index):
+    index, vectors = index
+    assert index.search(vectors[7], k=1)[0][0] == "v7"
+    results = index.search(vectors[7], k=5, exclude="v7")
+    assert len(results) == 5 and "v7" not in [video_id for video_id, _ in results]
+    assert [s for _, s in results] == sorted((s for _, s in results), reverse=True)
+
+
+def test_tuned_nprobe_reaches_target_recall(index):
+    index, _ = index
+    nprobe, recall = index.tune_nprobe(k=5, target_recall=0.95, n_queries=50)
+    assert recall >= 0.95
+    assert index.recall_at_k(k=5, n_queries=50, nprobe=nprobe) == recall
+
+
+def test_add_replace_remove_reuse_rows(index):
+    index, vectors = index
+    assert not index.add("v3", vectors[3])
+    assert index.add("v3", vectors[4])
+    assert index.search_exact(vectors[4], k=2)[0][0] in ("v3", "v4")
+    index.remove("v5")
+    assert "v5" not in [video_id for video_id, _ in index.search_exact(vectors[5], k=10)]
+    rows = len(index.ids)
+    index.add("new", vectors[5])
+    # The removed row is reused instead of growing the buffers
+    assert len(index.ids) == rows and index.row_of["new"] == 5
+    assert len(index) == 400
+
+
+def test_buffers_grow_geometrically():
+    index = IVFIndex(dim=4)
+    rng = np.random.default_rng(1)
+    for i in range(300):
+        index.add(f"v{i}", rng.normal(size=4))
+    assert len(index) == len(index.ids) == 300
+    # Doubling from 64 rows: 64, 128, 256, 512
+    assert len(index._vectors) == 512
+
+
+def test_rebuild_drops_removed_rows(index):
+    index, vectors = index
+    for i in range(0, 400, 2):
+        index.remove(f"v{i}")
+    index.rebuild()
+    assert len(index.ids) == len(index) == 200 and not index.free_rows
+    assert index.search_exact(vectors[1], k=1)[0][0] == "v1"
+
+
+def test_save_and_load(index, tmp_path):
+    index, vectors = index
+    index.remove("v0")
+    path = str(tmp_path / "index.npz")
+    index.save(path)
+    loaded = IVFIndex.load(path)
+    assert len(loaded) == 399 and loaded.nprobe == index.nprobe
+    for i in (1, 50, 399):
+        assert loaded.search(vectors[i], k=3) == index.search(vectors[i], k=3)
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+import bias_head
+import embedding_codec
+from bias_head import BiasHead, BiasHeads, in_holdout
+
+LABELS = "bart:labels"
+MODEL = "minilm"
+
+
+@pytest.fixture
+def heads(db, monkeypatch):
+    monkeypatch.setattr(bias_head, "CHECK_INTERVAL", 0)
+    rng = np.random.default_rng(0)
+    direction = rng.normal(size=64)
+    embeddings = rng.normal(size=(600, 64)).astype(np.float32)
+    units = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    scores = np.clip(2 * units @ direction / np.linalg.norm(direction), -1, 1)
+    db["videos"].insert_many([
+        {"embedding": embedding_codec.encode(e), "bias_score": float(s), "bias_version": LABELS, "embedding_model": MODEL}
+        for e, s in zip(embeddings, scores)
+    ])
+    # Scored by something else: never used as labels
+    db["videos"].insert_one({"embedding": embedding_codec.encode(embeddings[0]), "bias_score": 1.0,
+                             "bias_version": "bias-head:old", "embedding_model": MODEL})
+    return BiasHeads(db["bias_heads"], db["videos"], LABELS, MODEL)
+
+
+def test_holdout_split_is_deterministic():
+    ids = [f"video-{i}" for i in range(2000)]
+    held = [in_holdout(video_id, 0.2) for video_id in ids]
+    assert held == [in_holdout(video_id, 0.2) for video_id in ids]
+    assert 0.15 < np.mean(held) < 0.25
+
+
+def test_train_matches_the_labels_on_the_holdout(heads):
+    head = heads.train(ridge=0.01, batch_size=128)
+    assert head.n_train + head.report["n"] == 600
+    assert head.report["correlation"] > 0.95
+    assert head.report["opposite_side"] < 0.05
+
+
+def test_head_survives_storage(heads):
+    head = heads.train(ridge=0.01)
+    stored = heads.get(head.version)
+    matrix = np.random.default_rng(1).normal(size=(5, 64))
+    assert np.allclose(stored.score_many(matrix), head.score_many(matrix))
+    assert -1.0 <= stored.score(matrix[0]) <= 1.0
+
+
+def test_promote_and_get_active(heads):
+    assert heads.get_active() is None
+    head = heads.train(ridge=0.01)
+    heads.promote(head.version)
+    assert heads.get_active().version == head.version
+    # A head trained on other labels or embeddings isn't used
+    assert BiasHeads(heads.heads_collection, heads.videos_collection, "bart:new-labels", MODEL).get_active() is None
+
+
+def test_promote_refuses_a_poor_head(heads):
+    poor = BiasHead(np.zeros(64), 0.0, "bias-head:poor", MODEL, LABELS, report={"correlation": 0.1})
+    heads.heads_collection.insert_one(poor.to_doc())
+    with pytest.raises(ValueError):
+        heads.promote("bias-head:poor")
+    heads.promote("bias-head:poor", force=True)
+    assert heads.get_active().version == "bias-head:poor"
+    with pytest.raises(ValueError):
+        heads.promote("bias-head:missing")
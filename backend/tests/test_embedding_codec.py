@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+from bson import BSON
+from bson.binary import Binary
+import embedding_codec
+from embedding_codec import decode, decode_matrix, encode, storage_format
+
+
+@pytest.fixture
+def vector():
+    return np.random.default_rng(0).normal(size=384).astype(np.float32)
+
+
+def test_float32_round_trip_is_exact(vector):
+    stored = encode(vector, "float32")
+    assert isinstance(stored, Binary) and stored.subtype == embedding_codec.FLOAT32_SUBTYPE
+    assert len(stored) == 4 * 384
+    assert np.array_equal(decode(stored), vector)
+
+
+def test_int8_round_trip_is_within_half_a_step(vector):
+    stored = encode(vector, "int8")
+    assert stored.subtype == embedding_codec.INT8_SUBTYPE and len(stored) == 384 + 4
+    step = np.abs(vector).max() / 127
+    assert np.abs(decode(stored) - vector).max() <= step / 2 + 1e-6
+
+
+def test_int8_zero_vector():
+    assert np.array_equal(decode(encode(np.zeros(8), "int8")), np.zeros(8, dtype=np.float32))
+
+
+def test_list_and_legacy_double_arrays(vector):
+    stored = encode(vector, "list")
+    assert isinstance(stored, list)
+    assert np.array_equal(decode(stored), vector)
+    assert np.array_equal(decode([1.0, 2.0]), np.array([1.0, 2.0], dtype=np.float32))
+
+
+@pytest.mark.parametrize("storage", ["float32", "int8", "list"])
+def test_round_trip_through_bson(vector, storage):
+    document = BSON.decode(BSON.encode({"embedding": encode(vector, storage)}))
+    assert storage_format(document["embedding"]) == storage
+    assert np.allclose(decode(document["embedding"]), vector, atol=np.abs(vector).max() / 127)
+
+
+def test_missing_and_unknown_values():
+    assert decode(None) is None
+    assert decode([]) is None
+    assert storage_format("x") is None
+    with pytest.raises(ValueError):
+        decode(Binary(b"\0" * 8, 0x85))
+    with pytest.raises(ValueError):
+        encode([1.0], "float16")
+
+
+def test_decode_matrix_mixes_formats(vector):
+    other = vector[::-1].copy()
+    matrix = decode_matrix([encode(vector, "float32"), encode(other, "list")])
+    assert matrix.shape == (2, 384) and matrix.flags.writeable
+    assert np.array_equal(matrix[0], vector) and np.array_equal(matrix[1], other)
+    assert decode_matrix([], dim=384).shape == (0, 384)
@@ -0,0 +1,49 @@
+import numpy as np
+import embedding_codec
+import embedding_snapshot
+from embedding_snapshot import EmbeddingSnapshot, export_snapshot, read_current
+
+
+def _insert(db, n, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(n, 384)).astype(np.float32)
+    result = db["videos"].insert_many([{"embedding": embedding_codec.encode(v)} for v in vectors])
+    return [str(i) for i in result.inserted_ids], vectors
+
+
+def test_export_and_read_rows(db, tmp_path):
+    ids, vectors = _insert(db, 20)
+    db["videos"].insert_one({"transcript": "not embedded yet"})
+    meta = export_snapshot(db["videos"], str(tmp_path))
+    snapshot = EmbeddingSnapshot(str(tmp_path), meta)
+    assert len(snapshot) == 20 and list(snapshot.ids) == sorted(ids)
+    for video_id, vector in zip(ids, vectors):
+        assert np.allclose(snapshot.vector(video_id), vector / np.linalg.norm(vector), atol=1e-6)
+    assert snapshot.row("0" * 24) is None and snapshot.vector("f" * 24) is None
+
+
+def test_empty_catalog(db, tmp_path):
+    meta = export_snapshot(db["videos"], str(tmp_path))
+    snapshot = EmbeddingSnapshot(str(tmp_path), meta)
+    assert len(snapshot) == 0 and snapshot.matrix.shape == (0, 384)
+
+
+def test_old_versions_are_pruned(db, tmp_path):
+    _insert(db, 3)
+    versions = [export_snapshot(db["videos"], str(tmp_path))["version"] for _ in range(4)]
+    assert read_current(str(tmp_path))["version"] == versions[-1]
+    kept = {path.name.split(".")[0] for path in tmp_path.glob("embeddings-*")}
+    assert kept == {f"embeddings-{v}" for v in versions[-2:]}
+
+
+def test_get_snapshot_follows_current(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(embedding_snapshot, "_snapshot", None)
+    monkeypatch.setattr(embedding_snapshot, "CHECK_INTERVAL", 0)
+    assert embedding_snapshot.get_snapshot(str(tmp_path)) is None
+    _insert(db, 2)
+    first = export_snapshot(db["videos"], str(tmp_path))
+    assert embedding_snapshot.get_snapshot(str(tmp_path)).version == first["version"]
+    _insert(db, 2, seed=1)
+    second = export_snapshot(db["videos"], str(tmp_path))
+    snapshot = embedding_snapshot.get_snapshot(str(tmp_path))
+    assert snapshot.version == second["version"] and len(snapshot) == 4
@@ -0,0 +1,58 @@
+import pytest
+from corpus import generate_corpus
+
+
+@pytest.fixture
+def feed(db):
+    from feed_buffer import FeedBuffer
+    from feed_cards import FeedCards
+    from feed_sampler import FeedSampler
+    from stand_in import BitwiseCollection
+    from visited_store import VisitedStore
+
+    ids = generate_corpus(db, 30, blob_bytes=16, blob_count=2)
+    FeedCards(db["feed_cards"], db["videos"]).rebuild()
+    visited = BitwiseCollection(db["visited_videos"])
+    sampler = FeedSampler(db["feed_cards"], db["videos"], VisitedStore(visited))
+    buffer = FeedBuffer(sampler, db["feed_cards"], size=5, refill_threshold=2)
+    yield buffer, ids, visited
+    buffer.refiller.shutdown(wait=True)
+
+
+def test_serves_every_video_once(feed):
+    buffer, ids, _ = feed
+    served = []
+    while True:
+        batch = buffer.take("u", 4)
+        if not batch:
+            break
+        served.extend(batch)
+    assert sorted(item["_id"] for item in served) == sorted(str(i) for i in ids)
+    assert all(item["stream_url"] == f"/stream/{item['gridfs_id']}" for item in served)
+
+
+def test_videos_claimed_elsewhere_are_skipped(feed):
+    from visited_store import VisitedStore
+    buffer, ids, visited = feed
+    buffer.refill("u")
+    buffered = [index for index, _ in buffer.buffers["u"]]
+    # Another worker serves two of the buffered videos first
+    other = VisitedStore(visited)
+    for index in buffered[:2]:
+        assert other.claim("u", index)
+    served = buffer.take("u", 3)
+    assert len(served) == 3
+    assert buffer.get_stats()["lost_claims"] == 2
+
+
+def test_discarded_buffer_marks_nothing_seen(feed):
+    buffer, ids, _ = feed
+    buffer.refill("u")
+    buffer.discard("u")
+    served = set()
+    while True:
+        batch = buffer.take("u", 10)
+        if not batch:
+            break
+        served.update(item["_id"] for item in batch)
+    assert len(served) == len(ids)
@@ -0,0 +1,16 @@
+import pytest
+import inference_backend
+
+
+def test_reference_backend_keeps_the_plain_model_name():
+    assert inference_backend.version_key("org/model", "torch") == "org/model"
+
+
+@pytest.mark.parametrize("backend", ["torch-int8", "onnx"])
+def test_other_backends_get_their_own_version(backend):
+    assert inference_backend.version_key("org/model", backend) == f"org/model@{backend}"
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        inference_backend.version_key("org/model", "tensorrt")
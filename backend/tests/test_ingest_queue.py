@@ -0,0 +1,53 @@
+import pytest
+import ingest_queue
+from ingest_queue import STAGES, IngestQueue
+
+
+@pytest.fixture
+def queue(db):
+    db["videos"].insert_one({"_id": "v"})
+    return IngestQueue(db["ingest_jobs"], db["videos"], lease_seconds=60, max_attempts=2)
+
+
+def test_job_walks_through_every_stage(db, queue):
+    queue.enqueue("v")
+    assert db["videos"].find_one({"_id": "v"})["ingest_status"] == "transcribe"
+    assert queue.claim("embed") is None
+    for stage in STAGES:
+        job = queue.claim(stage)
+        assert job["_id"] == "v" and job["attempts"] == 1
+        # Claimed jobs are leased, so a second worker doesn't get them
+        assert queue.claim(stage) is None
+        assert queue.complete(job, {f"{stage}_output": 1}, seconds=0.5)
+    video = db["videos"].find_one({"_id": "v"})
+    assert video["ingest_status"] == "ready"
+    assert all(video["ingest"][stage]["status"] == "done" for stage in STAGES)
+    assert db["ingest_jobs"].count_documents({}) == 0
+
+
+def test_expired_lease_is_reclaimed_and_old_holder_loses(db, queue, monkeypatch):
+    queue.enqueue("v")
+    first = queue.claim("transcribe")
+    clock = ingest_queue.time.time() + 120
+    monkeypatch.setattr(ingest_queue.time, "time", lambda: clock)
+    second = queue.claim("transcribe")
+    assert second is not None and second["attempts"] == 2
+    assert not queue.complete(first, {}, seconds=1)
+    assert queue.complete(second, {}, seconds=1)
+    assert db["ingest_jobs"].find_one({"_id": "v"})["stage"] == "embed"
+
+
+def test_failures_back_off_then_give_up(db, queue, monkeypatch):
+    queue.enqueue("v")
+    job = queue.claim("transcribe")
+    queue.fail(job, "boom", seconds=1)
+    assert queue.claim("transcribe") is None
+    assert db["videos"].find_one({"_id": "v"})["ingest"]["transcribe"]["status"] == "retrying"
+
+    clock = ingest_queue.time.time() + ingest_queue.RETRY_BACKOFF + 1
+    monkeypatch.setattr(ingest_queue.time, "time", lambda: clock)
+    job = queue.claim("transcribe")
+    queue.fail(job, "boom again", seconds=1)
+    video = db["videos"].find_one({"_id": "v"})
+    assert video["ingest_status"] == "failed" and video["ingest"]["transcribe"]["error"] == "boom again"
+    assert queue.get_stats()["failed"]["queued"] == 1
@@ -0,0 +1,55 @@
+import pytest
+
+pytest.importorskip("prometheus_client")
+import metrics
+from flask import Flask
+from prometheus_client import REGISTRY
+
+if metrics.REQUEST_SECONDS is None:
+    pytest.skip("metrics disabled (POLAR_METRICS=0)", allow_module_level=True)
+
+
+def _count(route, status):
+    value = REGISTRY.get_sample_value(
+        "polar_http_request_seconds_count", {"route": route, "method": "GET", "status": status}
+    )
+    return value or 0
+
+
+@pytest.fixture(params=[False, True], ids=["handled", "propagated"])
+def client(request):
+    app = Flask(__name__)
+    app.config["PROPAGATE_EXCEPTIONS"] = request.param
+    metrics.init_app(app)
+
+    @app.route("/ok/<name>")
+    def ok(name):
+        return name
+
+    @app.route("/boom")
+    def boom():
+        raise RuntimeError("boom")
+
+    return app.test_client()
+
+
+def test_successful_requests_are_recorded_by_route(client):
+    before = _count("/ok/<name>", "200")
+    client.get("/ok/a")
+    client.get("/ok/b")
+    assert _count("/ok/<name>", "200") == before + 2
+
+
+def test_unhandled_errors_are_recorded_as_500(client):
+    before = _count("/boom", "500")
+    try:
+        client.get("/boom")
+    except RuntimeError:
+        pass
+    assert _count("/boom", "500") == before + 1
+
+
+def test_unmatched_routes(client):
+    before = _count("unmatched", "404")
+    client.get("/nope")
+    assert _count("unmatched", "404") == before + 1
@@ -0,0 +1,81 @@
+import time
+from datetime import datetime
+import numpy as np
+import pytest
+from corpus import generate_corpus
+
+
+@pytest.fixture
+def pairs(db):
+    from opposition import OppositionPairs
+    generate_corpus(db, 60, blob_bytes=1024, blob_count=2)
+    return OppositionPairs(db["videos"], db["opposition_pairs"], db["checkpoints"], k=5)
+
+
+def _change(db, count_embeddings, count_biases, seed=1):
+    import embedding_codec
+    rng = np.random.default_rng(seed)
+    time.sleep(0.01)
+    now = datetime.utcnow()
+    videos = list(db["videos"].find({}, {"_id": 1}).limit(count_embeddings + count_biases))
+    for video in videos[:count_embeddings]:
+        db["videos"].update_one({"_id": video["_id"]}, {"$set": {
+            "embedding": embedding_codec.encode(rng.normal(size=384).astype(np.float32)),
+            "embedding_updated_at": now,
+        }})
+    for video in videos[count_embeddings:]:
+        db["videos"].update_one({"_id": video["_id"]}, {"$set": {
+            "bias_score": float(rng.uniform(-1, 1)), "bias_updated_at": now,
+        }})
+
+
+def _lists(collection):
+    return {doc["_id"]: [p["video_id"] for p in doc["pairs"]] for doc in collection.find()}
+
+
+def _count_decodes(monkeypatch):
+    import embedding_codec
+    calls = []
+    decode = embedding_codec.decode
+
+    def counting(value):
+        calls.append(1)
+        return decode(value)
+    monkeypatch.setattr(embedding_codec, "decode", counting)
+    return calls
+
+
+def test_incremental_update_matches_full_recompute(db, pairs, monkeypatch):
+    from opposition import OppositionPairs
+    pairs.compute_all()
+    _change(db, 3, 2)
+
+    decodes = _count_decodes(monkeypatch)
+    assert pairs.update_new() == 5
+    # Only the re-embedded videos were decoded; the rest came from the cached matrix
+    assert len(decodes) == 3
+
+    monkeypatch.undo()
+    full = OppositionPairs(db["videos"], db["opposition_pairs_full"], db["checkpoints_full"], k=5)
+    full.compute_all()
+    assert _lists(db["opposition_pairs"]) == _lists(db["opposition_pairs_full"])
+
+
+def test_first_incremental_run_seeds_from_snapshot(db, pairs, tmp_path, monkeypatch):
+    import embedding_snapshot
+    from opposition import OppositionPairs
+    pairs.compute_all()
+    meta = embedding_snapshot.export_snapshot(db["videos"], str(tmp_path))
+    monkeypatch.setattr(embedding_snapshot, "get_snapshot",
+                        lambda: embedding_snapshot.EmbeddingSnapshot(str(tmp_path), meta))
+    _change(db, 2, 1)
+
+    # A fresh process: nothing cached, so the snapshot provides the matrix
+    restarted = OppositionPairs(db["videos"], db["opposition_pairs"], db["checkpoints"], k=5)
+    decodes = _count_decodes(monkeypatch)
+    assert restarted.update_new() == 3
+    assert len(decodes) == 2
+
+    full = OppositionPairs(db["videos"], db["opposition_pairs_full"], db["checkpoints_full"], k=5)
+    full.compute_all()
+    assert _lists(db["opposition_pairs"]) == _lists(db["opposition_pairs_full"])
@@ -0,0 +1,29 @@
+import time
+import pytest
+from corpus import generate_corpus
+
+
+@pytest.fixture
+def snapshot(db, tmp_path, monkeypatch):
+    import embedding_snapshot
+    generate_corpus(db, 40, blob_bytes=1024, blob_count=2)
+    meta = embedding_snapshot.export_snapshot(db["videos"], str(tmp_path))
+    monkeypatch.setattr(embedding_snapshot, "_snapshot", embedding_snapshot.EmbeddingSnapshot(str(tmp_path), meta))
+    monkeypatch.setattr(embedding_snapshot, "_last_check", time.time())
+    monkeypatch.setattr(embedding_snapshot, "CHECK_INTERVAL", 3600)
+    return meta
+
+
+def test_exact_similar_skips_videos_deleted_after_the_snapshot(db, snapshot):
+    from bson.objectid import ObjectId
+    from recommender import get_top_k_similar_exact
+
+    target = str(db["videos"].find_one({}, {"_id": 1})["_id"])
+    before = get_top_k_similar_exact(target, k=5)
+    assert len(before) == 5 and target not in before
+
+    db["videos"].delete_many({"_id": {"$in": [ObjectId(i) for i in before[:3]]}})
+    after = get_top_k_similar_exact(target, k=5)
+    assert len(after) == 5
+    assert not set(after) & set(before[:3])
+    assert after[:2] == before[3:]
@@ -0,0 +1,105 @@
+from datetime import datetime, timedelta
+import pytest
+from werkzeug.datastructures import Range
+from werkzeug.http import http_date
+from werkzeug.test import EnvironBuilder
+from werkzeug.wrappers import Request
+from streaming import evaluate_request, iter_file_range, multipart_layout, resolve_ranges, stream_headers
+
+LENGTH = 1000
+UPLOADED = datetime(2024, 5, 1, 12, 30, 15, 123456)
+ETAG, LAST_MODIFIED, HEADERS = stream_headers("abc", LENGTH, UPLOADED)
+
+
+def evaluate(**headers):
+    request = Request(EnvironBuilder(headers=headers).get_environ())
+    return evaluate_request(request, ETAG, LAST_MODIFIED, LENGTH)
+
+
+@pytest.mark.parametrize("ranges, expected", [
+    ([(0, 100)], [(0, 99)]),
+    ([(900, None)], [(900, 999)]),
+    ([(-100, None)], [(900, 999)]),
+    ([(-5000, None)], [(0, 999)]),
+    ([(990, 5000)], [(990, 999)]),
+    ([(200, 300), (0, 100), (100, 150)], [(0, 149), (200, 299)]),
+    ([(0, 10), (10, 20)], [(0, 19)]),
+    ([(1000, 1100)], []),
+])
+def test_resolve_ranges(ranges, expected):
+    assert resolve_ranges(Range("bytes", ranges), LENGTH) == expected
+
+
+def test_plain_request_is_200():
+    assert evaluate() == (200, None)
+
+
+@pytest.mark.parametrize("if_none_match", [f'"{ETAG}"', f'W/"{ETAG}"', f'"other", W/"{ETAG}"', "*"])
+def test_if_none_match_is_304(if_none_match):
+    assert evaluate(**{"If-None-Match": if_none_match}) == (304, None)
+
+
+def test_if_none_match_takes_precedence_over_if_modified_since():
+    assert evaluate(**{"If-None-Match": '"other"', "If-Modified-Since": http_date(LAST_MODIFIED)}) == (200, None)
+
+
+def test_if_modified_since_is_304():
+    assert evaluate(**{"If-Modified-Since": http_date(LAST_MODIFIED)}) == (304, None)
+    earlier = http_date(LAST_MODIFIED - timedelta(seconds=1))
+    assert evaluate(**{"If-Modified-Since": earlier}) == (200, None)
+
+
+def test_range_is_206():
+    assert evaluate(Range="bytes=0-99,-10") == (206, [(0, 99), (990, 999)])
+
+
+def test_unsatisfiable_range_is_416():
+    assert evaluate(Range="bytes=5000-") == (416, None)
+
+
+def test_non_byte_range_is_ignored():
+    assert evaluate(Range="items=0-1") == (200, None)
+
+
+@pytest.mark.parametrize("if_range, status", [
+    (f'"{ETAG}"', 206),
+    ('"stale"', 200),
+    (http_date(LAST_MODIFIED), 206),
+    # A later date doesn't prove the client has this version
+    (http_date(LAST_MODIFIED + timedelta(days=1)), 200),
+    (http_date(LAST_MODIFIED - timedelta(days=1)), 200),
+])
+def test_if_range(if_range, status):
+    assert evaluate(Range="bytes=0-9", **{"If-Range": if_range})[0] == status
+
+
+class _Bytes:
+    def __init__(self, data):
+        self.data = data
+        self.position = 0
+        self.reads = []
+
+    def seek(self, position):
+        self.position = position
+
+    def read(self, size):
+        self.reads.append((self.position, size))
+        data = self.data[self.position:self.position + size]
+        self.position += len(data)
+        return data
+
+
+def test_iter_file_range_reads_are_chunk_aligned():
+    data = bytes(range(256)) * 4
+    source = _Bytes(data)
+    assert b"".join(iter_file_range(source, 10, 900, chunk_size=100, read_size=250)) == data[10:901]
+    # First read up to the chunk boundary, then whole multiples of the chunk size
+    assert [size for _, size in source.reads] == [90, 200, 200, 200, 200, 1]
+
+
+def test_multipart_length_matches_body():
+    ranges = [(0, 9), (20, 29)]
+    boundary, part_headers, closing, content_length = multipart_layout(ranges, LENGTH, "video/mp4")
+    body = part_headers[0] + b"x" * 10 + b"\r\n" + part_headers[1] + b"x" * 10 + closing
+    assert len(body) == content_length
+    assert boundary.encode() in closing
@@ -0,0 +1,67 @@
+import threading
+import time
+import pytest
+import summary_cache
+from summary_cache import SummaryCache, SummaryError
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    calls = []
+
+    def request_summary(transcript):
+        calls.append(transcript)
+        time.sleep(0.05)
+        if transcript == "bad":
+            raise SummaryError(503, "loading")
+        return f"summary of {transcript}"
+    monkeypatch.setattr(summary_cache, "request_summary", request_summary)
+    return calls
+
+
+def test_concurrent_requests_share_one_upstream_call(db, upstream):
+    cache = SummaryCache(db["summaries"])
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_summary("t"))) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == ["summary of t"] * 6
+    assert upstream == ["t"]
+
+
+def test_summaries_persist_across_processes(db, upstream):
+    SummaryCache(db["summaries"]).get_summary("t")
+    # A fresh process (empty LRU) reads it back from Mongo
+    assert SummaryCache(db["summaries"]).get_summary("t") == "summary of t"
+    assert upstream == ["t"]
+    doc = db["summaries"].find_one({"_id": SummaryCache.key("t")})
+    assert doc["prompt_version"] == summary_cache.PROMPT_VERSION
+
+
+def test_lru_is_bounded(db, upstream):
+    cache = SummaryCache(db["summaries"], max_entries=2)
+    for transcript in ("a", "b", "c"):
+        cache.get_summary(transcript)
+    assert list(cache.lru) == [SummaryCache.key("b"), SummaryCache.key("c")]
+
+
+def test_failures_reach_every_waiter_and_are_not_cached(db, upstream):
+    cache = SummaryCache(db["summaries"])
+    errors = []
+
+    def get():
+        try:
+            cache.get_summary("bad")
+        except SummaryError as e:
+            errors.append(e.status_code)
+    threads = [threading.Thread(target=get) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == [503] * 3 and upstream == ["bad"]
+    with pytest.raises(SummaryError):
+        cache.get_summary("bad")
+    assert upstream == ["bad", "bad"] and not cache.inflight
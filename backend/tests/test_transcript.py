@@ -0,0 +1,66 @@
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("pydub")
+import transcript
+
+
+class FakeAudio:
+    def __init__(self, length_ms):
+        self.length_ms = length_ms
+
+    def __len__(self):
+        return self.length_ms
+
+
+def test_chunk_bounds_cover_audio_with_overlap():
+    bounds = transcript.chunk_bounds(50000, chunk_length_ms=20000, overlap_ms=2000)
+    assert bounds == [(0, 20000), (18000, 38000), (36000, 56000)]
+
+
+def test_chunk_bounds_short_audio_is_one_chunk():
+    assert transcript.chunk_bounds(500, chunk_length_ms=20000) == [(0, 20000)]
+
+
+@pytest.mark.parametrize("overlap_ms", [-1, 20000, 25000])
+def test_bad_overlap_is_rejected(overlap_ms):
+    with pytest.raises(ValueError):
+        transcript.chunk_bounds(50000, chunk_length_ms=20000, overlap_ms=overlap_ms)
+
+
+def test_merge_overlap_drops_repeated_words():
+    merged = transcript.merge_overlap("the quick brown fox", "Brown fox, jumps over")
+    assert merged == "the quick brown fox jumps over"
+
+
+def test_merge_overlap_without_repeat_joins():
+    assert transcript.merge_overlap("hello there", "general kenobi") == "hello there general kenobi"
+
+
+def test_encoding_overlaps_uploads(monkeypatch):
+    events = []
+    lock = threading.Lock()
+
+    def fake_encode(audio, start, end):
+        with lock:
+            events.append(("encode", start))
+        return str(start).encode()
+
+    def fake_transcribe(chunk):
+        with lock:
+            events.append(("upload", int(chunk)))
+        time.sleep(0.02)
+        return f"w{int(chunk)}"
+
+    monkeypatch.setattr(transcript, "extract_audio", lambda path: FakeAudio(80000))
+    monkeypatch.setattr(transcript, "encode_chunk", fake_encode)
+    monkeypatch.setattr(transcript, "transcribe_audio_chunk", fake_transcribe)
+
+    text = transcript.transcribe_mp4("video.mp4", concurrency=2, chunk_length_ms=20000)
+
+    assert text == "w0 w20000 w40000 w60000"
+    # An upload started before the last chunk was encoded
+    first_upload = events.index(("upload", 0))
+    assert first_upload < events.index(("encode", 60000))
@@ -0,0 +1,45 @@
+import os
+import gridfs
+import pytest
+from video_cache import VideoCache
+
+
+@pytest.fixture
+def file_id(db):
+    return gridfs.GridFS(db).put(bytes(range(256)) * 8, chunk_size=256, filename="clip.mp4")
+
+
+def _cache(db, tmp_path, disk_max_bytes=1 << 20):
+    return VideoCache(db, max_bytes=512, disk_dir=str(tmp_path), disk_max_bytes=disk_max_bytes)
+
+
+def test_reads_span_memory_and_disk(db, tmp_path, file_id):
+    cache = _cache(db, tmp_path)
+    data = bytes(range(256)) * 8
+    handle = cache.open(file_id)
+    assert handle.read() == data
+    handle.seek(100)
+    assert handle.read(300) == data[100:400]
+    assert cache.get_stats()["disk_hits"] > 0
+
+
+def test_spilled_chunks_are_adopted_after_restart(db, tmp_path, file_id):
+    cache = _cache(db, tmp_path)
+    cache.open(file_id).read()
+    spilled = cache.get_stats()["disk_bytes"]
+    assert spilled > 0
+    (tmp_path / str(file_id) / "0.1234.tmp").write_bytes(b"partial")
+
+    restarted = _cache(db, tmp_path)
+    assert restarted.get_stats()["disk_bytes"] == spilled
+    assert not (tmp_path / str(file_id) / "0.1234.tmp").exists()
+    assert restarted.get_chunks(file_id, 0, 0) == [bytes(range(256))]
+    assert restarted.get_stats()["disk_hits"] == 1
+
+
+def test_adopted_chunks_over_the_limit_are_deleted(db, tmp_path, file_id):
+    _cache(db, tmp_path).open(file_id).read()
+    restarted = _cache(db, tmp_path, disk_max_bytes=512)
+    assert restarted.get_stats()["disk_bytes"] <= 512
+    on_disk = sum(len(files) for _, _, files in os.walk(tmp_path))
+    assert on_disk == len(restarted.disk.index.entries)
@@ -0,0 +1,86 @@
+import threading
+import pytest
+from pymongo.errors import DuplicateKeyError
+from visited_store import VisitedSet, VisitedStore
+
+
+@pytest.fixture
+def collection(db):
+    from stand_in import BitwiseCollection
+    return BitwiseCollection(db["visited_videos"])
+
+
+def test_visited_set_switches_to_bitmap_when_smaller():
+    visited = VisitedSet()
+    for index in (1000, 5, 70):
+        visited.add(index)
+    assert visited.bits is None
+    assert list(visited.indexes) == [5, 70, 1000]
+    for index in range(0, 32):
+        visited.add(index)
+    assert visited.bits is not None and not len(visited.indexes)
+    assert all(index in visited for index in [*range(32), 70, 1000])
+    assert 33 not in visited and 999 not in visited and 5000 not in visited
+
+
+def test_visited_set_from_words_and_mask():
+    words = {"0": 0b101, "3": 1 << 31}
+    sparse = VisitedSet.from_words(words)
+    assert sparse.bits is None and list(sparse.indexes) == [0, 2, 127]
+    dense = VisitedSet.from_words({"0": 0xFFFFFFFF, "1": 1})
+    assert dense.bits is not None and 32 in dense and 33 not in dense
+    mask = sparse.mask(100)
+    assert mask.shape == (100,) and list(mask.nonzero()[0]) == [0, 2]
+    assert list(dense.mask(40).nonzero()[0]) == list(range(33))
+
+
+def test_claim_once(collection):
+    store = VisitedStore(collection)
+    assert store.claim("u", 7)
+    assert not store.claim("u", 7)
+    assert store.is_visited("u", 7) and not store.is_visited("u", 8)
+    # A fresh process reads the same history back from Mongo
+    assert VisitedStore(collection).is_visited("u", 7)
+
+
+def test_claim_race_has_one_winner(collection):
+    stores = [VisitedStore(collection) for _ in range(2)]
+    results = []
+    barrier = threading.Barrier(8)
+
+    def worker(store):
+        barrier.wait()
+        results.append(store.claim("u", 42))
+    threads = [threading.Thread(target=worker, args=(stores[i % 2],)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results.count(True) == 1
+
+
+class _FirstUpsertCollides:
+    """Another worker creates the user's document between our filter miss and
+    our insert, so the upsert fails even though our bit isn't set."""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.collided = False
+
+    def find_one(self, *args, **kwargs):
+        return self.collection.find_one(*args, **kwargs)
+
+    def update_one(self, query, update, upsert=False):
+        if upsert and not self.collided:
+            self.collided = True
+            self.collection.update_one({"_id": query["_id"], "w.0": {"$not": {"$bitsAnySet": 1}}},
+                                       {"$bit": {"w.0": {"or": 1}}}, upsert=True)
+            raise DuplicateKeyError("E11000 duplicate key error")
+        return self.collection.update_one(query, update, upsert=upsert)
+
+
+def test_claim_retries_after_losing_the_insert_race(collection):
+    store = VisitedStore(_FirstUpsertCollides(collection))
+    assert store.claim("u", 9)
+    assert VisitedStore(collection).is_visited("u", 9)
+    assert VisitedStore(collection).is_visited("u", 0)
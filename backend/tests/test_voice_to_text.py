@@ -0,0 +1,32 @@
+import pytest
+
+pytest.importorskip("whisper")
+from voice_to_text import FfmpegProgress
+
+
+@pytest.fixture
+def progress():
+    progress = FfmpegProgress(desc="test")
+    yield progress
+    progress.close()
+
+
+def test_duration_is_parsed(progress):
+    progress.feed("  Duration: 00:01:02.50, start: 0.000000, bitrate: 1205 kb/s")
+    assert progress.duration == pytest.approx(62.5)
+
+
+def test_unknown_duration_does_not_raise(progress):
+    progress.feed("  Duration: N/A, start: 0.000000, bitrate: N/A")
+    assert progress.duration is None
+    # Progress lines without a duration are ignored rather than dividing by it
+    progress.feed("out_time_us=1000000")
+    assert progress.pbar.n == 0
+
+
+def test_out_time_updates_percentage(progress):
+    progress.feed("Duration: 00:00:10.00, start: 0.000000")
+    progress.feed("out_time_us=2500000")
+    assert progress.pbar.n == 25
+    progress.feed("out_time_us=N/A")
+    assert progress.pbar.n == 25
@@ -0,0 +1,75 @@
+import pytest
+from watch_events import WatchAggregator
+
+
+@pytest.fixture(autouse=True)
+def users(db):
+    db["users"].insert_many([{"_id": "a", "bias_score": 0.0, "num_poles": 0}, {"_id": "b"}])
+
+
+@pytest.fixture
+def aggregator(db):
+    # A long interval so only explicit flush() calls write
+    return WatchAggregator(db["users"], flush_interval=3600)
+
+
+def test_flush_folds_events_into_one_write_per_user(db, aggregator):
+    db["users"].update_one({"_id": "a"}, {"$set": {"bias_score": 0.5, "num_poles": 1, "bias_sum": 0.5}})
+    for pole in (1.0, -1.0, 0.5):
+        aggregator.record("a", pole)
+    aggregator.record("b", -0.4)
+    assert aggregator.current_bias("a") is None
+    assert aggregator.flush() == 2
+
+    a = db["users"].find_one({"_id": "a"})
+    assert a["num_poles"] == 4 and a["bias_sum"] == pytest.approx(1.0)
+    assert a["bias_score"] == pytest.approx((0.5 + 1.0 - 1.0 + 0.5) / 4)
+    b = db["users"].find_one({"_id": "b"})
+    assert b["num_poles"] == 1 and b["bias_score"] == pytest.approx(-0.4)
+    assert aggregator.flush() == 0
+
+
+def test_current_bias_includes_pending_events(aggregator):
+    aggregator.record("a", 1.0)
+    aggregator.flush()
+    aggregator.record("a", 0.0)
+    assert aggregator.current_bias("a") == pytest.approx(0.5)
+
+
+def test_two_workers_keep_exact_counts(db):
+    workers = [WatchAggregator(db["users"], flush_interval=3600) for _ in range(2)]
+    workers[0].record("a", 1.0)
+    workers[1].record("a", -1.0)
+    workers[1].record("a", -1.0)
+    for worker in workers:
+        worker.flush()
+    a = db["users"].find_one({"_id": "a"})
+    assert a["num_poles"] == 3 and a["bias_sum"] == pytest.approx(-1.0)
+
+
+class _Failing:
+    def __init__(self, collection):
+        self.collection = collection
+        self.fail = True
+
+    def find(self, *args, **kwargs):
+        return self.collection.find(*args, **kwargs)
+
+    def bulk_write(self, *args, **kwargs):
+        if self.fail:
+            raise RuntimeError("mongo down")
+        return self.collection.bulk_write(*args, **kwargs)
+
+
+def test_failed_flush_keeps_events_in_order(db):
+    users = _Failing(db["users"])
+    aggregator = WatchAggregator(users, flush_interval=3600)
+    aggregator.record("a", 1.0)
+    with pytest.raises(RuntimeError):
+        aggregator.flush()
+    aggregator.record("a", 0.0)
+    assert aggregator.get_stats()["pending_events"] == 2
+    users.fail = False
+    aggregator.flush()
+    a = db["users"].find_one({"_id": "a"})
+    assert a["num_poles"] == 2 and a["bias_score"] == pytest.approx(0.5)
@@ -1,80 +1,152 @@
+import io
 import os
+import re
 import math
+import time
 import requests
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 from pydub import AudioSegment
-import subprocess
 from dotenv import load_dotenv
+import metrics
 
 load_dotenv()
 
 API_KEY = os.getenv("HUGGINGFACE_API_KEY")
 # Hugging Face API settings
-API_URL = "https://api-inference.huggingface.co/models/openai/whisper-large"
+API_URL = os.getenv("HF_WHISPER_API_URL", "https://api-inference.huggingface.co/models/openai/whisper-large")
 HEADERS = {"Authorization": f"Bearer {API_KEY}"}
 
+# Chunks in flight at once
+TRANSCRIBE_CONCURRENCY = int(os.getenv("TRANSCRIBE_CONCURRENCY", "4"))
+# Per-chunk retries on 429/5xx/connection errors, with exponential backoff
+TRANSCRIBE_MAX_RETRIES = int(os.getenv("TRANSCRIBE_MAX_RETRIES", "3"))
+TRANSCRIBE_BACKOFF = float(os.getenv("TRANSCRIBE_BACKOFF", "1.0"))
+TRANSCRIBE_TIMEOUT = float(os.getenv("TRANSCRIBE_TIMEOUT", "120"))
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
 
+# One pooled session shared by every chunk request
+session = requests.Session()
+session.mount("https://", HTTPAdapter(pool_maxsize=max(TRANSCRIBE_CONCURRENCY, 10)))
+session.mount("http://", HTTPAdapter(pool_maxsize=max(TRANSCRIBE_CONCURRENCY, 10)))
 
-# Step 1: Extract audio from the MP4 file using ffmpeg
+
+# Step 1: Decode the audio track of the MP4 file (pydub runs ffmpeg for us)
 def extract_audio(mp4_path):
-    audio_path = mp4_path.replace(".mp4", ".mp3")
-    command = ["ffmpeg", "-i", mp4_path, "-vn", "-acodec", "mp3", audio_path]
-    subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    return audio_path
+    return AudioSegment.from_file(mp4_path, format="mp4")
 
 
-# Step 2: Split the audio into chunks (30 seconds each by default)
-def split_audio(audio_path, chunk_length_ms=20000):  # 30 seconds per chunk
-    """Splits the audio file into smaller chunks."""
-    audio = AudioSegment.from_file(audio_path)
-    chunks = []
-    num_chunks = math.ceil(len(audio) / chunk_length_ms)
+def _check_overlap(chunk_length_ms, overlap_ms):
+    if not 0 <= overlap_ms < chunk_length_ms:
+        raise ValueError(f"overlap_ms must be in [0, chunk_length_ms); got overlap_ms={overlap_ms}, "
+                         f"chunk_length_ms={chunk_length_ms}")
 
-    for i in range(num_chunks):
-        start = i * chunk_length_ms
-        end = (i + 1) * chunk_length_ms
-        chunk = audio[start:end]
-        chunk_path = f"chunk_{i}.mp3"
-        chunk.export(chunk_path, format="mp3")
-        chunks.append(chunk_path)
 
-    return chunks
+# Step 2: Split the audio into MP3 chunks (20 seconds each by default)
+def chunk_bounds(length_ms, chunk_length_ms=20000, overlap_ms=0):
+    """(start, end) in ms of each chunk. Consecutive chunks share `overlap_ms`
+    of audio so words cut at a boundary aren't lost."""
+    _check_overlap(chunk_length_ms, overlap_ms)
+    step = chunk_length_ms - overlap_ms
+    num_chunks = max(1, math.ceil((length_ms - overlap_ms) / step))
+    return [(i * step, i * step + chunk_length_ms) for i in range(num_chunks)]
 
 
-# Step 3: Transcribe each audio chunk using Hugging Face API
-def transcribe_audio_chunk(audio_path):
-    """Sends the extracted audio chunk to Hugging Face Whisper API and returns the transcript."""
-    with open(audio_path, "rb") as f:
-        response = requests.post(API_URL, headers=HEADERS, files={"file": f})
+def encode_chunk(audio, start, end):
+    """One slice of the audio encoded as MP3 bytes."""
+    buffer = io.BytesIO()
+    audio[start:end].export(buffer, format="mp3")
+    return buffer.getvalue()
 
-    if response.status_code != 200:
-        print(f"Error: {response.status_code}, {response.text}")
-        return "Transcription failed due to request error."
 
-    result = response.json()
+def split_audio(audio, chunk_length_ms=20000, overlap_ms=0):
+    """Splits the audio into chunks encoded as MP3 bytes, all up front."""
+    return [encode_chunk(audio, start, end) for start, end in chunk_bounds(len(audio), chunk_length_ms, overlap_ms)]
 
-    if 'error' in result:
-        print(f"API Error: {result['error']}")
-        return "Transcription failed due to API error."
 
-    return result.get("text", "Transcription failed.")
+# Step 3: Transcribe each audio chunk using Hugging Face API
+def transcribe_audio_chunk(chunk_bytes):
+    """Sends one audio chunk to Hugging Face Whisper API and returns the transcript,
+    retrying transient failures with exponential backoff."""
+    for attempt in range(TRANSCRIBE_MAX_RETRIES + 1):
+        last_attempt = attempt == TRANSCRIBE_MAX_RETRIES
+        try:
+            with metrics.time_outbound("hf_whisper") as call:
+                response = session.post(
+                    API_URL, headers=HEADERS, files={"file": ("chunk.mp3", chunk_bytes, "audio/mpeg")},
+                    timeout=TRANSCRIBE_TIMEOUT
+                )
+                call["status"] = response.status_code
+        except requests.RequestException as e:
+            if last_attempt:
+                print(f"Error: {e}")
+                return "Transcription failed due to request error."
+            time.sleep(TRANSCRIBE_BACKOFF * 2 ** attempt)
+            continue
+
+        if response.status_code in RETRY_STATUS_CODES and not last_attempt:
+            time.sleep(TRANSCRIBE_BACKOFF * 2 ** attempt)
+            continue
+        if response.status_code != 200:
+            print(f"Error: {response.status_code}, {response.text}")
+            return "Transcription failed due to request error."
+
+        result = response.json()
+
+        if 'error' in result:
+            print(f"API Error: {result['error']}")
+            return "Transcription failed due to API error."
+
+        return result.get("text", "Transcription failed.")
+
+
+def _normalize_word(word):
+    return re.sub(r"[^\w']", "", word.lower())
+
+
+def merge_overlap(previous, current, max_words=12):
+    """Joins two chunk transcripts, dropping the longest run of words at the
+    start of `current` that repeats the end of `previous`."""
+    prev_words = previous.split()
+    cur_words = current.split()
+    prev_norm = [_normalize_word(w) for w in prev_words[-max_words:]]
+    cur_norm = [_normalize_word(w) for w in cur_words[:max_words]]
+    for k in range(min(len(prev_norm), len(cur_norm)), 0, -1):
+        if prev_norm[-k:] == cur_norm[:k]:
+            cur_words = cur_words[k:]
+            break
+    return " ".join(prev_words + cur_words)
 
 
 # Step 4: Transcribe the full MP4 video
-def transcribe_mp4(mp4_path):
-    audio_path = extract_audio(mp4_path)
-    chunks = split_audio(audio_path)
-    full_transcript = ""
-
-    for chunk in chunks:
-        transcript = transcribe_audio_chunk(chunk)
-        full_transcript += transcript + " "
-        os.remove(chunk)  # Remove chunk after processing
+def transcribe_mp4(mp4_path, concurrency=TRANSCRIBE_CONCURRENCY, chunk_length_ms=20000, overlap_ms=0):
+    """Transcribes all chunks concurrently and reassembles them in order; with
+    overlap_ms > 0 the repeated words at chunk boundaries are de-duplicated."""
+    # Before decoding, so a bad setting fails fast
+    _check_overlap(chunk_length_ms, overlap_ms)
+    audio = extract_audio(mp4_path)
+    bounds = chunk_bounds(len(audio), chunk_length_ms, overlap_ms)
+
+    # Each worker encodes its own chunk and uploads it, so encoding overlaps the
+    # other uploads and at most `concurrency` encoded chunks are held at once
+    def encode_and_transcribe(bound):
+        return transcribe_audio_chunk(encode_chunk(audio, *bound))
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        transcripts = list(executor.map(encode_and_transcribe, bounds))
 
-    os.remove(audio_path)  # Remove the extracted audio after processing
+    full_transcript = ""
+    for transcript in transcripts:
+        transcript = transcript.strip()
+        if overlap_ms and full_transcript:
+            full_transcript = merge_overlap(full_transcript, transcript)
+        else:
+            full_transcript += " " + transcript
     return full_transcript.strip()
 
 
-# Example usage
-mp4_file_path = "../test_data/Video-12.mp4"  # Path to your MP4 file
-transcript = transcribe_mp4(mp4_file_path)
-print(transcript)
+if __name__ == "__main__":
+    # Example usage
+    mp4_file_path = "../test_data/Video-12.mp4"  # Path to your MP4 file
+    transcript = transcribe_mp4(mp4_file_path)
+    print(transcript)
@@ -1,6 +1,27 @@
-from sentence_transformers import SentenceTransformer
+import inference_backend
+import metrics
 
-model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+# Stored with every embedding; includes the inference backend unless it's fp32 torch
+EMBEDDING_MODEL_VERSION = inference_backend.version_key(EMBEDDING_MODEL)
+
+# Loaded on first use so importing this module stays cheap
+_model = None
+
+def get_model():
+    global _model
+    if _model is None:
+        # fp32 PyTorch, int8-quantized or ONNX per INFERENCE_BACKEND
+        _model = inference_backend.load_sentence_encoder(EMBEDDING_MODEL)
+    return _model
 
 def vectorize_transcript(text):
-    return model.encode([text])[0].tolist()  
+    model = get_model()
+    with metrics.timer(metrics.MODEL_SECONDS, model="minilm"):
+        return model.encode([text])[0].tolist()
+
+def vectorize_transcripts(texts, batch_size=64):
+    """Encodes many transcripts in one call; returns a list of embedding lists."""
+    model = get_model()
+    with metrics.timer(metrics.MODEL_SECONDS, model="minilm"):
+        return model.encode(list(texts), batch_size=batch_size).tolist()
@@ -0,0 +1,281 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import gridfs
+from bson.objectid import ObjectId
+
+# -----------------------------------------------------------------------------
+# Byte-bounded LRU cache of GridFS chunks in front of fs.get, with an optional
+# on-disk tier for chunks evicted from memory and background prefetch of the
+# first chunks of the next feed video.
+# -----------------------------------------------------------------------------
+
+CACHE_MAX_BYTES = int(os.environ.get("VIDEO_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+# Set to a directory to keep evicted chunks on local disk
+CACHE_DISK_DIR = os.environ.get("VIDEO_CACHE_DISK_DIR")
+CACHE_DISK_MAX_BYTES = int(os.environ.get("VIDEO_CACHE_DISK_MAX_BYTES", str(2 * 1024 * 1024 * 1024)))
+# Chunks fetched ahead for the video /randomize_feed just returned
+PREFETCH_CHUNKS = int(os.environ.get("VIDEO_CACHE_PREFETCH_CHUNKS", "4"))
+MAX_CACHED_FILES = 10000
+
+
+class _ByteLRU:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+
+    def get(self, key):
+        value = self.entries.get(key)
+        if value is not None:
+            self.entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        """Inserts value and returns the list of (key, value) pairs evicted."""
+        if key in self.entries:
+            self.bytes -= len(self.entries.pop(key))
+        if len(value) > self.max_bytes:
+            return [(key, value)]
+        self.entries[key] = value
+        self.bytes += len(value)
+        evicted = []
+        while self.bytes > self.max_bytes:
+            old_key, old_value = self.entries.popitem(last=False)
+            self.bytes -= len(old_value)
+            evicted.append((old_key, old_value))
+        return evicted
+
+
+class _DiskTier:
+    """Chunks evicted from memory, stored as <dir>/<files_id>/<n>. The index
+    methods must be called under the cache lock; read / write / delete do the
+    file I/O and are called without it."""
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.index = _ByteLRU(max_bytes)  # key -> size marker (bytes of that length aren't kept)
+        self.delete(self._adopt())
+
+    def _adopt(self):
+        """Indexes chunks spilled by a previous process, oldest first so the
+        LRU order roughly survives a restart. GridFS chunks never change, so
+        they are still valid. Returns the keys that no longer fit."""
+        found = []
+        for dirpath, _, filenames in os.walk(self.directory):
+            files_id = os.path.basename(dirpath)
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                if dirpath == self.directory or not name.isdigit():
+                    # Half-written .tmp files and anything else that isn't a chunk
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                    continue
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                key = (ObjectId(files_id) if ObjectId.is_valid(files_id) else files_id, int(name))
+                found.append((stat.st_mtime, key, stat.st_size))
+        stale = []
+        for _, key, size in sorted(found, key=lambda entry: entry[0]):
+            stale.extend(self.record(key, size))
+        return stale
+
+    def _path(self, key):
+        files_id, n = key
+        return os.path.join(self.directory, str(files_id), str(n))
+
+    def contains(self, key):
+        return self.index.get(key) is not None
+
+    def record(self, key, size):
+        """Adds key to the index; returns the keys whose files should be deleted."""
+        return [old_key for old_key, _ in self.index.put(key, _SizeMarker(size))
+                if old_key not in self.index.entries]
+
+    def read(self, key):
+        try:
+            with open(self._path(key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def write(self, key, value):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Written aside and renamed, so a concurrent read never sees a partial chunk
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(value)
+        os.replace(tmp_path, path)
+
+    def delete(self, keys):
+        for key in keys:
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+
+class _SizeMarker:
+    __slots__ = ("size",)
+
+    def __init__(self, size):
+        self.size = size
+
+    def __len__(self):
+        return self.size
+
+
+class VideoCache:
+    def __init__(self, db, max_bytes=CACHE_MAX_BYTES, disk_dir=CACHE_DISK_DIR,
+                 disk_max_bytes=CACHE_DISK_MAX_BYTES, bucket="fs"):
+        # Collections are looked up per use so a lazy db handle stays lazy
+        self.db = db
+        self.bucket = bucket
+        self.memory = _ByteLRU(max_bytes)
+        self.disk = _DiskTier(disk_dir, disk_max_bytes) if disk_dir else None
+        self.file_docs = OrderedDict()
+        self.lock = threading.Lock()
+        self.prefetcher = ThreadPoolExecutor(max_workers=2, thread_name_prefix="video-prefetch")
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "prefetches": 0}
+
+    @property
+    def files(self):
+        return self.db[f"{self.bucket}.files"]
+
+    @property
+    def chunks(self):
+        return self.db[f"{self.bucket}.chunks"]
+
+    def open(self, file_id):
+        """Returns a seekable, file-like view of a GridFS file backed by the cache."""
+        with self.lock:
+            doc = self.file_docs.get(file_id)
+            if doc is not None:
+                self.file_docs.move_to_end(file_id)
+        if doc is None:
+            doc = self.files.find_one({"_id": file_id})
+            if doc is None:
+                raise gridfs.errors.NoFile(f"no file in gridfs with _id {file_id!r}")
+            with self.lock:
+                self.file_docs[file_id] = doc
+                while len(self.file_docs) > MAX_CACHED_FILES:
+                    self.file_docs.popitem(last=False)
+        return CachedGridFile(self, doc)
+
+    def get_chunks(self, file_id, first, last):
+        """Returns chunks first..last (inclusive) of a file, fetching all the
+        missing ones from Mongo in a single query. The lock only guards the LRU
+        bookkeeping; Mongo and disk reads / writes happen outside it."""
+        found = {}
+        on_disk = []
+        with self.lock:
+            for n in range(first, last + 1):
+                data = self.memory.get((file_id, n))
+                if data is not None:
+                    self.stats["hits"] += 1
+                    found[n] = data
+                elif self.disk is not None and self.disk.contains((file_id, n)):
+                    on_disk.append(n)
+
+        fetched = {}
+        for n in on_disk:
+            data = self.disk.read((file_id, n))
+            if data is not None:
+                found[n] = fetched[n] = data
+        disk_hits = len(fetched)
+
+        missing = [n for n in range(first, last + 1) if n not in found]
+        if missing:
+            chunks = list(self.chunks.find({"files_id": file_id, "n": {"$gte": missing[0], "$lte": missing[-1]}}))
+            for chunk in chunks:
+                if chunk["n"] not in found:
+                    found[chunk["n"]] = fetched[chunk["n"]] = bytes(chunk["data"])
+
+        evicted = []
+        with self.lock:
+            self.stats["disk_hits"] += disk_hits
+            self.stats["misses"] += len(missing)
+            for n, data in fetched.items():
+                evicted.extend(self._put(file_id, n, data))
+        self._spill(evicted)
+
+        absent = [n for n in range(first, last + 1) if n not in found]
+        if absent:
+            raise gridfs.errors.CorruptGridFile(f"missing chunks {absent} of gridfs file {file_id!r}")
+        return [found[n] for n in range(first, last + 1)]
+
+    def _put(self, file_id, n, data):
+        """Adds a chunk to memory (under the lock); returns the evicted pairs."""
+        evicted = self.memory.put((file_id, n), data)
+        self.stats["evictions"] += len(evicted)
+        return evicted
+
+    def _spill(self, evicted):
+        """Moves chunks evicted from memory to the disk tier (outside the lock)."""
+        if self.disk is None or not evicted:
+            return
+        for key, value in evicted:
+            self.disk.write(key, value)
+        with self.lock:
+            stale = [old_key for key, value in evicted for old_key in self.disk.record(key, len(value))]
+        self.disk.delete(stale)
+
+    def prefetch(self, file_id, num_chunks=PREFETCH_CHUNKS):
+        """Warms the first chunks of a file in the background."""
+        def run():
+            try:
+                handle = self.open(file_id)
+                last = min(num_chunks, handle.num_chunks) - 1
+                if last >= 0:
+                    self.get_chunks(file_id, 0, last)
+                    with self.lock:
+                        self.stats["prefetches"] += 1
+            except Exception as e:
+                print(f"❌ Prefetch of {file_id} failed: {e}")
+        self.prefetcher.submit(run)
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+            stats["memory_bytes"] = self.memory.bytes
+            stats["memory_chunks"] = len(self.memory.entries)
+            if self.disk is not None:
+                stats["disk_bytes"] = self.disk.index.bytes
+            return stats
+
+
+class CachedGridFile:
+    """Just enough of the GridOut interface for streaming.py and app.py."""
+
+    def __init__(self, cache, doc):
+        self.cache = cache
+        self._id = doc["_id"]
+        self.length = doc["length"]
+        self.chunk_size = doc["chunkSize"]
+        self.upload_date = doc["uploadDate"]
+        self.content_type = doc.get("contentType") or doc.get("metadata", {}).get("contentType")
+        self.num_chunks = -(-self.length // self.chunk_size)
+        self.position = 0
+
+    def seek(self, position):
+        self.position = max(0, min(position, self.length))
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self.length - self.position
+        end = min(self.position + size, self.length)
+        if end <= self.position:
+            return b""
+        first = self.position // self.chunk_size
+        last = (end - 1) // self.chunk_size
+        data = b"".join(self.cache.get_chunks(self._id, first, last))
+        offset = self.position - first * self.chunk_size
+        data = data[offset:offset + (end - self.position)]
+        self.position += len(data)
+        return data
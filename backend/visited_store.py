@@ -0,0 +1,153 @@
+import os
+import threading
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+import numpy as np
+from pymongo.errors import DuplicateKeyError
+
+# -----------------------------------------------------------------------------
+# Per-user visited-video bitmaps over the dense `feed_index` of each video.
+#
+# Mongo holds the source of truth as 32-bit words ({"_id": user_id, "w": {"<k>": int}})
+# updated with $bit, so claiming a video is one atomic round trip that every
+# worker agrees on. Each process keeps an LRU of recently active users' visited
+# sets: a sorted array of feed indexes (4 bytes per visit) while that is the
+# smaller form, switching to a bitmap (bit i == feed_index i, catalog_size / 8
+# bytes) once the user has seen more than 1 in 32 videos.
+# -----------------------------------------------------------------------------
+
+WORD_BITS = 32
+WORD_BYTES = WORD_BITS // 8
+# Users whose bitmap is kept in memory per process
+MAX_CACHED_USERS = int(os.environ.get("VISITED_CACHE_USERS", "10000"))
+
+
+class VisitedSet:
+    """One user's visited feed indexes, sparse or dense, whichever is smaller."""
+
+    __slots__ = ("indexes", "bits")
+
+    def __init__(self):
+        self.indexes = array("I")
+        self.bits = None
+
+    @classmethod
+    def from_words(cls, words):
+        """Builds the set from Mongo's {"<k>": 32-bit word} map."""
+        visited = cls()
+        words = {int(k): int(word) for k, word in words.items() if word}
+        if not words:
+            return visited
+        # 4 bytes per index vs 4 bytes per word up to the highest one
+        if sum(word.bit_count() for word in words.values()) >= max(words) + 1:
+            visited.bits = bytearray(WORD_BYTES * (max(words) + 1))
+            for k, word in words.items():
+                visited.bits[k * WORD_BYTES:(k + 1) * WORD_BYTES] = word.to_bytes(WORD_BYTES, "little")
+        else:
+            visited.indexes = array("I", sorted(
+                k * WORD_BITS + bit for k, word in words.items() for bit in range(WORD_BITS) if word >> bit & 1
+            ))
+        return visited
+
+    def __contains__(self, index):
+        bits = self.bits
+        if bits is not None:
+            byte = index >> 3
+            return byte < len(bits) and bool(bits[byte] & (1 << (index & 7)))
+        indexes = self.indexes
+        i = bisect_left(indexes, index)
+        return i < len(indexes) and indexes[i] == index
+
+    def add(self, index):
+        if self.bits is None:
+            i = bisect_left(self.indexes, index)
+            if i < len(self.indexes) and self.indexes[i] == index:
+                return
+            self.indexes.insert(i, index)
+            # 4 bytes per index vs 1 bit per feed_index up to the highest one
+            if len(self.indexes) * WORD_BITS < self.indexes[-1] + 1:
+                return
+            self.bits = self._to_bits(self.indexes)
+            self.indexes = array("I")
+            return
+        byte = index >> 3
+        if byte >= len(self.bits):
+            self.bits.extend(bytes(WORD_BYTES * ((byte // WORD_BYTES) + 1) - len(self.bits)))
+        self.bits[byte] |= 1 << (index & 7)
+
+    @staticmethod
+    def _to_bits(indexes):
+        seen = np.zeros(-(-(indexes[-1] + 1) // WORD_BITS) * WORD_BITS, dtype=bool)
+        seen[np.frombuffer(indexes, dtype=np.uint32)] = True
+        return bytearray(np.packbits(seen, bitorder="little").tobytes())
+
+    def mask(self, n):
+        """Boolean array of length n, True at visited feed indexes."""
+        if self.bits is not None:
+            seen = np.unpackbits(np.frombuffer(bytes(self.bits), dtype=np.uint8), bitorder="little")[:n].astype(bool)
+            return np.pad(seen, (0, n - len(seen)))
+        indexes = np.frombuffer(self.indexes, dtype=np.uint32) if len(self.indexes) else np.zeros(0, dtype=np.uint32)
+        seen = np.zeros(n, dtype=bool)
+        seen[indexes[indexes < n]] = True
+        return seen
+
+
+class VisitedStore:
+    def __init__(self, collection, max_users=MAX_CACHED_USERS):
+        self.collection = collection
+        self.max_users = max_users
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+
+    def visited(self, user_id):
+        """The user's (possibly slightly stale) local VisitedSet, loading it on a miss."""
+        with self.lock:
+            visited = self.cache.get(user_id)
+            if visited is not None:
+                self.cache.move_to_end(user_id)
+                return visited
+        visited = self._load(user_id)
+        with self.lock:
+            visited = self.cache.setdefault(user_id, visited)
+            self.cache.move_to_end(user_id)
+            while len(self.cache) > self.max_users:
+                self.cache.popitem(last=False)
+        return visited
+
+    def _load(self, user_id):
+        doc = self.collection.find_one({"_id": user_id}) or {}
+        return VisitedSet.from_words(doc.get("w", {}))
+
+    def is_visited(self, user_id, index):
+        return index in self.visited(user_id)
+
+    def _set_local(self, user_id, index):
+        visited = self.visited(user_id)
+        with self.lock:
+            visited.add(index)
+
+    def claim(self, user_id, index):
+        """Atomically marks feed_index as visited. Returns False if the user had
+        already been shown it (possibly by another worker)."""
+        field = f"w.{index // WORD_BITS}"
+        mask = 1 << (index % WORD_BITS)
+        query = {"_id": user_id, field: {"$not": {"$bitsAnySet": mask}}}
+        update = {"$bit": {field: {"or": mask}}}
+        try:
+            result = self.collection.update_one(query, update, upsert=True)
+            claimed = result.modified_count == 1 or result.upserted_id is not None
+        except DuplicateKeyError:
+            # Either the bit is already set, or another worker created the
+            # user's document first; the document exists now, so retry as a
+            # plain update to tell the two apart
+            result = self.collection.update_one(query, update)
+            claimed = result.modified_count == 1
+        # Either way the bit is now set in Mongo
+        self._set_local(user_id, index)
+        return claimed
+
+    def forget(self, user_id):
+        """Drops the local copy; the next access reloads from Mongo."""
+        with self.lock:
+            self.cache.pop(user_id, None)
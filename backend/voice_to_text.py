@@ -1,12 +1,28 @@
 import os
+import time
 import tempfile
 import subprocess
+import threading
+import multiprocessing
+import numpy as np
 import whisper
 import gridfs
 from bson.objectid import ObjectId
-from pymongo import MongoClient
+from pymongo import UpdateOne
 from tqdm import tqdm
 from database import dbConfig
+import metrics
+
+# Whisper model size: "tiny", "base", "small", "medium" or "large"
+WHISPER_MODEL = os.environ.get("WHISPER_MODEL", "tiny")
+# Worker processes (each holds its own copy of the model)
+TRANSCRIBE_PROCESSES = int(os.environ.get("TRANSCRIBE_PROCESSES", "2"))
+# Pending videos claimed per round; transcripts are written back in one bulk_write
+TRANSCRIBE_BATCH_SIZE = int(os.environ.get("TRANSCRIBE_BATCH_SIZE", "16"))
+# Seconds to sleep when there's nothing to transcribe
+TRANSCRIBE_POLL_INTERVAL = float(os.environ.get("TRANSCRIBE_POLL_INTERVAL", "10"))
+# A claim older than this is assumed to belong to a crashed worker
+TRANSCRIBE_LEASE_SECONDS = int(os.environ.get("TRANSCRIBE_LEASE_SECONDS", "1800"))
 
 # -----------------------------------------------------------------------------
 # 1) CONNECT TO MONGODB
@@ -14,14 +30,11 @@ from database import dbConfig
 def connect_to_db():
     """
     Connects to MongoDB and returns (db, fs).
-    Adjust the connection string, db name, and collection name as needed.
+    Uses the MONGO_URI connection from database/dbConfig.py.
     """
     try:
-        # Example connecting to local or Atlas
-        client = MongoClient("mongodb://localhost:27017")  
-        # client = MongoClient("mongodb+srv://<username>:<password>@<cluster-url>/")
-        print("✅ Successfully connected to MongoDB!")
-        db = client["YOUR_DATABASE_NAME"]  # <-- Change this
+        # Same database the app and dbOperations use
+        db = dbConfig.get_db()
         fs = gridfs.GridFS(db)
         return db, fs
     except Exception as e:
@@ -31,7 +44,7 @@ def connect_to_db():
 db, fs = connect_to_db()
 
 # -----------------------------------------------------------------------------
-# 2) FETCH VIDEO BY GRIDFS _id
+# 2) FETCH VIDEO BY GRIDFS _id (ONLY USED BY THE TEMP-FILE FALLBACK)
 # -----------------------------------------------------------------------------
 def get_video_bytes(gridfs_id: str) -> bytes:
     """
@@ -46,85 +59,166 @@ def get_video_bytes(gridfs_id: str) -> bytes:
         raise e
 
 # -----------------------------------------------------------------------------
-# 3) EXTRACT AUDIO WITH FFMPEG (SHOW AN APPROXIMATE PROGRESS BAR)
+# 3) EXTRACT AUDIO WITH FFMPEG, STREAMING GRIDFS -> STDIN, PCM STDOUT -> NUMPY
 # -----------------------------------------------------------------------------
+SAMPLE_RATE = 16000  # Whisper expects 16 kHz mono float32
+PCM_READ_SIZE = 64 * 1024
+
+class FfmpegProgress:
+    """
+    Real extraction progress: the container duration from ffmpeg's input
+    header ("Duration: 00:01:02.50") against `-progress` out_time_us updates.
+    """
+    def __init__(self, desc="Audio Extraction"):
+        self.duration = None
+        self.pbar = tqdm(desc=desc, total=100, unit="%")
+
+    def feed(self, line):
+        line = line.strip()
+        if line.startswith("Duration:") and self.duration is None:
+            # "Duration: N/A" for some streamed containers; runs on the stderr
+            # reader thread, so a bad header must never raise
+            parts = line.split(",")[0].split("Duration:")[1].strip().split(":")
+            try:
+                if len(parts) != 3:
+                    raise ValueError(f"unparseable duration {parts!r}")
+                hours, minutes, seconds = parts
+                self.duration = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+            except ValueError:
+                self.duration = None
+        elif line.startswith(("out_time_us=", "out_time_ms=")) and self.duration:
+            try:
+                elapsed = int(line.split("=")[1]) / 1e6
+            except ValueError:
+                return
+            self.pbar.n = min(100, round(100 * elapsed / self.duration, 1))
+            self.pbar.refresh()
+
+    def close(self):
+        self.pbar.n = 100
+        self.pbar.close()
+
+def _pump_gridfs_to_stdin(grid_out, stdin):
+    try:
+        while chunk := grid_out.read(grid_out.chunk_size):
+            stdin.write(chunk)
+    except (BrokenPipeError, ValueError):
+        # ffmpeg exited early (e.g. undecodable input); its return code reports it
+        pass
+    finally:
+        try:
+            stdin.close()
+        except BrokenPipeError:
+            pass
+
+def stream_audio_from_gridfs(gridfs_id: str) -> np.ndarray:
+    """
+    Pipes a GridFS video through ffmpeg chunk by chunk and returns 16 kHz mono
+    float32 PCM ready for Whisper. No temp files are written and the video is
+    never held in memory as a whole; peak memory is ~6 bytes per audio sample.
+    """
+    grid_out = fs.get(ObjectId(gridfs_id))
+    command = [
+        "ffmpeg",
+        "-hide_banner", "-nostats",
+        "-progress", "pipe:2",
+        "-i", "pipe:0",
+        "-vn",
+        "-f", "s16le",
+        "-acodec", "pcm_s16le",
+        "-ac", "1",                 # mono
+        "-ar", str(SAMPLE_RATE),    # 16k sample rate (faster for speech models)
+        "pipe:1"
+    ]
+    process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    progress = FfmpegProgress()
+    stderr_tail = []
+
+    def read_stderr():
+        for raw in process.stderr:
+            line = raw.decode("utf-8", errors="replace")
+            progress.feed(line)
+            stderr_tail.append(line)
+            del stderr_tail[:-20]
+
+    feeder = threading.Thread(target=_pump_gridfs_to_stdin, args=(grid_out, process.stdin), daemon=True)
+    reader = threading.Thread(target=read_stderr, daemon=True)
+    feeder.start()
+    reader.start()
+
+    pcm = bytearray()
+    while block := process.stdout.read(PCM_READ_SIZE):
+        pcm.extend(block)
+    process.wait()
+    feeder.join()
+    reader.join()
+    progress.close()
+
+    if process.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed ({process.returncode}): {''.join(stderr_tail).strip()}")
+    usable = len(pcm) - len(pcm) % 2
+    return np.frombuffer(pcm, dtype=np.int16, count=usable // 2).astype(np.float32) / 32768.0
+
 def extract_audio_from_video(video_bytes: bytes) -> str:
     """
-    Takes raw video bytes, writes to a temp MP4, and uses ffmpeg to extract audio as WAV.
-    Returns the path to the temporary WAV file. Includes an approximate progress bar.
+    Fallback for MP4s whose index (moov atom) sits at the end of the file and
+    therefore can't be demuxed from a pipe: writes a temp MP4 and has ffmpeg
+    extract a temp WAV. Returns the path to the WAV file.
     """
-    # 3a) Write the video bytes to a temp .mp4 file
     video_file = tempfile.NamedTemporaryFile(suffix=".mp4", delete=False)
     video_file_path = video_file.name
     video_file.write(video_bytes)
     video_file.close()
 
-    # 3b) Prepare the audio output path (temp .wav)
     audio_file = tempfile.NamedTemporaryFile(suffix=".wav", delete=False)
     audio_file_path = audio_file.name
     audio_file.close()
 
-    # 3c) Build ffmpeg command manually (for easier progress capturing)
     command = [
         "ffmpeg",
+        "-hide_banner", "-nostats",
+        "-progress", "pipe:2",
         "-i", video_file_path,
         "-acodec", "pcm_s16le",
-        "-ac", "1",       # mono
-        "-ar", "16000",   # 16k sample rate (faster for speech models)
-        "-y",             # overwrite
+        "-ac", "1",                 # mono
+        "-ar", str(SAMPLE_RATE),
+        "-y",                       # overwrite
         audio_file_path
     ]
-
-    print("Extracting audio with ffmpeg...")
     process = subprocess.Popen(command, stderr=subprocess.PIPE, stdout=subprocess.DEVNULL, text=True)
-
-    # 3d) We'll parse lines from stderr to approximate progress
-    #     FFmpeg typically outputs something like:
-    #     "size= ... time=00:00:02.12 bitrate=..."
-    #     We'll track the "time=" to guess progress.
-    pbar = tqdm(desc="Audio Extraction", total=100, unit="%")
-    current_percent = 0
-    while True:
-        line = process.stderr.readline()
-        if not line:
-            break
-
-        # If we detect a "time=" sequence, we can do a naive increment
-        if "time=" in line:
-            # Just increment progress by a small step, up to 100
-            if current_percent < 95:
-                current_percent += 5
-                pbar.n = current_percent
-                pbar.refresh()
-
+    progress = FfmpegProgress()
+    for line in process.stderr:
+        progress.feed(line)
     process.wait()
-    pbar.n = 100
-    pbar.close()
-    print("Audio extraction complete.")
+    progress.close()
 
-    # Optionally remove the temp video file
     os.remove(video_file_path)
-
     return audio_file_path
 
 # -----------------------------------------------------------------------------
-# 4) TRANSCRIBE AUDIO WITH WHISPER (SHOW A SIMPLE PROGRESS BAR)
+# 4) TRANSCRIBE AUDIO WITH WHISPER (MODEL LOADED ONCE PER PROCESS)
 # -----------------------------------------------------------------------------
-def transcribe_audio(audio_path: str) -> str:
+_model = None
+
+def get_model():
     """
-    Transcribes a WAV audio file to text using the Whisper 'tiny' model.
-    Returns the text transcript and shows a progress bar.
+    Loads the Whisper model on first use and keeps it resident for the life of
+    the process. Larger models = better accuracy but slower.
     """
-    # We load the small 'tiny' model for speed. Larger models = better accuracy but slower.
-    model = whisper.load_model("tiny")  # or "base", "small", "medium", "large"
-    print("Transcribing with Whisper. Please wait...")
+    global _model
+    if _model is None:
+        print(f"Loading Whisper '{WHISPER_MODEL}' model...")
+        _model = whisper.load_model(WHISPER_MODEL)
+    return _model
 
-    # We can’t easily track partial progress within the .transcribe() call,
-    # so we’ll just spin a fake bar to indicate activity.
-    # The bigger/longer your file, the longer the call will block.
-    with tqdm(desc="Transcribing", total=1, unit="segments") as pbar:
-        result = model.transcribe(audio_path)
-        pbar.update(1)  # Done
+def transcribe_audio(audio) -> str:
+    """
+    Transcribes audio (a float32 16 kHz array or a WAV path) to text using the
+    resident Whisper model.
+    """
+    model = get_model()
+    with metrics.timer(metrics.MODEL_SECONDS, model="whisper"):
+        result = model.transcribe(audio)
     return result["text"]
 
 # -----------------------------------------------------------------------------
@@ -135,30 +229,128 @@ def get_transcript(gridfs_id: str) -> str:
     High-level function that fetches the video from GridFS, extracts audio, and
     returns a transcription string.
     """
-    # 5a) Fetch the video file’s raw bytes
-    video_data = get_video_bytes(gridfs_id)
-
-    # 5b) Extract audio
-    audio_path = extract_audio_from_video(video_data)
+    # 5a) Stream GridFS chunks through ffmpeg straight into a float32 buffer
+    try:
+        audio = stream_audio_from_gridfs(gridfs_id)
+    except RuntimeError as e:
+        if "moov atom not found" not in str(e):
+            raise
+        # 5b) Non-faststart MP4: ffmpeg needs to seek, so go through temp files
+        print("⚠️ Video index is at the end of the file; falling back to temp-file extraction.")
+        audio_path = extract_audio_from_video(get_video_bytes(gridfs_id))
+        try:
+            return transcribe_audio(audio_path)
+        finally:
+            os.remove(audio_path)
 
     # 5c) Transcribe
-    transcript = transcribe_audio(audio_path)
+    return transcribe_audio(audio)
 
-    # Cleanup: remove the temp audio file
-    os.remove(audio_path)
+# -----------------------------------------------------------------------------
+# 6) LONG-LIVED WORKER: TRANSCRIBE EVERY VIDEO WITH AN EMPTY TRANSCRIPT
+# -----------------------------------------------------------------------------
+def claim_pending_videos(videos_collection, limit):
+    """
+    Claims up to `limit` videos whose transcript is still empty, so several
+    worker hosts can run side by side. Returns [(video_id, gridfs_id)].
+    """
+    now = time.time()
+    claimed = []
+    for _ in range(limit):
+        video = videos_collection.find_one_and_update(
+            {
+                "transcript": "",
+                # New uploads are handled by the ingest queue (ingest_worker.py)
+                "ingest_status": {"$exists": False},
+                "transcript_status": {"$nin": ["done", "failed"]},
+                "$or": [
+                    {"transcript_claimed_at": {"$exists": False}},
+                    {"transcript_claimed_at": {"$lt": now - TRANSCRIBE_LEASE_SECONDS}},
+                ],
+            },
+            {"$set": {"transcript_status": "processing", "transcript_claimed_at": now}},
+            projection={"url": 1}
+        )
+        if video is None:
+            break
+        claimed.append((video["_id"], video["url"].replace("gridfs://", "")))
+    return claimed
+
+def _init_worker():
+    # Runs once in each pool process: connect (spawned processes get their own
+    # client via dbConfig) and load the model before taking any work.
+    global db, fs
+    db, fs = connect_to_db()
+    get_model()
 
-    return transcript
+def _transcribe_one(job):
+    video_id, gridfs_id = job
+    started = time.time()
+    try:
+        return video_id, get_transcript(gridfs_id), None, time.time() - started
+    except Exception as e:
+        return video_id, None, str(e), time.time() - started
+
+def run_worker(processes=TRANSCRIBE_PROCESSES, batch_size=TRANSCRIBE_BATCH_SIZE, once=False):
+    """
+    Pulls pending videos in batches, transcribes them across `processes`
+    worker processes and writes each batch back with a single bulk_write.
+    Reports throughput in videos/minute.
+    """
+    videos_collection = db["videos"]
+    context = multiprocessing.get_context("spawn")
+    total_done = 0
+    started = time.time()
+    with context.Pool(processes, initializer=_init_worker) as pool:
+        while True:
+            jobs = claim_pending_videos(videos_collection, batch_size)
+            if not jobs:
+                if once:
+                    break
+                time.sleep(TRANSCRIBE_POLL_INTERVAL)
+                continue
+
+            batch_started = time.time()
+            updates = []
+            for video_id, transcript, error, _ in pool.imap_unordered(_transcribe_one, jobs):
+                if error is None:
+                    updates.append(UpdateOne(
+                        {"_id": video_id},
+                        {"$set": {"transcript": transcript.strip(), "transcript_status": "done"},
+                         "$unset": {"transcript_claimed_at": ""}}
+                    ))
+                else:
+                    print(f"❌ Transcription failed for {video_id}: {error}")
+                    updates.append(UpdateOne(
+                        {"_id": video_id},
+                        {"$set": {"transcript_status": "failed", "transcript_error": error},
+                         "$unset": {"transcript_claimed_at": ""}}
+                    ))
+            videos_collection.bulk_write(updates, ordered=False)
+
+            total_done += len(jobs)
+            batch_rate = len(jobs) / max(time.time() - batch_started, 1e-9) * 60
+            overall_rate = total_done / max(time.time() - started, 1e-9) * 60
+            print(f"✅ Transcribed {len(jobs)} videos ({batch_rate:.1f} videos/min, "
+                  f"{overall_rate:.1f} videos/min overall, {total_done} total)")
+    return total_done
 
 # -----------------------------------------------------------------------------
-# 6) MAIN: CLI usage
+# 7) MAIN: CLI usage
 # -----------------------------------------------------------------------------
 if __name__ == "__main__":
     import sys
 
     if len(sys.argv) < 2:
         print("Usage: python voice_to_text.py <gridfs_file_id>")
+        print("       python voice_to_text.py --worker [processes] [--once]")
         sys.exit(1)
 
+    if sys.argv[1] == "--worker":
+        processes = int(sys.argv[2]) if len(sys.argv) > 2 and sys.argv[2].isdigit() else TRANSCRIBE_PROCESSES
+        run_worker(processes=processes, once="--once" in sys.argv)
+        sys.exit(0)
+
     video_id_input = sys.argv[1]
     text_transcript = get_transcript(video_id_input)
     print("\nFinal Transcript:\n", text_transcript)
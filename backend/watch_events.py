@@ -0,0 +1,152 @@
+import atexit
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from pymongo import UpdateOne
+from recommender import calculate_user_bias, user_state
+
+# -----------------------------------------------------------------------------
+# Write-behind aggregation of watch events into users' running bias.
+#
+# Each watched Pole is folded into the user's bias with calculate_user_bias
+# in memory; a background thread writes every dirty user with one bulk_write
+# every WATCH_FLUSH_INTERVAL seconds (sooner if WATCH_MAX_PENDING events pile
+# up), so the users collection sees one write per active user per interval
+# instead of one per swipe. num_poles and bias_sum are $inc'ed, so they stay
+# exact even when several workers serve the same user; a user's state is
+# re-derived from them (bias_sum / num_poles) whenever it is loaded.
+#
+# Loss is bounded: a crash loses at most one interval's (or WATCH_MAX_PENDING)
+# events, and a clean shutdown flushes everything via atexit.
+# -----------------------------------------------------------------------------
+
+FLUSH_INTERVAL = float(os.environ.get("WATCH_FLUSH_INTERVAL", "1"))
+# Flush early once this many events are waiting
+MAX_PENDING = int(os.environ.get("WATCH_MAX_PENDING", "10000"))
+# Events kept across failed flushes before new ones are dropped
+MAX_BACKLOG = int(os.environ.get("WATCH_MAX_BACKLOG", "200000"))
+# Users whose folded (bias, num_poles) is kept in memory per process
+MAX_CACHED_USERS = int(os.environ.get("WATCH_CACHE_USERS", "100000"))
+
+
+class WatchAggregator:
+    def __init__(self, users_collection, flush_interval=FLUSH_INTERVAL, max_pending=MAX_PENDING,
+                 max_cached_users=MAX_CACHED_USERS):
+        self.users_collection = users_collection
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_cached_users = max_cached_users
+        self.pending = {}  # user _id -> [pole biases], oldest first
+        self.pending_count = 0
+        self.states = OrderedDict()  # user _id -> (bias, num_poles) including flushed events
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.wake = threading.Event()
+        self.thread = None
+        self.stats = {"events": 0, "flushes": 0, "users_written": 0, "dropped": 0, "failed_flushes": 0}
+
+    def _start(self):
+        # Caller holds the lock
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name="watch-flusher", daemon=True)
+            self.thread.start()
+            atexit.register(self.flush)
+
+    def record(self, user_id, pole_bias):
+        """Buffers one watch; returns immediately."""
+        with self.lock:
+            self._start()
+            if self.pending_count >= MAX_BACKLOG:
+                self.stats["dropped"] += 1
+                return False
+            self.pending.setdefault(user_id, []).append(float(pole_bias))
+            self.pending_count += 1
+            self.stats["events"] += 1
+            if self.pending_count >= self.max_pending:
+                self.wake.set()
+        return True
+
+    def _run(self):
+        while True:
+            self.wake.wait(self.flush_interval)
+            self.wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"❌ Watch event flush failed: {e}")
+
+    def _load_states(self, user_ids):
+        missing = [user_id for user_id in user_ids if user_id not in self.states]
+        loaded = {}
+        if missing:
+            for user in self.users_collection.find(
+                {"_id": {"$in": missing}}, {"bias_score": 1, "num_poles": 1, "bias_sum": 1}
+            ):
+                loaded[user["_id"]] = user_state(user)
+        with self.lock:
+            for user_id in missing:
+                self.states[user_id] = loaded.get(user_id, (0.0, 0))
+            for user_id in user_ids:
+                self.states.move_to_end(user_id)
+
+    def flush(self):
+        """Folds and writes all buffered events; returns how many users were written."""
+        with self.flush_lock:
+            with self.lock:
+                batch, self.pending = self.pending, {}
+                self.pending_count = 0
+            if not batch:
+                return 0
+
+            try:
+                self._load_states(list(batch))
+                now = datetime.utcnow()
+                updates, folded = [], {}
+                for user_id, poles in batch.items():
+                    bias, num_poles = self.states[user_id]
+                    for pole_bias in poles:
+                        bias = calculate_user_bias(bias, pole_bias, num_poles)
+                        num_poles += 1
+                    folded[user_id] = (bias, num_poles)
+                    updates.append(UpdateOne({"_id": user_id}, {
+                        "$set": {"bias_score": bias, "last_watched_at": now},
+                        "$inc": {"num_poles": len(poles), "bias_sum": sum(poles)},
+                    }))
+                self.users_collection.bulk_write(updates, ordered=False)
+            except Exception:
+                # Put the events back in front of anything recorded meanwhile
+                with self.lock:
+                    for user_id, poles in batch.items():
+                        self.pending[user_id] = poles + self.pending.get(user_id, [])
+                    self.pending_count += sum(len(poles) for poles in batch.values())
+                    self.stats["failed_flushes"] += 1
+                raise
+
+            with self.lock:
+                self.states.update(folded)
+                while len(self.states) > self.max_cached_users:
+                    self.states.popitem(last=False)
+                self.stats["flushes"] += 1
+                self.stats["users_written"] += len(updates)
+            return len(updates)
+
+    def current_bias(self, user_id):
+        """The user's bias including events not yet flushed, or None if unknown here."""
+        with self.lock:
+            state = self.states.get(user_id)
+            poles = list(self.pending.get(user_id, []))
+        if state is None:
+            return None
+        bias, num_poles = state
+        for pole_bias in poles:
+            bias = calculate_user_bias(bias, pole_bias, num_poles)
+            num_poles += 1
+        return bias
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+            stats["pending_events"] = self.pending_count
+            stats["pending_users"] = len(self.pending)
+            return stats